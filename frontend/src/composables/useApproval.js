@@ -8,10 +8,12 @@
  * - 撤回审批
  * - 审批操作（通过/驳回）
  * - 权限判断
+ * - 订阅实时推送，审批状态变化时原地更新
  */
 
-import { ref, computed } from 'vue'
+import { ref, computed, onMounted, onUnmounted } from 'vue'
 import { call } from 'frappe-ui'
+import { subscribeDoc, onRealtime, isRealtimeConnected } from '../socket'
 
 /**
  * 审批管理主函数
@@ -295,11 +297,8 @@ export function useApproval(storeId, taskId) {
 			)
 			
 			if (response?.status === 'success') {
-				// 刷新审批状态和历史
-				await Promise.all([
-					fetchApprovalStatus(),
-					fetchApprovalHistory()
-				])
+				// 实时推送会原地更新状态和历史，连接不可用时才主动刷新
+				await refreshIfOffline()
 				
 				return {
 					success: true,
@@ -340,11 +339,8 @@ export function useApproval(storeId, taskId) {
 			)
 			
 			if (response?.status === 'success') {
-				// 刷新审批状态和历史
-				await Promise.all([
-					fetchApprovalStatus(),
-					fetchApprovalHistory()
-				])
+				// 实时推送会原地更新状态和历史，连接不可用时才主动刷新
+				await refreshIfOffline()
 				
 				return {
 					success: true,
@@ -387,11 +383,8 @@ export function useApproval(storeId, taskId) {
 			)
 			
 			if (response?.status === 'success') {
-				// 刷新审批状态和历史
-				await Promise.all([
-					fetchApprovalStatus(),
-					fetchApprovalHistory()
-				])
+				// 实时推送会原地更新状态和历史，连接不可用时才主动刷新
+				await refreshIfOffline()
 				
 				return {
 					success: true,
@@ -414,6 +407,77 @@ export function useApproval(storeId, taskId) {
 		}
 	}
 	
+	/**
+	 * 实时连接不可用时刷新审批状态和历史
+	 */
+	const refreshIfOffline = async () => {
+		if (isRealtimeConnected()) return
+		await Promise.all([
+			fetchApprovalStatus(),
+			fetchApprovalHistory()
+		])
+	}
+	
+	// ==================== 实时推送 ====================
+	
+	/**
+	 * 应用审批推送事件：更新当前状态、重算权限并追加审批历史
+	 * 权限计算与后端 get_approval_status / check_can_edit 保持一致
+	 * @param {Object} message - 推送消息 { task_id, store_id, action, state, history }
+	 */
+	const applyApprovalEvent = (message) => {
+		if (message?.task_id !== taskId || message?.store_id !== storeId) return
+		
+		const current = approvalStatus.value
+		if (!current?.workflow?.has_workflow) {
+			// 尚未加载或无审批流程配置，直接重新获取
+			refreshApprovalData()
+			return
+		}
+		
+		const state = message.state || {}
+		current.workflow.current_state = {
+			...current.workflow.current_state,
+			status: state.status || '未开始',
+			approval_status: state.approval_status || '待审批',
+			current_step: state.current_step || 0,
+			can_edit: state.can_edit,
+			rejection_reason: state.rejection_reason
+		}
+		
+		// 非店铺负责人的限制与审批状态无关，保持不变
+		if (current.edit_reason !== '只有店铺负责人可以编辑') {
+			const locked = state.status === '已提交' && !state.can_edit
+			current.can_edit = !locked
+			current.edit_reason = locked ? '任务正在审批中，无法编辑' : ''
+		}
+		
+		const roles = current.user_roles || []
+		const steps = current.workflow.workflow?.steps || []
+		const step = state.current_step || 0
+		current.can_approve = state.approval_status === '待审批' &&
+			step > 0 && step <= steps.length &&
+			(roles.includes(steps[step - 1].approver_role) || roles.includes('System Manager'))
+		
+		if (message.history && !approvalHistory.value.some(h => h.name === message.history.name)) {
+			approvalHistory.value = [...approvalHistory.value, message.history]
+		}
+	}
+	
+	let unsubscribeTask = null
+	let offApprovalEvent = null
+	
+	onMounted(() => {
+		if (!taskId || !storeId) return
+		unsubscribeTask = subscribeDoc('Schedule tasks', taskId)
+		offApprovalEvent = onRealtime('psp_approval_update', applyApprovalEvent)
+	})
+	
+	onUnmounted(() => {
+		unsubscribeTask?.()
+		offApprovalEvent?.()
+	})
+	
 	/**
 	 * 刷新所有审批数据
 	 */
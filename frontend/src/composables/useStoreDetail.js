@@ -9,11 +9,14 @@
  * - 导出功能
  * - 列设置管理
  * - 选择状态管理
+ * - 订阅实时推送，计划与审批变化时原地更新
  */
 
 import { ref, computed, watch, onMounted, onUnmounted } from 'vue'
 import { createResource, call } from 'frappe-ui'
 import { debounce } from '../utils/helpers'
+import { subscribeDoc, onRealtime } from '../socket'
+import { runExportJob } from '../utils/exportJob'
 
 /**
  * 列设置的 localStorage 键名
@@ -96,6 +99,11 @@ export function useStoreDetail(storeId, taskId) {
 	const saveError = ref(null)
 	const lastSaveTime = ref(null)
 
+	/**
+	 * 导出进度（0-100，未导出时为 null）
+	 */
+	const exportProgress = ref(null)
+
 	/**
 	 * 选择状态
 	 */
@@ -550,32 +558,36 @@ export function useStoreDetail(storeId, taskId) {
 	 * 导出到 Excel
 	 */
 	const exportToExcel = async () => {
+		exportProgress.value = 0
 		try {
-			const response = await call(
-				'product_sales_planning.api.v1.import_export.export_commodity_data',
-				{
-					store_id: storeId,
-					task_id: taskId
+			// 后台导出，不占用请求连接
+			const state = await runExportJob(
+				'commodity',
+				{ store_id: storeId, task_id: taskId },
+				(progressState) => {
+					if (progressState.progress != null) exportProgress.value = progressState.progress
 				}
 			)
 
-			if (response?.status === 'success') {
-				window.open(response.file_url, '_blank')
+			if (state.status === 'done') {
+				window.open(state.file_url, '_blank')
 				return {
 					success: true,
-					message: `成功导出 ${response.record_count} 条记录`
+					message: `成功导出 ${state.record_count} 条记录`
 				}
 			}
 
 			return {
 				success: false,
-				message: response?.message || '导出失败'
+				message: state.message || '导出失败'
 			}
 		} catch (error) {
 			return {
 				success: false,
 				message: error.message || '导出失败'
 			}
+		} finally {
+			exportProgress.value = null
 		}
 	}
 
@@ -650,11 +662,92 @@ export function useStoreDetail(storeId, taskId) {
 		}
 	}
 
+	// ==================== 实时推送 ====================
+
+	let realtimeOffs = []
+
+	/**
+	 * 是否为当前店铺任务的推送
+	 */
+	const isCurrentTarget = (message) => {
+		return message?.task_id === taskId && message?.store_id === storeId
+	}
+
+	/**
+	 * 应用计划推送事件：按 code + 月份原地更新数量，无法原地更新时重新加载
+	 * @param {Object} message - 推送消息 { action, changes, reload }
+	 */
+	const applyPlanEvent = (message) => {
+		if (!isCurrentTarget(message) || !commodityData.data) return
+
+		if (message.reload || message.action !== 'update') {
+			commodityData.reload()
+			return
+		}
+
+		const byCode = new Map()
+		commodityData.data.commodities.forEach(item => {
+			byCode.set(item.commodity_code || item.code, item)
+		})
+
+		let needReload = false
+		for (const change of message.changes || []) {
+			const item = byCode.get(change.code)
+			// 不在当前页的商品无需处理
+			if (!item) continue
+
+			const monthData = item.months?.[change.month]
+			if (!monthData) {
+				// 新增的月份记录缺少 record_name，需重新加载
+				needReload = true
+				break
+			}
+			monthData.quantity = change.quantity
+		}
+
+		if (needReload) {
+			commodityData.reload()
+		}
+	}
+
+	/**
+	 * 应用审批推送事件：同步可编辑状态
+	 * 进入审批锁定时直接置为不可编辑；解除锁定时重新加载（可编辑还取决于店铺负责人）
+	 * @param {Object} message - 推送消息 { state }
+	 */
+	const applyApprovalEvent = (message) => {
+		if (!isCurrentTarget(message) || !commodityData.data) return
+
+		const state = message.state || {}
+		const locked = state.status === '已提交' && !state.can_edit
+		if (locked) {
+			commodityData.data.can_edit = false
+		} else if (!commodityData.data.can_edit) {
+			commodityData.reload()
+		}
+	}
+
+	/**
+	 * 订阅任务房间与实时事件
+	 */
+	const subscribeRealtime = () => {
+		if (!taskId || !storeId) return
+		realtimeOffs = [
+			subscribeDoc('Schedule tasks', taskId),
+			onRealtime('psp_plan_update', applyPlanEvent),
+			onRealtime('psp_approval_update', applyApprovalEvent)
+		]
+	}
+
 	/**
 	 * 清理资源
 	 */
 	const cleanup = () => {
 		try {
+			// 取消实时订阅
+			realtimeOffs.forEach(off => off())
+			realtimeOffs = []
+
 			// 清除选择状态
 			clearSelection()
 			
@@ -675,10 +768,11 @@ export function useStoreDetail(storeId, taskId) {
 	// ==================== 生命周期 ====================
 
 	/**
-	 * 组件挂载时加载列设置
+	 * 组件挂载时加载列设置并订阅实时推送
 	 */
 	onMounted(() => {
 		loadColumnSettings()
+		subscribeRealtime()
 	})
 
 	/**
@@ -742,6 +836,7 @@ export function useStoreDetail(storeId, taskId) {
 		updatePagination,
 		batchSaveChanges,
 		exportToExcel,
+		exportProgress,
 		updateSelectedRows,
 		clearSelection,
 		batchDeleteSelected,
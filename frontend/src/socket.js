@@ -0,0 +1,80 @@
+/**
+ * Socket.IO 实时连接
+ * 连接 Frappe socketio 服务，接收后端 publish_realtime 推送的事件
+ */
+
+import { io } from 'socket.io-client'
+import { socketio_port } from '../../../../sites/common_site_config.json'
+
+let socket = null
+
+/**
+ * 获取（必要时初始化）全局唯一的 socket 连接
+ * @returns {import('socket.io-client').Socket}
+ */
+export function initSocket() {
+	if (socket) return socket
+
+	const host = window.location.hostname
+	const siteName = window.boot?.site_name || host
+	// 开发环境（带端口访问）直连 socketio 端口；生产环境经由 nginx 同源转发
+	const port = window.location.port ? `:${socketio_port || 9000}` : ''
+	const protocol = port ? 'http:' : window.location.protocol
+
+	socket = io(`${protocol}//${host}${port}/${siteName}`, {
+		withCredentials: true,
+		reconnectionAttempts: 5
+	})
+	return socket
+}
+
+/**
+ * 订阅文档房间（doc:<doctype>/<name>），断线重连后自动重新订阅
+ * @param {string} doctype - DocType 名称
+ * @param {string} name - 文档名称
+ * @returns {Function} 取消订阅函数
+ */
+export function subscribeDoc(doctype, name) {
+	const s = initSocket()
+	const subscribe = () => s.emit('doc_subscribe', doctype, name)
+
+	subscribe()
+	s.on('connect', subscribe)
+
+	return () => {
+		s.off('connect', subscribe)
+		s.emit('doc_unsubscribe', doctype, name)
+	}
+}
+
+/**
+ * 监听实时事件，同一事件经多个房间到达时按 event_id 去重
+ * @param {string} event - 事件名称
+ * @param {Function} handler - 事件处理函数
+ * @returns {Function} 取消监听函数
+ */
+export function onRealtime(event, handler) {
+	const s = initSocket()
+	const seen = new Set()
+
+	const listener = (message) => {
+		const eventId = message?.event_id
+		if (eventId) {
+			if (seen.has(eventId)) return
+			seen.add(eventId)
+			if (seen.size > 200) seen.delete(seen.values().next().value)
+		}
+		handler(message)
+	}
+
+	s.on(event, listener)
+	return () => s.off(event, listener)
+}
+
+/**
+ * 实时连接是否可用（不可用时调用方应回退到主动刷新）
+ * @returns {boolean}
+ */
+export function isRealtimeConnected() {
+	return !!socket?.connected
+}
@@ -0,0 +1,59 @@
+/**
+ * 后台任务跟踪
+ * 通过实时事件跟踪任务进度，实时连接不可用时轮询任务状态
+ */
+
+import { call } from 'frappe-ui'
+import { onRealtime } from '../socket'
+
+/**
+ * 轮询间隔（毫秒）
+ */
+const POLL_INTERVAL = 3000
+
+/**
+ * 等待后台任务结束
+ * @param {Object} options
+ * @param {string} options.jobId - 任务 ID
+ * @param {string} options.event - 进度实时事件名
+ * @param {string} options.statusMethod - 查询任务状态的接口
+ * @param {Function} options.onProgress - 进度回调，参数为任务状态
+ * @returns {Promise<Object>} 最终任务状态（status 为 'done' 或 'failed'）
+ */
+export function waitForJob({ jobId, event, statusMethod, onProgress = null }) {
+	return new Promise((resolve) => {
+		let finished = false
+		let timer = null
+		let off = null
+
+		const handle = (state) => {
+			if (finished || state?.job_id !== jobId) return
+			onProgress?.(state)
+			if (state.status === 'done' || state.status === 'failed') {
+				finished = true
+				clearTimeout(timer)
+				off?.()
+				resolve(state)
+			}
+		}
+
+		off = onRealtime(event, handle)
+
+		// 轮询兜底：实时事件丢失或连接不可用时仍能拿到结果
+		const poll = async () => {
+			if (finished) return
+			try {
+				const result = await call(statusMethod, { job_id: jobId })
+				if (result?.status === 'success') {
+					handle(result.data)
+				} else {
+					handle({ job_id: jobId, status: 'failed', message: result?.message || '任务不存在' })
+				}
+			} catch (error) {
+				console.error('获取任务状态失败:', error)
+			}
+			if (!finished) timer = setTimeout(poll, POLL_INTERVAL)
+		}
+		timer = setTimeout(poll, POLL_INTERVAL)
+	})
+}
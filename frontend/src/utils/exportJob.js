@@ -0,0 +1,37 @@
+/**
+ * 后台导出任务
+ * 提交导出任务后通过实时事件跟踪进度，实时连接不可用时轮询任务状态
+ */
+
+import { call } from 'frappe-ui'
+import { waitForJob } from './backgroundJob'
+
+const ENQUEUE_METHOD = 'product_sales_planning.api.v1.import_export.enqueue_export'
+const STATUS_METHOD = 'product_sales_planning.api.v1.import_export.get_export_status'
+
+/**
+ * 提交后台导出任务并等待完成
+ * @param {string} exportType - 导出类型：'data_view' | 'commodity' | 'task_commodity'
+ * @param {Object} params - 导出参数
+ * @param {Function} onProgress - 进度回调，参数为任务状态 { status, progress, processed, total }
+ * @returns {Promise<Object>} 最终任务状态（status 为 'done' 时含 file_url）
+ */
+export async function runExportJob(exportType, params = {}, onProgress = null) {
+	const response = await call(ENQUEUE_METHOD, {
+		export_type: exportType,
+		params: JSON.stringify(params)
+	})
+
+	if (response?.status !== 'success') {
+		return { status: 'failed', message: response?.message || '提交导出任务失败' }
+	}
+
+	onProgress?.(response.data)
+
+	return waitForJob({
+		jobId: response.data.job_id,
+		event: 'psp_export_progress',
+		statusMethod: STATUS_METHOD,
+		onProgress
+	})
+}
@@ -0,0 +1,33 @@
+/**
+ * 后台导入任务
+ * 导入按块提交并记录断点；同一文件重新提交时从断点继续
+ */
+
+import { call } from 'frappe-ui'
+import { waitForJob } from './backgroundJob'
+
+const ENQUEUE_METHOD = 'product_sales_planning.api.v1.import_export.enqueue_import'
+const STATUS_METHOD = 'product_sales_planning.api.v1.import_export.get_import_status'
+
+/**
+ * 提交后台导入任务并等待完成
+ * @param {Object} params - { store_id, task_id, file_url }
+ * @param {Function} onProgress - 进度回调，参数为任务状态 { status, progress, processed, total, totals }
+ * @returns {Promise<Object>} 最终任务状态（totals 为累计导入结果）
+ */
+export async function runImportJob(params, onProgress = null) {
+	const response = await call(ENQUEUE_METHOD, params)
+
+	if (response?.status !== 'success') {
+		return { status: 'failed', message: response?.message || '提交导入任务失败' }
+	}
+
+	onProgress?.(response.data)
+
+	return waitForJob({
+		jobId: response.data.job_id,
+		event: 'psp_import_progress',
+		statusMethod: STATUS_METHOD,
+		onProgress
+	})
+}
@@ -12,6 +12,9 @@ from product_sales_planning.utils.validation_utils import (
 	validate_month_format
 )
 from product_sales_planning.services.commodity_service import CommodityScheduleService
+from product_sales_planning.utils.realtime_utils import publish_plan_event
+from product_sales_planning.utils.cache_utils import bump_data_version
+from product_sales_planning.constants import CacheScope
 
 
 def _ensure_store_access(store_id):
@@ -161,6 +164,8 @@ def bulk_insert_commodity_schedule(store_id, task_id, codes):
 			task_id=task_id,
 			codes=codes
 		)
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "insert")
 		# 兼容：统一 message 字段（部分旧接口使用 msg）
 		if isinstance(result, dict) and result.get("status") == "success" and "message" not in result:
 			if result.get("msg"):
@@ -207,6 +212,8 @@ def batch_update_quantity(store_id, task_id, names, quantity):
 				return error_response(message=f"记录 {name} 不属于指定的店铺和任务")
 		
 		result = CommodityScheduleService.batch_update_quantity(names, quantity)
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "update")
 		if isinstance(result, dict) and result.get("status") == "success" and "message" not in result:
 			if result.get("msg"):
 				result["message"] = result["msg"]
@@ -251,6 +258,8 @@ def batch_delete_items(store_id, task_id, names):
 				return error_response(message=f"记录 {name} 不属于指定的店铺和任务")
 		
 		result = CommodityScheduleService.batch_delete(names)
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "delete")
 		if isinstance(result, dict) and result.get("status") == "success" and "message" not in result:
 			if result.get("msg"):
 				result["message"] = result["msg"]
@@ -306,6 +315,8 @@ def batch_delete_by_codes(store_id, task_id, codes):
 				frappe.log_error(f"删除产品记录失败: {code}", str(e))
 
 		frappe.db.commit()
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "delete")
 
 		msg = f"成功删除 {deleted_count} 条记录"
 		if errors:
@@ -346,7 +357,7 @@ def update_line_item(store_id, task_id, name, field, value):
 		record = frappe.db.get_value(
 			"Commodity Schedule",
 			name,
-			["store_id", "task_id"],
+			["store_id", "task_id", "code", "sub_date"],
 			as_dict=True
 		)
 		if not record:
@@ -356,6 +367,12 @@ def update_line_item(store_id, task_id, name, field, value):
 		
 		frappe.db.set_value("Commodity Schedule", name, field, value)
 		frappe.db.commit()
+
+		changes = None
+		if field == "quantity" and record.sub_date:
+			changes = [{"code": record.code, "month": str(record.sub_date)[:7], "quantity": value}]
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "update", changes)
 		return success_response(message="已保存")
 
 	except Exception as e:
@@ -413,6 +430,8 @@ def update_month_quantity(store_id, task_id, code, month, quantity):
 			new_doc.insert()
 
 		frappe.db.commit()
+		bump_data_version(CacheScope.PLAN)
+		publish_plan_event(task_id, store_id, "update", [{"code": code, "month": month, "quantity": quantity}])
 		return success_response(message="已保存")
 
 	except frappe.ValidationError as ve:
@@ -451,6 +470,7 @@ def batch_update_month_quantities(store_id, task_id, updates):
 
 		success_count = 0
 		errors = []
+		changes = []
 
 		for idx, upd in enumerate(updates_list):
 			try:
@@ -491,10 +511,14 @@ def batch_update_month_quantities(store_id, task_id, updates):
 					new_doc.insert()
 
 				success_count += 1
+				changes.append({"code": code, "month": month, "quantity": quantity})
 			except Exception as inner_e:
 				errors.append(f"第 {idx + 1} 项失败: {str(inner_e)}")
 
 		frappe.db.commit()
+		if changes:
+			bump_data_version(CacheScope.PLAN)
+			publish_plan_event(task_id, store_id, "update", changes)
 		return success_response(
 			message=f"批量保存完成，成功 {success_count} 条",
 			count=success_count,
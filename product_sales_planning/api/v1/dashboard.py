@@ -4,16 +4,37 @@ Dashboard API
 """
 
 import frappe
-from frappe.utils import getdate, today, date_diff, format_datetime
+from frappe.utils import getdate, today, date_diff, format_datetime, cint, now_datetime, get_datetime, add_to_date
 import json
+from product_sales_planning.services.filter_options_service import FilterOptionsService
+from product_sales_planning.constants import CacheScope, DeadlineBucket
+from product_sales_planning.utils.cache_utils import get_data_version, get_permission_scope, get_or_compute, hash_params
+
+
+# 增量刷新时水位线向前回溯的秒数，覆盖 modified 已写入但事务尚未提交的行
+CHANGES_OVERLAP_SECONDS = 5
+
+# 水位线超过该时长的客户端应全量重新加载
+CHANGES_MAX_AGE_HOURS = 24
+
+# 看板结果缓存有效期（秒）
+DASHBOARD_CACHE_TTL = 30
 
 
 @frappe.whitelist()
-def get_dashboard_data(filters=None, search_text=None, sort_by=None, sort_order="asc"):
+def get_dashboard_data(filters=None, search_text=None, sort_by=None, sort_order="asc", include_filter_options=0):
 	"""
 	获取计划看板数据（支持过滤、搜索、排序）
 	
 	从 planning_dashboard.py 迁移
+
+	Args:
+		include_filter_options: 是否在响应中附带筛选器选项（默认不附带，前端应单独调用 get_filter_options）
+
+	响应中的 watermark 可直接作为 get_dashboard_changes 的 since 参数
+
+	结果按（规范化的过滤条件、排序、权限范围、看板数据版本）短时缓存，
+	同一缓存键只由一个 worker 计算；Schedule tasks / Tasks Store / Store List 变更时版本号更换
 	"""
 	try:
 		# 解析过滤器参数
@@ -29,288 +50,472 @@ def get_dashboard_data(filters=None, search_text=None, sort_by=None, sort_order=
 		if frappe.conf.get("developer_mode"):
 			frappe.logger().debug(f"get_dashboard_data called: filters={filters}, tab={current_tab}")
 
-		# 1. 基础统计
-		stats = {
-			"ongoing": frappe.db.count("Schedule tasks", {"status": "开启中"}),
-			"closed": frappe.db.count("Schedule tasks", {"status": "已结束"}),
-			"types": len(frappe.db.sql("SELECT DISTINCT type FROM `tabSchedule tasks`"))
-		}
+		search_text = (search_text or "").strip() or None
+		sort_order = (sort_order or "asc").lower()
+
+		cache_key = "dashboard:{version}:{scope}:{params}".format(
+			version=get_data_version(CacheScope.DASHBOARD),
+			scope=get_permission_scope(),
+			params=hash_params({
+				"filters": _canonicalize_filters(filters),
+				"tab": current_tab,
+				"search_text": search_text,
+				"sort_by": sort_by or None,
+				"sort_order": sort_order,
+				"date": today()
+			})
+		)
 
-		# 额外统计
-		stats["urgent_count"] = 0
-		stats["submitted_count"] = 0
-		stats["approved_count"] = 0
-		stats["rejected_count"] = 0
-		stats["pending_count"] = 0
-		stats["completed_count"] = 0
-
-		# 2. 构建父任务过滤条件
-		parent_filters = {"status": "开启中"}
-		if filters.get("plan_type"):
-			parent_filters["type"] = filters["plan_type"]
-
-		# 任务筛选（支持多选）
-		if filters.get("task_ids"):
-			task_ids = filters["task_ids"]
-			if isinstance(task_ids, str):
-				task_ids = json.loads(task_ids)
-			if task_ids and len(task_ids) > 0:
-				parent_filters["name"] = ["in", task_ids]
-		elif filters.get("task_id"):
-			parent_filters["name"] = filters["task_id"]
-
-		parents = frappe.get_all(
-			"Schedule tasks",
-			filters=parent_filters,
-			fields=["name", "type", "end_date", "status", "start_date"],
-			order_by="end_date asc"
+		response = get_or_compute(
+			cache_key,
+			lambda: _compute_dashboard_data(filters, current_tab, search_text, sort_by, sort_order),
+			expires_in_sec=DASHBOARD_CACHE_TTL
 		)
 
-		frappe.logger().info(f"🔍 [Parent Tasks] Found {len(parents)} parent tasks: {[p.name for p in parents]}")
+		if cint(include_filter_options):
+			response["filter_options"] = get_filter_options()
+		return response
+
+	except Exception as e:
+		frappe.log_error(title="获取看板数据失败", message=str(e))
+		return {
+			"stats": {"ongoing": 0, "closed": 0, "types": 0, "urgent_count": 0, "submitted_count": 0, "approved_count": 0, "rejected_count": 0},
+			"tasks": [],
+			"filter_options": {},
+			"error": str(e)
+		}
+
+
+def _compute_dashboard_data(filters, current_tab, search_text, sort_by, sort_order):
+	"""
+	计算看板数据（未命中缓存时调用，异常向上抛出以免被缓存）
+
+	统计与看板行各用一条 SQL 查询；紧急筛选与紧急计数直接使用
+	Tasks Store 上带索引的 deadline_bucket（保存任务时写入，每日定时任务更新）
+
+	只包含当前用户可读的任务与店铺（见 _get_permitted_task_names / _get_permitted_store_names），
+	结果因此按权限范围缓存
+	"""
+	# 在读取任何数据之前记录水位线
+	watermark = now_datetime()
+
+	# 1. 基础统计（按权限过滤）
+	status_counts = dict(frappe.get_list(
+		"Schedule tasks",
+		fields=["status", "count(name) as count"],
+		group_by="status",
+		as_list=True,
+		limit_page_length=0
+	))
+	stats = {
+		"ongoing": status_counts.get("开启中", 0),
+		"closed": status_counts.get("已结束", 0),
+		"types": len(frappe.get_list("Schedule tasks", fields=["type"], group_by="type", limit_page_length=0))
+	}
+	for key in ("urgent_count", "submitted_count", "approved_count", "rejected_count", "pending_count", "completed_count"):
+		stats[key] = 0
+
+	# 2. 构建父任务过滤条件（限定为可读的开启中任务）
+	permitted_tasks = _get_permitted_task_names({"status": "开启中"})
+	if not permitted_tasks:
+		return {"stats": stats, "tasks": [], "watermark": str(watermark)}
+
+	values = {"urgent": DeadlineBucket.URGENT, "permitted_tasks": permitted_tasks}
+	parent_conditions = ["st.name IN %(permitted_tasks)s", *_get_parent_conditions(filters, values)]
+
+	permitted_stores = _get_permitted_store_names()
+	if permitted_stores is not None:
+		parent_conditions.append("ts.store_name IN %(permitted_stores)s")
+		values["permitted_stores"] = list(permitted_stores)
+
+	parent_clause = "".join(f" AND {c}" for c in parent_conditions)
+	base_clause = f"""
+		FROM `tabTasks Store` ts
+		INNER JOIN `tabSchedule tasks` st ON st.name = ts.parent
+		LEFT JOIN `tabStore List` sl ON sl.name = ts.store_name
+		WHERE ts.parenttype = 'Schedule tasks'
+			AND st.status = '开启中'
+			AND IFNULL(ts.store_name, '') != ''
+			{parent_clause}
+	"""
+
+	# 3. 额外统计（全局统计，在应用行过滤器之前）
+	counts = frappe.db.sql(f"""
+		SELECT
+			COUNT(*) AS total,
+			SUM(ts.approval_status = '已通过') AS approved,
+			SUM(ts.approval_status = '已驳回') AS rejected,
+			SUM(ts.status = '已提交') AS submitted,
+			SUM(ts.deadline_bucket IN %(urgent)s) AS urgent
+		{base_clause}
+	""", values, as_dict=True)[0]
+
+	stats["urgent_count"] = cint(counts.urgent)
+	stats["submitted_count"] = cint(counts.submitted)
+	stats["approved_count"] = cint(counts.approved)
+	stats["rejected_count"] = cint(counts.rejected)
+	stats["pending_count"] = cint(counts.total) - cint(counts.approved)
+	stats["completed_count"] = cint(counts.approved)
+
+	# 4. 看板行（紧急筛选在 SQL 中完成，其余过滤器逐行判断）
+	urgent_clause = "AND ts.deadline_bucket IN %(urgent)s" if filters.get("is_urgent") else ""
+	rows = frappe.db.sql(f"""
+		SELECT
+			ts.name, ts.store_name, ts.user, ts.status, ts.approval_status, ts.sub_time, ts.deadline_bucket,
+			st.name AS parent, st.type, st.start_date, st.end_date,
+			sl.shop_name, sl.channel
+		{base_clause}
+			{urgent_clause}
+		ORDER BY st.end_date ASC, st.name ASC, ts.idx ASC
+	""", values, as_dict=True)
+
+	processed_tasks = []
+	current_date = getdate(today())
+
+	for row in rows:
+		parent = frappe._dict(name=row.parent, type=row.type, start_date=row.start_date, end_date=row.end_date)
+		shop_info = {"shop_name": row.shop_name, "channel": row.channel}
+		task_data = _build_task_row(parent, row, shop_info, current_date)
+
+		if not _row_matches_filters(task_data, filters, current_tab, search_text):
+			continue
+
+		processed_tasks.append(task_data)
+
+	# 5. 排序
+	if sort_by:
+		reverse = (sort_order == "desc")
+		if sort_by == "deadline":
+			processed_tasks.sort(key=lambda x: x["days_remaining"], reverse=reverse)
+		elif sort_by == "title":
+			processed_tasks.sort(key=lambda x: x["title"], reverse=reverse)
+		elif sort_by == "channel":
+			processed_tasks.sort(key=lambda x: x["channel"], reverse=reverse)
+		elif sort_by == "status":
+			processed_tasks.sort(key=lambda x: x["child_status"], reverse=reverse)
+		elif sort_by == "user":
+			processed_tasks.sort(key=lambda x: x["user"], reverse=reverse)
+
+	return {
+		"stats": stats,
+		"tasks": processed_tasks,
+		"watermark": str(watermark)
+	}
 
-		if not parents:
+
+@frappe.whitelist()
+def get_dashboard_changes(since=None, filters=None, search_text=None):
+	"""
+	获取自 since 以来发生变化的看板行（增量刷新）
+
+	基于 Tasks Store 与父任务 Schedule tasks 的 modified 字段追踪变化，
+	客户端据此修补本地数据，无需重新拉取整个看板。
+
+	Args:
+		since: 上次获取的水位线（get_dashboard_data / get_dashboard_changes 返回的 watermark）
+		filters: 与 get_dashboard_data 相同的过滤器（含 tab）
+		search_text: 搜索关键词
+
+	Returns:
+		dict: {
+			"watermark": 新的水位线,
+			"full_reload": 是否需要全量重新加载（since 缺失或过旧）,
+			"tasks": 发生变化且符合当前筛选条件的行（结构同 get_dashboard_data）,
+			"removed": 发生变化后不再符合筛选条件的行 [{"parent_id", "store_id"}],
+			"replaced_tasks": 父任务本身发生变化的任务ID，客户端应以本次返回的行替换这些任务下的全部行,
+			"removed_tasks": 已结束或已删除的任务ID，客户端应移除这些任务下的全部行
+		}
+	"""
+	try:
+		watermark = now_datetime()
+
+		if isinstance(filters, str):
+			filters = json.loads(filters) if filters else {}
+		elif filters is None:
+			filters = {}
+
+		current_tab = filters.pop('tab', 'pending') if isinstance(filters, dict) else 'pending'
+
+		since_dt = get_datetime(since) if since else None
+		if not since_dt or since_dt < add_to_date(watermark, hours=-CHANGES_MAX_AGE_HOURS):
 			return {
-				"stats": stats,
+				"status": "success",
+				"watermark": str(watermark),
+				"full_reload": True,
 				"tasks": [],
-				"filter_options": get_filter_options()
+				"removed": [],
+				"replaced_tasks": [],
+				"removed_tasks": []
 			}
 
-		processed_tasks = []
-		current_date = getdate(today())
-
-		# 3. 批量获取所有店铺信息（优化：避免 N+1 查询）
-		store_cache = {}
+		values = {"since": add_to_date(since_dt, seconds=-CHANGES_OVERLAP_SECONDS)}
+
+		# 父任务过滤条件（与 get_dashboard_data 一致）
+		parent_conditions = _get_parent_conditions(filters, values)
+		parent_clause = "".join(f" AND {c}" for c in parent_conditions)
+
+		# 两个分支分别走 Tasks Store / Schedule tasks 的 modified 索引
+		select_clause = """
+			SELECT
+				ts.name, ts.store_name, ts.user, ts.status, ts.approval_status, ts.sub_time, ts.deadline_bucket,
+				st.name AS parent, st.type, st.start_date, st.end_date,
+				st.status AS task_status, st.modified AS task_modified,
+				sl.shop_name, sl.channel
+			FROM `tabTasks Store` ts
+			INNER JOIN `tabSchedule tasks` st ON st.name = ts.parent
+			LEFT JOIN `tabStore List` sl ON sl.name = ts.store_name
+			WHERE ts.parenttype = 'Schedule tasks'
+		"""
+		rows = frappe.db.sql(f"""
+			{select_clause} AND ts.modified > %(since)s {parent_clause}
+			UNION
+			{select_clause} AND st.modified > %(since)s {parent_clause}
+		""", values, as_dict=True)
+
+		# 权限范围（与 get_dashboard_data 一致）：只返回当前用户可读的任务与店铺
+		if rows:
+			permitted_tasks = set(_get_permitted_task_names({"name": ["in", list({row.parent for row in rows})]}))
+			permitted_stores = _get_permitted_store_names()
+			rows = [
+				row for row in rows
+				if row.parent in permitted_tasks
+				and (permitted_stores is None or not row.store_name or row.store_name in permitted_stores)
+			]
 
-		# 先收集所有需要的店铺ID
-		all_store_ids = set()
-		parent_docs = {}
+		current_date = getdate(today())
+		changed_tasks = []
+		removed = []
+		replaced_tasks = set()
+		removed_tasks = set()
+
+		for row in rows:
+			if row.task_status != "开启中":
+				removed_tasks.add(row.parent)
+				continue
 
-		for p in parents:
-			try:
-				doc = frappe.get_doc("Schedule tasks", p.name)
-				parent_docs[p.name] = doc
+			if row.task_modified and row.task_modified > values["since"]:
+				replaced_tasks.add(row.parent)
 
-				if doc.set_store:
-					for item in doc.set_store:
-						if item.store_name:
-							all_store_ids.add(item.store_name)
-			except Exception as e:
-				frappe.log_error(f"获取任务失败: {p.name}", str(e))
+			if not row.store_name:
 				continue
 
-		# 批量查询所有店铺信息
-		if all_store_ids:
-			stores = frappe.get_all(
-				"Store List",
-				filters={"name": ["in", list(all_store_ids)]},
-				fields=["name", "shop_name", "channel"]
-			)
-			for store in stores:
-				store_cache[store.name] = {
-					"shop_name": store.shop_name,
-					"channel": store.channel or "未知渠道"
-				}
-
-		# 4. 遍历并拆箱
-		type_map = {"MON": "月度常规计划", "PRO": "专项促销活动"}
-
-		for p in parents:
-			try:
-				doc = parent_docs.get(p.name)
-				if not doc:
-					continue
-
-				plan_name = type_map.get(p.type, p.type)
-
-				is_urgent = False
-				days_remaining = None
-				if p.end_date:
-					days_remaining = date_diff(p.end_date, current_date)
-					if days_remaining <= 3:
-						is_urgent = True
-
-				# 遍历子表 (Tasks Store)
-				if doc.set_store:
-					for item in doc.set_store:
-						store_link_val = item.store_name
-						if not store_link_val:
-							continue
-
-						# 从缓存中获取店铺信息
-						shop_info = store_cache.get(store_link_val, {})
-						shop_title = shop_info.get("shop_name", store_link_val)
-						shop_channel = shop_info.get("channel", "未知渠道")
-
-						# 字段获取
-						in_charge = item.user or "待分配"
-						sub_status = item.status or "未开始"
-						approval_stat = item.approval_status or "待审批"
-
-						# 先进行全局统计（在应用任何过滤器之前）
-						if approval_stat == "已通过":
-							stats["approved_count"] += 1
-							stats["completed_count"] += 1
-						elif approval_stat == "已驳回":
-							stats["rejected_count"] += 1
-							stats["pending_count"] += 1
-						else:
-							stats["pending_count"] += 1
-
-						if sub_status == "已提交":
-							stats["submitted_count"] += 1
-
-						if is_urgent:
-							stats["urgent_count"] += 1
-
-						# 第一步：应用 Tab 筛选
-						if current_tab == 'completed':
-							if approval_stat != '已通过':
-								continue
-						elif current_tab == 'pending':
-							if approval_stat == '已通过':
-								continue
-
-						# 第二步：应用其他过滤器
-						if "store_ids" in filters:
-							store_ids = filters["store_ids"]
-							if isinstance(store_ids, str):
-								store_ids = json.loads(store_ids)
-							if store_ids and len(store_ids) > 0 and store_link_val not in store_ids:
-								continue
-						elif filters.get("store_id") and store_link_val != filters["store_id"]:
-							continue
-
-						if filters.get("channel") and shop_channel != filters["channel"]:
-							continue
-
-						if filters.get("status") and sub_status != filters["status"]:
-							continue
-
-						if current_tab == 'pending' and filters.get("approval_status") and approval_stat != filters["approval_status"]:
-							continue
-
-						if filters.get("user") and in_charge != filters["user"]:
-							continue
-
-						if filters.get("is_urgent") and not is_urgent:
-							continue
-
-						# 搜索过滤
-						if search_text:
-							search_lower = search_text.lower()
-							if not (search_lower in shop_title.lower() or
-									search_lower in shop_channel.lower() or
-									search_lower in in_charge.lower() or
-									search_lower in plan_name.lower()):
-								continue
-
-						submit_time_str = " "
-						if item.sub_time:
-							try:
-								submit_time_str = format_datetime(item.sub_time, "MM-dd HH:mm")
-							except Exception:
-								submit_time_str = str(item.sub_time)
-
-						task_data = {
-							"parent_id": p.name,
-							"row_id": item.name,
-							"store_id": store_link_val,
-							"title": shop_title,
-							"channel": shop_channel,
-							"plan_type": plan_name,
-							"plan_type_code": p.type,
-							"deadline": format_datetime(p.end_date, "yyyy-MM-dd") if p.end_date else "无截止",
-							"start_date": format_datetime(p.start_date, "yyyy-MM-dd") if p.start_date else "",
-							"user": in_charge,
-							"child_status": sub_status,
-							"approval_status": approval_stat,
-							"submit_time": submit_time_str,
-							"is_urgent": is_urgent,
-							"days_remaining": days_remaining if days_remaining is not None else 999
-						}
-
-						processed_tasks.append(task_data)
-
-			except Exception as e:
-				frappe.log_error(f"处理任务失败: {p.name}", str(e))
-				continue
+			parent = frappe._dict(name=row.parent, type=row.type, start_date=row.start_date, end_date=row.end_date)
+			shop_info = {"shop_name": row.shop_name, "channel": row.channel}
+			task_data = _build_task_row(parent, row, shop_info, current_date)
 
-		# 5. 排序
-		if sort_by:
-			reverse = (sort_order == "desc")
-			if sort_by == "deadline":
-				processed_tasks.sort(key=lambda x: x["days_remaining"], reverse=reverse)
-			elif sort_by == "title":
-				processed_tasks.sort(key=lambda x: x["title"], reverse=reverse)
-			elif sort_by == "channel":
-				processed_tasks.sort(key=lambda x: x["channel"], reverse=reverse)
-			elif sort_by == "status":
-				processed_tasks.sort(key=lambda x: x["child_status"], reverse=reverse)
-			elif sort_by == "user":
-				processed_tasks.sort(key=lambda x: x["user"], reverse=reverse)
+			if _row_matches_filters(task_data, filters, current_tab, search_text):
+				changed_tasks.append(task_data)
+			else:
+				removed.append({"parent_id": row.parent, "store_id": row.store_name})
+
+		# 已删除的任务
+		deleted = frappe.get_all(
+			"Deleted Document",
+			filters={"deleted_doctype": "Schedule tasks", "creation": [">", values["since"]]},
+			pluck="deleted_name"
+		)
+		removed_tasks.update(deleted)
 
 		return {
-			"stats": stats,
-			"tasks": processed_tasks,
-			"filter_options": get_filter_options()
+			"status": "success",
+			"watermark": str(watermark),
+			"full_reload": False,
+			"tasks": changed_tasks,
+			"removed": removed,
+			"replaced_tasks": sorted(replaced_tasks - removed_tasks),
+			"removed_tasks": sorted(removed_tasks)
 		}
 
 	except Exception as e:
-		frappe.log_error(title="获取看板数据失败", message=str(e))
+		frappe.log_error(title="获取看板增量数据失败", message=str(e))
 		return {
-			"stats": {"ongoing": 0, "closed": 0, "types": 0, "urgent_count": 0, "submitted_count": 0, "approved_count": 0, "rejected_count": 0},
+			"status": "error",
+			"message": str(e),
+			"watermark": str(since or ""),
+			"full_reload": True,
 			"tasks": [],
-			"filter_options": {},
-			"error": str(e)
+			"removed": [],
+			"replaced_tasks": [],
+			"removed_tasks": []
 		}
 
 
+# ========== 辅助函数 ==========
+
+TYPE_MAP = {"MON": "月度常规计划", "PRO": "专项促销活动"}
+
+
+def _build_task_row(parent, item, shop_info, current_date):
+	"""
+	将一条 Tasks Store 记录拆箱为看板行
+
+	Args:
+		parent: 父任务（需包含 name, type, start_date, end_date）
+		item: Tasks Store 记录（需包含 name, store_name, user, status, approval_status, sub_time, deadline_bucket）
+		shop_info: 店铺信息 {"shop_name", "channel"}
+		current_date: 当前日期
+	"""
+	plan_name = TYPE_MAP.get(parent.type, parent.type)
+
+	days_remaining = None
+	if parent.end_date:
+		days_remaining = date_diff(parent.end_date, current_date)
+
+	# 紧急程度使用 Tasks Store 的截止分组，与 SQL 中的紧急筛选与计数保持一致
+	deadline_bucket = item.deadline_bucket
+	is_urgent = deadline_bucket in DeadlineBucket.URGENT
+
+	submit_time_str = " "
+	if item.sub_time:
+		try:
+			submit_time_str = format_datetime(item.sub_time, "MM-dd HH:mm")
+		except Exception:
+			submit_time_str = str(item.sub_time)
+
+	return {
+		"parent_id": parent.name,
+		"row_id": item.name,
+		"store_id": item.store_name,
+		"title": shop_info.get("shop_name") or item.store_name,
+		"channel": shop_info.get("channel") or "未知渠道",
+		"plan_type": plan_name,
+		"plan_type_code": parent.type,
+		"deadline": format_datetime(parent.end_date, "yyyy-MM-dd") if parent.end_date else "无截止",
+		"start_date": format_datetime(parent.start_date, "yyyy-MM-dd") if parent.start_date else "",
+		"user": item.user or "待分配",
+		"child_status": item.status or "未开始",
+		"approval_status": item.approval_status or "待审批",
+		"submit_time": submit_time_str,
+		"is_urgent": is_urgent,
+		"deadline_bucket": deadline_bucket,
+		"days_remaining": days_remaining if days_remaining is not None else 999
+	}
+
+
+def _get_permitted_task_names(filters=None):
+	"""当前用户可读的任务名（frappe.get_list 应用角色权限与 User Permission）"""
+	return frappe.get_list("Schedule tasks", filters=filters, pluck="name", limit_page_length=0)
+
+
+def _get_permitted_store_names():
+	"""
+	User Permission 限定的店铺
+
+	Tasks Store 是子表，get_list 的 User Permission 只作用于任务本身的链接字段，
+	店铺限定需单独应用到店铺行
+
+	Returns:
+		set: 限定的店铺名；没有店铺限定时返回 None
+	"""
+	from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+
+	stores = {
+		perm.get("doc")
+		for perm in get_user_permissions(frappe.session.user).get("Store List") or []
+		if perm.get("applicable_for") in (None, "", "Schedule tasks")
+	}
+	return stores or None
+
+
+def _get_parent_conditions(filters, values):
+	"""父任务过滤条件（计划类型、任务多选 / 单选），参数写入 values"""
+	conditions = []
+	if filters.get("plan_type"):
+		conditions.append("st.type = %(plan_type)s")
+		values["plan_type"] = filters["plan_type"]
+
+	task_ids = filters.get("task_ids")
+	if isinstance(task_ids, str):
+		task_ids = json.loads(task_ids) if task_ids else []
+	if task_ids:
+		conditions.append("st.name IN %(task_ids)s")
+		values["task_ids"] = task_ids
+	elif filters.get("task_id"):
+		conditions.append("st.name = %(task_id)s")
+		values["task_id"] = filters["task_id"]
+
+	return conditions
+
+
+def _canonicalize_filters(filters):
+	"""规范化过滤条件用于缓存键：去除空值，多选列表解析并排序"""
+	canonical = {}
+	for key, value in (filters or {}).items():
+		if key in ("task_ids", "store_ids"):
+			if isinstance(value, str):
+				value = json.loads(value) if value else []
+			value = sorted(value or [])
+		if value in (None, "", [], 0, False):
+			continue
+		canonical[key] = value
+	return canonical
+
+
+def _row_matches_filters(task_data, filters, current_tab, search_text=None):
+	"""判断看板行是否满足 Tab、过滤器与搜索条件"""
+	approval_stat = task_data["approval_status"]
+	store_link_val = task_data["store_id"]
+
+	# 第一步：应用 Tab 筛选
+	if current_tab == 'completed':
+		if approval_stat != '已通过':
+			return False
+	elif current_tab == 'pending':
+		if approval_stat == '已通过':
+			return False
+
+	# 第二步：应用其他过滤器
+	if "store_ids" in filters:
+		store_ids = filters["store_ids"]
+		if isinstance(store_ids, str):
+			store_ids = json.loads(store_ids)
+		if store_ids and len(store_ids) > 0 and store_link_val not in store_ids:
+			return False
+	elif filters.get("store_id") and store_link_val != filters["store_id"]:
+		return False
+
+	if filters.get("channel") and task_data["channel"] != filters["channel"]:
+		return False
+
+	if filters.get("status") and task_data["child_status"] != filters["status"]:
+		return False
+
+	if current_tab == 'pending' and filters.get("approval_status") and approval_stat != filters["approval_status"]:
+		return False
+
+	if filters.get("user") and task_data["user"] != filters["user"]:
+		return False
+
+	if filters.get("is_urgent") and not task_data["is_urgent"]:
+		return False
+
+	# 搜索过滤
+	if search_text:
+		search_lower = search_text.lower()
+		if not (search_lower in task_data["title"].lower() or
+				search_lower in task_data["channel"].lower() or
+				search_lower in task_data["user"].lower() or
+				search_lower in task_data["plan_type"].lower()):
+			return False
+
+	return True
+
+
 @frappe.whitelist()
 def get_filter_options():
-	"""获取过滤器选项"""
+	"""获取过滤器选项（读取 FilterOptionsService 缓存）"""
 	try:
-		# 获取所有渠道
-		channels = frappe.db.sql("""
-			SELECT DISTINCT channel
-			FROM `tabStore List`
-			WHERE channel IS NOT NULL AND channel != ''
-			ORDER BY channel
-		""", as_dict=True)
-
-		# 获取所有负责人
-		users = frappe.db.sql("""
-			SELECT DISTINCT user1 as user
-			FROM `tabStore List`
-			WHERE user1 IS NOT NULL AND user1 != ''
-			ORDER BY user1
-		""", as_dict=True)
-
-		# 获取所有店铺
-		stores = frappe.get_all(
-			"Store List",
-			fields=["name", "shop_name"],
-			order_by="shop_name asc"
-		)
-
-		# 获取所有开启中的任务
-		tasks = frappe.get_all(
-			"Schedule tasks",
-			filters={"status": "开启中"},
-			fields=["name", "type", "start_date", "end_date"],
-			order_by="creation desc"
-		)
-
 		return {
-			"channels": [c["channel"] for c in channels],
-			"users": [u["user"] for u in users],
+			"channels": FilterOptionsService.get_channels(),
+			"users": FilterOptionsService.get_users(),
 			"statuses": ["未开始", "已提交"],
 			"approval_statuses": ["待审批", "已通过", "已驳回"],
 			"plan_types": [
 				{"value": "MON", "label": "月度常规计划"},
 				{"value": "PRO", "label": "专项促销活动"}
 			],
-			"stores": stores,
-			"tasks": tasks
+			"stores": FilterOptionsService.get_stores(),
+			"tasks": FilterOptionsService.get_open_tasks()
 		}
 	except Exception as e:
 		frappe.log_error(title="获取过滤选项失败", message=str(e))
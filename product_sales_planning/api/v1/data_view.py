@@ -4,17 +4,79 @@ Data View API
 从 data_view/data_view.py 迁移
 """
 
-import frappe
-from frappe.utils import getdate, today, format_datetime
+import base64
 import json
-from product_sales_planning.utils.validation_utils import validate_sort_params, validate_page_params
-from product_sales_planning.constants import ALLOWED_SORT_ORDERS
+from datetime import date, datetime
+from decimal import Decimal
+
+import frappe
+from frappe import _
+from frappe.utils import cint, format_datetime, getdate, now_datetime, today
+
+from product_sales_planning.constants import CacheScope
+from product_sales_planning.services.data_view_service import (
+	EMPTY_STATS,
+	STATS_COLUMNS,
+	STATS_FIELDS,
+	DataViewService,
+)
+from product_sales_planning.services.export_cache_service import ExportCacheService
+from product_sales_planning.services.export_service import ExportService
+from product_sales_planning.services.filter_options_service import SEARCH_PAGE_SIZE, FilterOptionsService
+from product_sales_planning.utils.cache_utils import (
+	get_cached_result,
+	get_data_version,
+	get_or_compute,
+	hash_params,
+	set_cached_result,
+)
+from product_sales_planning.utils.csv_utils import build_csv_response
+from product_sales_planning.utils.validation_utils import parse_json_param, validate_page_params
+
+# 汇总维度白名单（维度名 -> (列表达式, 所需关联)），只有白名单中的维度可以拼入 SQL
+ROLLUP_DIMENSIONS = {
+	"channel": ("sl.channel", "sl"),
+	"month": ("DATE_FORMAT(cs.sub_date, '%%Y-%%m')", None),
+	"brand": ("pl.brand", "pl"),
+	"category": ("pl.category", "pl"),
+	"store": ("cs.store_id", None),
+	"task": ("cs.task_id", None)
+}
+
+# 汇总结果缓存有效期（秒），计划数据变化时通过数据版本失效
+ROLLUP_CACHE_TTL = 10 * 60
+
+# 筛选选项搜索每页最大条数
+MAX_SEARCH_PAGE_SIZE = 100
+
+# 总数与统计缓存有效期（秒），同一筛选条件翻页时只执行分页查询
+STATS_CACHE_TTL = 5 * 60
 
 
 @frappe.whitelist()
-def get_data_view(filters=None, page=1, page_size=50, sort_by=None, sort_order="asc"):
+def get_data_view(filters=None, page=1, page_size=50, sort_by=None, sort_order="asc", cursor=None, include_stats=None, fields=None):
 	"""
 	获取跨店铺商品数据列表
+
+	分页方式：
+	- 游标分页（推荐）：传入上次返回的 next_cursor / prev_cursor，按 (排序字段, cs.name) 定位，
+	  只读取所需的一页，深翻页不再扫描并丢弃前面的行
+	- 页码分页：传入 page（LIMIT/OFFSET，保留用于兼容）
+
+	页码分页时分页数据、总数与统计信息来自同一条查询：筛选结果作为 CTE，
+	统计聚合与分页均基于该 CTE，每次筛选只扫描一次关联表。
+	总数与统计按（筛选条件、计划数据版本）缓存，同一筛选条件再次翻页时只执行分页查询
+
+	只关联请求列与筛选条件实际需要的表（见 DataViewService），例如只请求商品计划列、
+	只按任务/店铺/商品/日期筛选时不关联任何其他表
+
+	Args:
+		cursor: 分页游标（不透明字符串），传入时忽略 page
+		include_stats: 是否返回总数与统计（页码分页默认返回，游标分页默认不返回）
+		fields: 需要返回的列（JSON 数组或逗号分隔），为空时返回全部列；name 与排序列总会返回
+
+	Returns:
+		dict: 额外包含 next_cursor / prev_cursor（无更多数据时为 None）与 has_more
 	"""
 	try:
 		# 解析过滤器参数
@@ -23,187 +85,41 @@ def get_data_view(filters=None, page=1, page_size=50, sort_by=None, sort_order="
 		elif filters is None:
 			filters = {}
 
-		# 构建 WHERE 条件
-		conditions = ["1=1"]
-		values = {}
-
-		# 任务筛选
-		if filters.get("task_ids"):
-			task_ids = filters["task_ids"]
-			if isinstance(task_ids, str):
-				task_ids = [task_ids]
-			elif not isinstance(task_ids, list):
-				task_ids = [task_ids]
-			conditions.append("st.name IN %(task_ids)s")
-			values["task_ids"] = task_ids
-
-		# 店铺筛选
-		if filters.get("store_ids"):
-			store_ids = filters["store_ids"]
-			if isinstance(store_ids, str):
-				store_ids = [store_ids]
-			elif not isinstance(store_ids, list):
-				store_ids = [store_ids]
-			conditions.append("cs.store_id IN %(store_ids)s")
-			values["store_ids"] = store_ids
-
-		# 商品筛选
-		if filters.get("product_codes"):
-			product_codes = filters["product_codes"]
-			if isinstance(product_codes, str):
-				product_codes = [product_codes]
-			elif not isinstance(product_codes, list):
-				product_codes = [product_codes]
-			conditions.append("cs.code IN %(product_codes)s")
-			values["product_codes"] = product_codes
-
-		# 货品计划日期筛选（sub_date）
-		if filters.get("plan_date"):
-			conditions.append("DATE(cs.sub_date) = %(plan_date)s")
-			values["plan_date"] = filters["plan_date"]
-
-		# 渠道筛选
-		if filters.get("channels"):
-			channels = filters["channels"]
-			if isinstance(channels, str):
-				channels = [channels]
-			elif not isinstance(channels, list):
-				channels = [channels]
-			conditions.append("sl.channel IN %(channels)s")
-			values["channels"] = channels
-
-		# 审批状态筛选
-		if filters.get("approval_statuses"):
-			approval_statuses = filters["approval_statuses"]
-			if isinstance(approval_statuses, str):
-				approval_statuses = [approval_statuses]
-			elif not isinstance(approval_statuses, list):
-				approval_statuses = [approval_statuses]
-			conditions.append("ts.approval_status IN %(approval_statuses)s")
-			values["approval_statuses"] = approval_statuses
-
-		# 提交状态筛选
-		if filters.get("submission_statuses"):
-			submission_statuses = filters["submission_statuses"]
-			if isinstance(submission_statuses, str):
-				submission_statuses = [submission_statuses]
-			elif not isinstance(submission_statuses, list):
-				submission_statuses = [submission_statuses]
-			conditions.append("ts.status IN %(submission_statuses)s")
-			values["submission_statuses"] = submission_statuses
-
-		where_clause = " AND ".join(conditions)
-
-		# 排序字段映射
-		sort_field_map = {
-			"shop_name": "sl.shop_name",
-			"channel": "sl.channel",
-			"code": "cs.code",
-			"product_name": "pl.name1",
-			"quantity": "cs.quantity",
-			"sub_date": "cs.sub_date",
-			"approval_status": "ts.approval_status",
-			"user": "ts.user"
-		}
+		conditions = DataViewService.build_conditions(filters)
+		stats_key = _get_stats_cache_key(filters)
 
-		# 验证排序参数，防止SQL注入
-		allowed_fields = list(sort_field_map.keys())
-		sort_by, sort_order = validate_sort_params(sort_by, sort_order, allowed_fields)
-
-		order_by_clause = ""
-		if sort_by and sort_by in sort_field_map:
-			order_by_clause = f"ORDER BY {sort_field_map[sort_by]} {sort_order}"
-		else:
-			order_by_clause = "ORDER BY cs.sub_date DESC"
+		# 验证排序参数与请求列，防止SQL注入
+		sort_by, sort_order = DataViewService.validate_sort(sort_by, sort_order)
+		fields = DataViewService.resolve_fields(fields, required=("name", sort_by))
 
 		# 验证并计算分页参数
 		page, page_size = validate_page_params(page, page_size)
-		offset = (page - 1) * page_size
-
-		# 查询数据
-		query = f"""
-			SELECT
-				cs.name,
-				cs.store_id,
-				sl.shop_name,
-				sl.channel,
-				cs.code,
-				pl.name1 as product_name,
-				pl.specifications,
-				pl.brand,
-				pl.category,
-				cs.quantity,
-				cs.sub_date,
-				ts.approval_status,
-				ts.status as submission_status,
-				ts.user,
-				st.type as task_type,
-				st.name as task_id,
-				st.start_date,
-				st.end_date
-			FROM `tabCommodity Schedule` cs
-			LEFT JOIN `tabStore List` sl ON cs.store_id = sl.name
-			LEFT JOIN `tabProduct List` pl ON cs.code = pl.name
-			LEFT JOIN `tabSchedule tasks` st ON cs.task_id = st.name
-			LEFT JOIN `tabTasks Store` ts ON ts.parent = st.name AND ts.store_name = cs.store_id
-			WHERE {where_clause}
-			{order_by_clause}
-			LIMIT %(limit)s OFFSET %(offset)s
-		"""
-
-		values["limit"] = int(page_size)
-		values["offset"] = offset
-
-		data = frappe.db.sql(query, values, as_dict=True)
 
-		# 查询总记录数
-		count_query = f"""
-			SELECT COUNT(*) as total
-			FROM `tabCommodity Schedule` cs
-			LEFT JOIN `tabStore List` sl ON cs.store_id = sl.name
-			LEFT JOIN `tabProduct List` pl ON cs.code = pl.name
-			LEFT JOIN `tabSchedule tasks` st ON cs.task_id = st.name
-			LEFT JOIN `tabTasks Store` ts ON ts.parent = st.name AND ts.store_name = cs.store_id
-			WHERE {where_clause}
-		"""
-
-		total_result = frappe.db.sql(count_query, values, as_dict=True)
-		total = total_result[0]["total"] if total_result else 0
-
-		# 计算统计信息
-		stats_query = f"""
-			SELECT
-				COUNT(DISTINCT cs.store_id) as total_stores,
-				COUNT(DISTINCT cs.code) as total_products,
-				SUM(cs.quantity) as total_quantity,
-				COUNT(DISTINCT CASE WHEN ts.approval_status = '已通过' THEN cs.store_id END) as completed_stores,
-				COUNT(DISTINCT CASE WHEN ts.approval_status = '待审批' THEN cs.store_id END) as pending_stores,
-				COUNT(DISTINCT CASE WHEN ts.approval_status = '已驳回' THEN cs.store_id END) as rejected_stores
-			FROM `tabCommodity Schedule` cs
-			LEFT JOIN `tabStore List` sl ON cs.store_id = sl.name
-			LEFT JOIN `tabProduct List` pl ON cs.code = pl.name
-			LEFT JOIN `tabSchedule tasks` st ON cs.task_id = st.name
-			LEFT JOIN `tabTasks Store` ts ON ts.parent = st.name AND ts.store_name = cs.store_id
-			WHERE {where_clause}
-		"""
-
-		stats_result = frappe.db.sql(stats_query, values, as_dict=True)
-		stats = stats_result[0] if stats_result else {
-			"total_stores": 0,
-			"total_products": 0,
-			"total_quantity": 0,
-			"completed_stores": 0,
-			"pending_stores": 0,
-			"rejected_stores": 0
-		}
+		if cursor:
+			result = _get_data_view_page_by_cursor(
+				fields, conditions, sort_by, sort_order, page_size, _decode_cursor(cursor, sort_by, sort_order)
+			)
+			if include_stats is not None and cint(include_stats):
+				result.update(get_or_compute(
+					stats_key,
+					lambda: DataViewService.get_stats(*conditions),
+					expires_in_sec=STATS_CACHE_TTL
+				))
+			else:
+				result.update({"total": None, "stats": None})
+		else:
+			result = _get_data_view_page_by_offset(fields, conditions, sort_by, sort_order, page, page_size, stats_key)
 
 		return {
 			"status": "success",
-			"data": data,
-			"total": total,
+			"data": result["data"],
+			"total": result["total"],
 			"page": int(page),
 			"page_size": int(page_size),
-			"stats": stats
+			"stats": result["stats"],
+			"next_cursor": result["next_cursor"],
+			"prev_cursor": result["prev_cursor"],
+			"has_more": result["has_more"]
 		}
 
 	except Exception as e:
@@ -215,58 +131,339 @@ def get_data_view(filters=None, page=1, page_size=50, sort_by=None, sort_order="
 			"total": 0,
 			"page": 1,
 			"page_size": 50,
-			"stats": {
-				"total_stores": 0,
-				"total_products": 0,
-				"total_quantity": 0,
-				"completed_stores": 0,
-				"pending_stores": 0,
-				"rejected_stores": 0
-			}
+			"stats": dict(EMPTY_STATS),
+			"next_cursor": None,
+			"prev_cursor": None,
+			"has_more": False
 		}
 
 
-@frappe.whitelist()
-def get_data_view_filter_options():
-	"""获取数据查看页面的筛选器选项"""
-	try:
-		# 获取所有开启中的任务
-		tasks = frappe.get_all(
-			"Schedule tasks",
-			filters={"status": "开启中"},
-			fields=["name", "type", "start_date", "end_date"],
-			order_by="creation desc"
+def _get_data_view_page_by_offset(fields, conditions, sort_by, sort_order, page, page_size, stats_key=None):
+	"""
+	页码分页：一条查询返回分页数据、总数与统计（统计为单行聚合，与分页结果 LEFT JOIN，页为空时仍返回统计）
+
+	stats_key 对应的缓存命中时只查询分页数据（只关联请求列所需的表）；未命中时合并查询并写入缓存
+	"""
+	where_clause, values, filter_joins = conditions
+	offset = (page - 1) * page_size
+	values = dict(values, limit=int(page_size), offset=offset)
+
+	cached = get_cached_result(stats_key) if stats_key else None
+	if cached is not None:
+		data = frappe.db.sql(f"""
+			{DataViewService.build_query(fields, where_clause, filter_joins)}
+			ORDER BY {DataViewService.get_sort_column(sort_by)} {sort_order}, cs.name {sort_order}
+			LIMIT %(limit)s OFFSET %(offset)s
+		""", values, as_dict=True)
+		return _build_offset_page(data, cached["total"], dict(cached["stats"]), sort_by, sort_order, offset)
+
+	# 合并查询：CTE 同时包含请求列与统计列，分页子查询只取请求列
+	cte_fields = DataViewService.resolve_fields(fields, required=STATS_FIELDS)
+	page_columns = ", ".join(f"`{field}`" for field in fields)
+
+	query = f"""
+		WITH filtered AS (
+			{DataViewService.build_query(cte_fields, where_clause, filter_joins)}
+		),
+		agg AS (
+			SELECT
+				COUNT(*) as total,
+				{STATS_COLUMNS}
+			FROM filtered
 		)
+		SELECT agg.*, page_rows.*
+		FROM agg
+		LEFT JOIN (
+			SELECT {page_columns} FROM filtered
+			ORDER BY `{sort_by}` {sort_order}, name {sort_order}
+			LIMIT %(limit)s OFFSET %(offset)s
+		) page_rows ON 1=1
+		ORDER BY page_rows.`{sort_by}` {sort_order}, page_rows.name {sort_order}
+	"""
+
+	rows = frappe.db.sql(query, values, as_dict=True)
 
-		# 获取所有店铺
-		stores = frappe.get_all(
-			"Store List",
-			fields=["name", "shop_name", "channel"],
-			order_by="shop_name asc"
+	total = 0
+	stats = dict(EMPTY_STATS)
+	data = []
+	for row in rows:
+		total = row.pop("total") or 0
+		for key in EMPTY_STATS:
+			stats[key] = row.pop(key)
+		if row.get("name") is not None:
+			data.append(row)
+
+	if stats_key:
+		set_cached_result(stats_key, {"total": total, "stats": dict(stats)}, STATS_CACHE_TTL)
+
+	return _build_offset_page(data, total, stats, sort_by, sort_order, offset)
+
+
+def _build_offset_page(data, total, stats, sort_by, sort_order, offset):
+	"""组装页码分页结果（含前后游标，便于从页码分页切换到游标分页）"""
+	has_more = offset + len(data) < total
+	return {
+		"data": data,
+		"total": total,
+		"stats": stats,
+		"has_more": has_more,
+		"next_cursor": _encode_cursor(data[-1], sort_by, sort_order, "next") if data and has_more else None,
+		"prev_cursor": _encode_cursor(data[0], sort_by, sort_order, "prev") if data and offset > 0 else None
+	}
+
+
+def _get_data_view_page_by_cursor(fields, conditions, sort_by, sort_order, page_size, cursor):
+	"""
+	游标分页：在基础表上按 (排序字段, cs.name) 定位，多取一行判断是否还有更多数据
+
+	向前翻页时按相反方向查询，再把结果翻转回正常顺序
+	"""
+	where_clause, values, filter_joins = conditions
+	sort_column = DataViewService.get_sort_column(sort_by)
+	forward = cursor["direction"] == "next"
+	query_order = sort_order if forward else ("ASC" if sort_order == "DESC" else "DESC")
+
+	seek_clause = _build_seek_clause(sort_column, query_order, cursor["value"] is None)
+	values = dict(values, seek_value=cursor["value"], seek_name=cursor["name"], limit=int(page_size) + 1)
+
+	rows = frappe.db.sql(f"""
+		{DataViewService.build_query(fields, f"{where_clause} AND ({seek_clause})", filter_joins)}
+		ORDER BY {sort_column} {query_order}, cs.name {query_order}
+		LIMIT %(limit)s
+	""", values, as_dict=True)
+
+	has_more = len(rows) > page_size
+	data = rows[:page_size]
+	if not forward:
+		data.reverse()
+
+	# 向后翻页时前面必有数据；向前翻页时后面必有数据
+	has_next = has_more if forward else True
+	has_prev = True if forward else has_more
+
+	return {
+		"data": data,
+		"has_more": has_next,
+		"next_cursor": _encode_cursor(data[-1], sort_by, sort_order, "next") if data and has_next else None,
+		"prev_cursor": _encode_cursor(data[0], sort_by, sort_order, "prev") if data and has_prev else None
+	}
+
+
+def _get_stats_cache_key(filters):
+	"""总数与统计的缓存键：计划数据版本 + 规范化筛选条件的哈希"""
+	return f"data_view_stats:{get_data_version(CacheScope.PLAN)}:{hash_params(_canonicalize_filters(filters))}"
+
+
+def _canonicalize_filters(filters):
+	"""规范化筛选条件用于缓存键：去除空值，列表值排序"""
+	canonical = {}
+	for key, value in (filters or {}).items():
+		if isinstance(value, (list, tuple)):
+			value = sorted(str(item) for item in value)
+		if value in (None, "", []):
+			continue
+		canonical[key] = value
+	return canonical
+
+
+def _build_seek_clause(column, order, value_is_null):
+	"""
+	构建定位到游标之后的条件（MariaDB 中 NULL 升序在前、降序在后）
+
+	Args:
+		column: 排序列（基础表列）
+		order: 实际查询方向 ASC / DESC
+		value_is_null: 游标行的排序值是否为 NULL
+	"""
+	if order == "ASC":
+		if value_is_null:
+			return f"({column} IS NULL AND cs.name > %(seek_name)s) OR {column} IS NOT NULL"
+		return f"{column} > %(seek_value)s OR ({column} = %(seek_value)s AND cs.name > %(seek_name)s)"
+
+	if value_is_null:
+		return f"{column} IS NULL AND cs.name < %(seek_name)s"
+	return f"{column} < %(seek_value)s OR ({column} = %(seek_value)s AND cs.name < %(seek_name)s) OR {column} IS NULL"
+
+
+def _encode_cursor(row, sort_by, sort_order, direction):
+	"""将行的排序值与 name 编码为不透明游标"""
+	value = row.get(sort_by)
+	payload = {
+		"s": sort_by,
+		"o": sort_order,
+		"d": direction,
+		"v": str(value) if isinstance(value, (date, datetime, Decimal)) else value,
+		"n": row.get("name")
+	}
+	raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor, sort_by, sort_order):
+	"""解析游标；游标与当前排序不一致时视为无效"""
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+		payload = json.loads(raw)
+		valid = (
+			payload.get("s") == sort_by
+			and payload.get("o") == sort_order
+			and payload.get("d") in ("next", "prev")
+			and payload.get("n")
 		)
+	except Exception:
+		valid = False
+
+	if not valid:
+		frappe.throw(_("分页游标无效或与当前排序不一致，请从第一页重新加载"))
+
+	return {"direction": payload["d"], "value": payload.get("v"), "name": payload["n"]}
+
+
+@frappe.whitelist()
+def get_plan_rollup(dimensions, filters=None, with_subtotals=0):
+	"""
+	按维度汇总商品计划（渠道 × 月份 × 品牌 × 类别 等）
+
+	Args:
+		dimensions: 分组维度列表（JSON），可选 channel / month / brand / category / store / task，按给定顺序分组
+		filters: 与 get_data_view 相同的筛选条件
+		with_subtotals: 是否返回小计与总计行（WITH ROLLUP）
+
+	Returns:
+		dict: data 为汇总行 {维度..., total_quantity, store_count, product_count, record_count, is_subtotal, level}；
+			小计行中未参与汇总的维度为 None，level 为参与分组的维度数（总计行为 0）
+
+	结果按（维度、筛选条件、计划数据版本）缓存，计划数据变化后自动失效
+	"""
+	try:
+		dimensions = parse_json_param(dimensions, "dimensions")
+		if isinstance(dimensions, str):
+			dimensions = [dimensions]
+		if not dimensions:
+			frappe.throw(_("请至少选择一个汇总维度"))
+
+		invalid = [d for d in dimensions if d not in ROLLUP_DIMENSIONS]
+		if invalid:
+			frappe.throw(_("不支持的汇总维度: {0}").format(", ".join(map(str, invalid))))
+		if len(set(dimensions)) != len(dimensions):
+			frappe.throw(_("汇总维度不能重复"))
+
+		if isinstance(filters, str):
+			filters = json.loads(filters) if filters else {}
+		elif filters is None:
+			filters = {}
+
+		with_subtotals = cint(with_subtotals)
 
-		# 获取所有商品
-		products = frappe.get_all(
-			"Product List",
-			fields=["name", "name1", "code", "brand", "category"],
-			order_by="name1 asc",
-			limit_page_length=1000
+		cache_key = "plan_rollup:{version}:{params}".format(
+			version=get_data_version(CacheScope.PLAN),
+			params=hash_params({
+				"dimensions": dimensions,
+				"filters": _canonicalize_filters(filters),
+				"with_subtotals": with_subtotals
+			})
 		)
+		data = get_or_compute(
+			cache_key,
+			lambda: _compute_plan_rollup(dimensions, filters, with_subtotals),
+			expires_in_sec=ROLLUP_CACHE_TTL
+		)
+
+		return {
+			"status": "success",
+			"dimensions": dimensions,
+			"data": data
+		}
+
+	except Exception as e:
+		frappe.log_error(title="获取计划汇总失败", message=str(e))
+		return {
+			"status": "error",
+			"message": str(e),
+			"dimensions": [],
+			"data": []
+		}
 
-		# 获取所有渠道
-		channels = frappe.db.sql("""
-			SELECT DISTINCT channel
-			FROM `tabStore List`
-			WHERE channel IS NOT NULL AND channel != ''
-			ORDER BY channel
-		""", as_dict=True)
 
+def _compute_plan_rollup(dimensions, filters, with_subtotals):
+	"""
+	执行汇总查询
+
+	维度值先以 COALESCE 转为空串，使 WITH ROLLUP 产生的 NULL 只代表小计行
+	"""
+	where_clause, values, joins = DataViewService.build_conditions(filters)
+
+	dim_columns = [f"d{idx}" for idx in range(len(dimensions))]
+	dim_selects = []
+	for dim, col in zip(dimensions, dim_columns, strict=True):
+		expression, join = ROLLUP_DIMENSIONS[dim]
+		dim_selects.append(f"COALESCE({expression}, '') AS {col}")
+		if join:
+			joins.add(join)
+	dim_selects = ",\n".join(dim_selects)
+	group_by = ", ".join(dim_columns)
+
+	# WITH ROLLUP 不能与 ORDER BY 同用，依赖 GROUP BY 的隐式排序
+	if with_subtotals:
+		group_clause = f"GROUP BY {group_by} WITH ROLLUP"
+	else:
+		group_clause = f"GROUP BY {group_by} ORDER BY {group_by}"
+
+	rows = frappe.db.sql(f"""
+		SELECT
+			{group_by},
+			SUM(quantity) AS total_quantity,
+			COUNT(DISTINCT store_id) AS store_count,
+			COUNT(DISTINCT code) AS product_count,
+			COUNT(*) AS record_count
+		FROM (
+			SELECT
+				{dim_selects},
+				cs.quantity,
+				cs.store_id,
+				cs.code
+			{DataViewService.build_from_clause(joins)}
+			WHERE {where_clause}
+		) grouped
+		{group_clause}
+	""", values, as_dict=True)
+
+	result = []
+	for row in rows:
+		item = {}
+		level = 0
+		for dim, col in zip(dimensions, dim_columns, strict=True):
+			value = row[col]
+			if value is not None:
+				level += 1
+			item[dim] = value or None
+		item.update({
+			"total_quantity": row.total_quantity or 0,
+			"store_count": row.store_count,
+			"product_count": row.product_count,
+			"record_count": row.record_count,
+			"is_subtotal": level < len(dimensions),
+			"level": level
+		})
+		result.append(item)
+
+	return result
+
+
+@frappe.whitelist()
+def get_data_view_filter_options():
+	"""
+	获取数据查看页面的筛选器选项
+
+	仅返回数量较小的选项（任务、渠道、状态）；商品与店铺数量较大，
+	由前端输入时调用 search_filter_options 分页加载
+	"""
+	try:
+		# 任务、渠道读取共享的筛选器选项缓存
 		return {
 			"status": "success",
-			"tasks": tasks,
-			"stores": stores,
-			"products": products,
-			"channels": [c["channel"] for c in channels],
+			"tasks": FilterOptionsService.get_open_tasks(),
+			"channels": FilterOptionsService.get_channels(),
 			"approval_statuses": ["待审批", "已通过", "已驳回"],
 			"submission_statuses": ["未开始", "已提交"]
 		}
@@ -277,8 +474,6 @@ def get_data_view_filter_options():
 			"status": "error",
 			"message": str(e),
 			"tasks": [],
-			"stores": [],
-			"products": [],
 			"channels": [],
 			"approval_statuses": [],
 			"submission_statuses": []
@@ -286,83 +481,79 @@ def get_data_view_filter_options():
 
 
 @frappe.whitelist()
-def export_data_view(filters=None):
-	"""导出数据为 Excel"""
+def search_filter_options(option_type, txt=None, page=1, page_size=SEARCH_PAGE_SIZE):
+	"""
+	筛选器选项输入搜索（按编码/ID 或名称前缀匹配，分页）
+
+	Args:
+		option_type: 选项类型 products | stores
+		txt: 输入的搜索文本，为空时按名称顺序返回第一页
+		page: 页码
+		page_size: 每页条数（最多 MAX_SEARCH_PAGE_SIZE）
+
+	Returns:
+		dict: {"status", "data", "page", "page_size", "has_more"}
+	"""
 	try:
-		import openpyxl
-		from openpyxl.styles import Font, Alignment, PatternFill
-		from frappe.utils import get_site_path
-		import os
-
-		# 获取所有数据（不分页）
-		result = get_data_view(filters=filters, page=1, page_size=999999)
-
-		if result["status"] != "success":
-			return {"status": "error", "message": "获取数据失败"}
-
-		data = result["data"]
-
-		# 创建工作簿
-		wb = openpyxl.Workbook()
-		ws = wb.active
-		ws.title = "数据查看"
-
-		# 写入表头
-		headers = [
-			"店铺名称", "渠道", "商品编码", "商品名称", "规格", "品牌", "类别",
-			"数量", "提交时间", "审批状态", "提交状态", "负责人", "任务类型",
-			"任务开始日期", "任务结束日期"
-		]
-
-		for col_idx, header in enumerate(headers, 1):
-			cell = ws.cell(row=1, column=col_idx, value=header)
-			cell.font = Font(bold=True)
-			cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-			cell.alignment = Alignment(horizontal="center", vertical="center")
-
-		# 写入数据
-		for row_idx, row_data in enumerate(data, 2):
-			ws.cell(row=row_idx, column=1, value=row_data.get("shop_name", ""))
-			ws.cell(row=row_idx, column=2, value=row_data.get("channel", ""))
-			ws.cell(row=row_idx, column=3, value=row_data.get("code", ""))
-			ws.cell(row=row_idx, column=4, value=row_data.get("product_name", ""))
-			ws.cell(row=row_idx, column=5, value=row_data.get("specifications", ""))
-			ws.cell(row=row_idx, column=6, value=row_data.get("brand", ""))
-			ws.cell(row=row_idx, column=7, value=row_data.get("category", ""))
-			ws.cell(row=row_idx, column=8, value=row_data.get("quantity", 0))
-			ws.cell(row=row_idx, column=9, value=format_datetime(row_data.get("sub_date"), "yyyy-MM-dd HH:mm") if row_data.get("sub_date") else "")
-			ws.cell(row=row_idx, column=10, value=row_data.get("approval_status", ""))
-			ws.cell(row=row_idx, column=11, value=row_data.get("submission_status", ""))
-			ws.cell(row=row_idx, column=12, value=row_data.get("user", ""))
-			ws.cell(row=row_idx, column=13, value=row_data.get("task_type", ""))
-			ws.cell(row=row_idx, column=14, value=format_datetime(row_data.get("start_date"), "yyyy-MM-dd") if row_data.get("start_date") else "")
-			ws.cell(row=row_idx, column=15, value=format_datetime(row_data.get("end_date"), "yyyy-MM-dd") if row_data.get("end_date") else "")
-
-		# 调整列宽
-		for col in ws.columns:
-			max_length = 0
-			column = col[0].column_letter
-			for cell in col:
-				try:
-					if len(str(cell.value)) > max_length:
-						max_length = len(str(cell.value))
-				except:
-					pass
-			adjusted_width = min(max_length + 2, 50)
-			ws.column_dimensions[column].width = adjusted_width
-
-		# 保存文件
-		file_name = f"数据查看_{frappe.utils.now()}.xlsx"
-		file_path = os.path.join(get_site_path(), "public", "files", file_name)
-
-		wb.save(file_path)
-
-		# 返回文件 URL
-		file_url = f"/files/{file_name}"
+		searchers = {
+			"products": FilterOptionsService.search_products,
+			"stores": FilterOptionsService.search_stores
+		}
+		if option_type not in searchers:
+			frappe.throw(_("不支持的选项类型: {0}").format(option_type))
+
+		page, page_size = validate_page_params(page, page_size, MAX_SEARCH_PAGE_SIZE)
+		txt = (txt or "").strip()
 
+		result = searchers[option_type](txt, start=(page - 1) * page_size, page_length=page_size)
 		return {
 			"status": "success",
-			"file_url": file_url,
+			"data": result["data"],
+			"page": page,
+			"page_size": page_size,
+			"has_more": result["has_more"]
+		}
+
+	except Exception as e:
+		frappe.log_error(title="搜索筛选选项失败", message=str(e))
+		return {
+			"status": "error",
+			"message": str(e),
+			"data": [],
+			"page": 1,
+			"page_size": SEARCH_PAGE_SIZE,
+			"has_more": False
+		}
+
+
+@frappe.whitelist()
+def export_data_view(filters=None, sort_by=None, sort_order="asc"):
+	"""
+	导出数据为 Excel
+
+	使用无缓冲游标逐行读取，openpyxl write_only 模式流式写出，
+	内存占用与导出行数无关；列宽根据表头与前若干行数据计算
+
+	同步导出会占用 Web 进程，大数据量请使用 import_export.enqueue_export（export_type=data_view）；
+	筛选条件、排序与计划数据均未变化时直接返回已有文件（见 ExportCacheService）
+	"""
+	try:
+		if isinstance(filters, str):
+			filters = json.loads(filters) if filters else {}
+		elif filters is None:
+			filters = {}
+
+		result = ExportCacheService.get_or_create(
+			"data_view",
+			{"filters": _canonicalize_filters(filters), "sort_by": sort_by, "sort_order": sort_order},
+			"数据查看_export.xlsx",
+			lambda file_path: ExportService.write_data_view_workbook(file_path, filters, sort_by, sort_order),
+			allow_empty=True
+		)
+
+		return {
+			"status": "success",
+			"file_url": result["file_url"],
 			"message": "导出成功"
 		}
 
@@ -371,4 +562,34 @@ def export_data_view(filters=None):
 		return {
 			"status": "error",
 			"message": str(e)
-		}
\ No newline at end of file
+		}
+
+
+@frappe.whitelist()
+def export_data_view_csv(filters=None, sort_by=None, sort_order="asc", gzip=0):
+	"""
+	以 CSV 流式导出数据查看结果
+
+	逐行读取并分块写入 HTTP 响应，不生成临时文件；gzip=1 时使用 gzip Content-Encoding
+	"""
+	try:
+		if isinstance(filters, str):
+			filters = json.loads(filters) if filters else {}
+		elif filters is None:
+			filters = {}
+
+		headers, rows = DataViewService.iter_export_rows(filters, sort_by, sort_order)
+
+		return build_csv_response(
+			f"数据查看_{now_datetime().strftime('%Y%m%d_%H%M%S')}.csv",
+			headers,
+			rows,
+			gzip=cint(gzip)
+		)
+
+	except Exception as e:
+		frappe.log_error(title="导出CSV失败", message=str(e))
+		return {
+			"status": "error",
+			"message": str(e)
+		}
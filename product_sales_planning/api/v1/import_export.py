@@ -5,265 +5,113 @@ Import/Export API
 """
 
 import frappe
-from product_sales_planning.utils.response_utils import success_response, error_response
-from product_sales_planning.utils.validation_utils import validate_required_params
+from frappe.utils import cint
+
+from product_sales_planning.constants import CacheScope
 from product_sales_planning.services.commodity_service import CommodityScheduleService
+from product_sales_planning.services.export_service import ExportJobService, ExportService
+from product_sales_planning.services.import_service import MAX_IMPORT_ERRORS, ImportJobService, ImportService
+from product_sales_planning.utils.cache_utils import bump_data_version
+from product_sales_planning.utils.realtime_utils import publish_plan_event
+from product_sales_planning.utils.response_utils import error_response, success_response
+from product_sales_planning.utils.validation_utils import parse_json_param, validate_required_params
 
 
 @frappe.whitelist()
-def download_import_template(task_id=None):
-	"""生成并下载Excel导入模板"""
+def download_import_template(task_id=None, multi_store=0):
+	"""
+	获取Excel导入模板
+
+	模板按月份窗口生成一次并缓存（内容地址），相同月份窗口直接返回已有文件地址；
+	multi_store=1 时返回首列为店铺的多店铺导入模板
+	"""
 	try:
-		import openpyxl
-		from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-		from frappe.utils.file_manager import save_file
-		import io
-		from datetime import datetime
+		from product_sales_planning.services.template_service import ImportTemplateService
 		from product_sales_planning.utils.date_utils import get_next_n_months
 
-		wb = openpyxl.Workbook()
-		ws = wb.active
-		ws.title = "商品计划导入模板"
-
-		# 定义样式
-		header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-		header_font = Font(bold=True, color="FFFFFF", size=11)
-		border = Border(
-			left=Side(style='thin'),
-			right=Side(style='thin'),
-			top=Side(style='thin'),
-			bottom=Side(style='thin')
-		)
-
-		# 生成月份列：优先使用任务日期范围
+		# 月份列：优先使用任务日期范围
 		months = CommodityScheduleService.get_task_months(task_id, fallback_months=4) if task_id else get_next_n_months(n=4, include_current=False)
 
-		# 设置表头
-		headers = ['产品编码', '产品名称'] + months
-		ws.append(headers)
-
-		# 设置表头样式
-		for col_num in range(1, len(headers) + 1):
-			cell = ws.cell(row=1, column=col_num)
-			cell.fill = header_fill
-			cell.font = header_font
-			cell.alignment = Alignment(horizontal='center', vertical='center')
-			cell.border = border
-
-		# 添加示例数据
-		example_row1 = ['PROD001', '示例商品A'] + [100 + i * 10 for i in range(len(months))]
-		example_row2 = ['PROD002', '示例商品B'] + [50 + i * 5 for i in range(len(months))]
-
-		for row_data in [example_row1, example_row2]:
-			ws.append(row_data)
-			for col_num in range(1, len(headers) + 1):
-				cell = ws.cell(row=ws.max_row, column=col_num)
-				cell.border = border
-				if col_num > 2:
-					cell.alignment = Alignment(horizontal='right', vertical='center')
-
-		# 设置列宽
-		ws.column_dimensions['A'].width = 15
-		ws.column_dimensions['B'].width = 25
-		for i in range(len(months)):
-			col_letter = openpyxl.utils.get_column_letter(i + 3)
-			ws.column_dimensions[col_letter].width = 12
-
-		# 添加说明工作表
-		ws_info = wb.create_sheet("填写说明")
-		instructions = [
-			["商品计划导入模板使用说明", ""],
-			["", ""],
-			["1. 基本要求", ""],
-			["", "• 产品编码必须在系统中存在"],
-			["", "• 产品名称仅用于参考，不影响导入"],
-			["", "• 月份格式支持：2025-01、202501、2025/01"],
-			["", "• 数量必须为整数，空值或0将被跳过"],
-			["", ""],
-			["2. 导入规则", ""],
-			["", "• 如果记录已存在（相同店铺+任务+产品+月份），将更新数量"],
-			["", "• 如果记录不存在，将创建新记录"],
-			["", "• 导入前请确保已选择店铺和计划任务"],
-			["", ""],
-			["3. 注意事项", ""],
-			["", "• 请勿修改表头行"],
-			["", "• 建议单次导入不超过1000行数据"],
-			["", "• 导入完成后请检查导入结果"],
-		]
-
-		for row_data in instructions:
-			ws_info.append(row_data)
-
-		ws_info.column_dimensions['A'].width = 20
-		ws_info.column_dimensions['B'].width = 50
-		title_cell = ws_info['A1']
-		title_cell.font = Font(bold=True, size=14, color="4472C4")
-
-		# 保存到内存
-		file_content = io.BytesIO()
-		wb.save(file_content)
-		file_content.seek(0)
-
-		filename = f"commodity_plan_import_template_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-		file_doc = save_file(
-			fname=filename,
-			content=file_content.read(),
-			dt=None,
-			dn=None,
-			is_private=0
-		)
-
+		template = ImportTemplateService.get_template(months, multi_store=cint(multi_store))
 		return success_response(
-			file_url=file_doc.file_url,
-			file_name=filename
+			file_url=template["file_url"],
+			file_name=template["file_name"]
 		)
 
 	except Exception as e:
 		import traceback
 		error_msg = traceback.format_exc()
 		frappe.log_error(title="生成导入模板失败", message=error_msg)
-		return error_response(message=f"生成模板失败: {str(e)}")
+		return error_response(message=f"生成模板失败: {e!s}")
 
 
 @frappe.whitelist()
-def import_commodity_data(store_id, task_id, file_url):
-	"""从Excel导入商品计划数据"""
+def import_commodity_data(store_id=None, task_id=None, file_url=None, dry_run=0):
+	"""
+	从Excel / CSV / TSV 导入商品计划数据（表头相同：产品编码、产品名称、月份列）
+
+	流式读取文件，商品编码与已有计划各批量查询一次，新增与更新分块批量写入（见 ImportService）
+
+	Args:
+		store_id: 店铺ID；为空时按多店铺文件导入（首列为店铺），结果另含各店铺计数 stores
+		dry_run: 为 1 时只校验并与当前计划比对，返回将新增/更新/无变化的数量与变更样例，不写入
+	"""
 	try:
-		import openpyxl
 		from frappe.utils.file_manager import get_file_path
-		from product_sales_planning.utils.date_utils import parse_month_string
-		from product_sales_planning.utils.date_utils import get_month_first_day
 
 		validate_required_params(
-			{"store_id": store_id, "task_id": task_id},
-			["store_id", "task_id"]
+			{"task_id": task_id, "file_url": file_url},
+			["task_id", "file_url"]
 		)
 
 		# 获取文件路径
 		try:
 			file_path = get_file_path(file_url)
 		except Exception as e:
-			return error_response(message=f"无法获取文件: {str(e)}")
+			return error_response(message=f"无法获取文件: {e!s}")
 
-		# 读取Excel文件
+		# 读取导入文件（xlsx / csv / tsv）：文件按行流式读取，只有读取异常在此处理，
+		# 写入异常交给外层记录日志并返回"导入失败"
+		rows = _read_import_rows(ImportService.iter_file_rows(file_path))
 		try:
-			wb = openpyxl.load_workbook(file_path, data_only=True)
-			ws = wb.active
-		except Exception as e:
-			return error_response(message=f"无法读取Excel文件: {str(e)}")
-
-		# 读取表头
-		headers = []
-		for cell in ws[1]:
-			if cell.value:
-				headers.append(str(cell.value).strip())
-			else:
-				headers.append("")
-
-		if len(headers) < 3:
-			return error_response(message="Excel格式错误：至少需要3列（产品编码、产品名称、月份数据）")
-
-		# 解析月份列
-		month_columns = [h for h in headers[2:] if h]
-
-		if not month_columns:
-			return error_response(message="Excel格式错误：未找到月份列")
-
-		# 任务允许的月份集合（用于校验全量与对应月份）
-		allowed_months = set(CommodityScheduleService.get_task_months(task_id, fallback_months=4))
-
-		inserted_count = 0
-		updated_count = 0
-		errors = []
-		skipped_count = 0
-
-		# 从第2行开始读取数据
-		for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-			if not row or not row[0]:
-				skipped_count += 1
-				continue
-
-			try:
-				product_code = str(row[0]).strip()
-			except:
-				errors.append(f"第{row_idx}行: 产品编码格式错误")
-				continue
-
-			# 验证产品是否存在
-			if not frappe.db.exists("Product List", product_code):
-				errors.append(f"第{row_idx}行: 产品编码 {product_code} 不存在")
-				continue
-
-			# 处理每个月份的数据
-			for col_idx, month_str in enumerate(month_columns):
-				try:
-					if len(row) <= 2 + col_idx:
-						continue
-
-					quantity_value = row[2 + col_idx]
-
-					if quantity_value is None or quantity_value == '' or quantity_value == 0:
-						continue
-
-					try:
-						quantity = int(float(quantity_value))
-					except:
-						errors.append(f"第{row_idx}行-{month_str}: 数量格式错误 ({quantity_value})")
-						continue
-
-					# 解析月份
-					parsed_month = parse_month_string(month_str)
-					if not parsed_month:
-						errors.append(f"第{row_idx}行: 月份格式错误 ({month_str})")
-						continue
-
-					parsed_month = CommodityScheduleService.validate_month_in_task(task_id, parsed_month)
-					if allowed_months and parsed_month not in allowed_months:
-						errors.append(f"第{row_idx}行-{month_str}: 月份不在任务周期内")
-						continue
-
-					# 按日期落库：月份列统一写入该月第一天
-					sub_date = get_month_first_day(parsed_month)
-
-					# 检查记录是否存在
-					filters = {
-						"store_id": store_id,
-						"task_id": task_id,
-						"code": product_code,
-						"sub_date": sub_date
-					}
-
-					existing = frappe.db.get_value("Commodity Schedule", filters, "name")
-
-					if existing:
-						frappe.db.set_value("Commodity Schedule", existing, "quantity", quantity)
-						updated_count += 1
-					else:
-						new_doc = frappe.new_doc("Commodity Schedule")
-						new_doc.store_id = store_id
-						new_doc.task_id = task_id
-						new_doc.code = product_code
-						new_doc.quantity = quantity
-						new_doc.sub_date = sub_date
-						new_doc.insert()
-						inserted_count += 1
-
-				except Exception as inner_e:
-					errors.append(f"第{row_idx}行-{month_str}: {str(inner_e)}")
+			result = ImportService.import_plan_rows(store_id, task_id, rows, dry_run=cint(dry_run))
+		except _ImportFileReadError as e:
+			frappe.db.rollback()
+			return error_response(message=f"无法读取导入文件: {e}")
+
+		if cint(dry_run):
+			return success_response(
+				message=f"预计新增 {result['inserted']} 条，更新 {result['updated']} 条，{result['unchanged']} 条无变化",
+				dry_run=1,
+				inserted=result["inserted"],
+				updated=result["updated"],
+				unchanged=result["unchanged"],
+				skipped=result["skipped"],
+				errors=result["errors"][:MAX_IMPORT_ERRORS],
+				changes=result["changes"],
+				stores=result.get("stores")
+			)
 
 		frappe.db.commit()
+		if result["inserted"] or result["updated"]:
+			bump_data_version(CacheScope.PLAN)
+			for changed_store in ImportService.get_changed_stores(store_id, result):
+				publish_plan_event(task_id, changed_store, "import")
 
-		msg = f"成功导入 {inserted_count} 条，更新 {updated_count} 条"
-		if skipped_count > 0:
-			msg += f"，跳过 {skipped_count} 行空数据"
+		msg = f"成功导入 {result['inserted']} 条，更新 {result['updated']} 条"
+		if result["unchanged"] > 0:
+			msg += f"，{result['unchanged']} 条无变化"
+		if result["skipped"] > 0:
+			msg += f"，跳过 {result['skipped']} 行空数据"
 
 		return success_response(
 			message=msg,
-			inserted=inserted_count,
-			updated=updated_count,
-			skipped=skipped_count,
-			errors=errors[:20]
+			inserted=result["inserted"],
+			updated=result["updated"],
+			unchanged=result["unchanged"],
+			skipped=result["skipped"],
+			errors=result["errors"][:MAX_IMPORT_ERRORS],
+			stores=result.get("stores")
 		)
 
 	except Exception as e:
@@ -271,131 +119,152 @@ def import_commodity_data(store_id, task_id, file_url):
 		import traceback
 		error_msg = traceback.format_exc()
 		frappe.log_error(title="Excel导入失败", message=error_msg)
-		return error_response(message=f"导入失败: {str(e)}")
+		return error_response(message=f"导入失败: {e!s}")
 
 
 @frappe.whitelist()
-def export_commodity_data(store_id=None, task_id=None):
-	"""导出商品计划数据到Excel"""
+def enqueue_import(store_id=None, task_id=None, file_url=None):
+	"""
+	提交后台导入任务（大文件使用，按块提交并可断点续传；store_id 为空时为多店铺导入）
+
+	Returns:
+		dict: 任务状态（含 job_id）；进度通过实时事件 psp_import_progress 推送，也可轮询 get_import_status
+	"""
 	try:
-		import openpyxl
-		from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-		from frappe.utils.file_manager import save_file
-		import io
-		from datetime import datetime
-		from product_sales_planning.services.commodity_service import CommodityScheduleService
-
-		# 获取数据
-		result = CommodityScheduleService.get_commodity_data(
-			store_id=store_id,
-			task_id=task_id,
-			start=0,
-			page_length=10000,
-			view_mode="multi"
+		validate_required_params(
+			{"task_id": task_id, "file_url": file_url},
+			["task_id", "file_url"]
 		)
+		state = ImportJobService.enqueue(store_id, task_id, file_url)
+		return success_response(data=state, message="导入任务已提交")
 
-		if not result.get("data"):
-			return error_response(message="没有数据可导出")
+	except Exception as e:
+		frappe.log_error(title="提交导入任务失败", message=str(e))
+		return error_response(message=f"提交导入任务失败: {e!s}")
 
-		data = result["data"]
-		months = result.get("months", [])
-
-		# 创建工作簿
-		wb = openpyxl.Workbook()
-		ws = wb.active
-		ws.title = "商品计划数据"
-
-		# 定义样式
-		header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-		header_font = Font(bold=True, color="FFFFFF", size=11)
-		border = Border(
-			left=Side(style='thin'),
-			right=Side(style='thin'),
-			top=Side(style='thin'),
-			bottom=Side(style='thin')
-		)
 
-		# 设置表头
-		headers = ['产品编码', '产品名称', '规格', '品牌', '类别'] + months
-		ws.append(headers)
-
-		# 设置表头样式
-		for col_num in range(1, len(headers) + 1):
-			cell = ws.cell(row=1, column=col_num)
-			cell.fill = header_fill
-			cell.font = header_font
-			cell.alignment = Alignment(horizontal='center', vertical='center')
-			cell.border = border
-
-		# 写入数据
-		for item in data:
-			row_data = [
-				item.get('code', ''),
-				item.get('name1', ''),
-				item.get('specifications', ''),
-				item.get('brand', ''),
-				item.get('category', '')
-			]
-
-			# 添加月份数据
-			for month in months:
-				month_data = item.get('months', {}).get(month, {})
-				quantity = month_data.get('quantity', 0) if month_data else 0
-				row_data.append(quantity)
-
-			ws.append(row_data)
-
-			# 设置数据行样式
-			for col_num in range(1, len(headers) + 1):
-				cell = ws.cell(row=ws.max_row, column=col_num)
-				cell.border = border
-				if col_num > 5:
-					cell.alignment = Alignment(horizontal='right', vertical='center')
-
-		# 设置列宽
-		ws.column_dimensions['A'].width = 15
-		ws.column_dimensions['B'].width = 25
-		ws.column_dimensions['C'].width = 12
-		ws.column_dimensions['D'].width = 12
-		ws.column_dimensions['E'].width = 12
-		for i in range(len(months)):
-			col_letter = openpyxl.utils.get_column_letter(i + 6)
-			ws.column_dimensions[col_letter].width = 12
-
-		# 保存到内存
-		file_content = io.BytesIO()
-		wb.save(file_content)
-		file_content.seek(0)
-
-		# 生成文件名
-		filename_parts = ["commodity_plan_export"]
-		if store_id:
-			filename_parts.append(f"store_{store_id}")
-		if task_id:
-			filename_parts.append(f"task_{task_id}")
-		filename_parts.append(datetime.now().strftime('%Y%m%d_%H%M%S'))
-		filename = "_".join(filename_parts) + ".xlsx"
-
-		# 保存文件
-		file_doc = save_file(
-			fname=filename,
-			content=file_content.read(),
-			dt=None,
-			dn=None,
-			is_private=0
+@frappe.whitelist()
+def get_import_status(job_id):
+	"""
+	获取后台导入任务状态
+
+	Returns:
+		dict: 任务状态（status: queued / running / done / failed；totals 为累计导入结果，last_row 为断点行号）
+	"""
+	try:
+		state = ImportJobService.get_status(job_id)
+		if not state:
+			return error_response(message="导入任务不存在或已过期")
+
+		return success_response(data=state)
+
+	except Exception as e:
+		frappe.log_error(title="获取导入任务状态失败", message=str(e))
+		return error_response(message=str(e))
+
+
+@frappe.whitelist()
+def export_commodity_data(store_id=None, task_id=None):
+	"""
+	导出商品计划数据到Excel（流式写出；同步导出，大数据量请使用 enqueue_export）
+
+	计划数据未变化时重复导出直接返回已有文件（见 ExportCacheService）
+	"""
+	try:
+		from product_sales_planning.services.export_cache_service import ExportCacheService
+
+		result = ExportCacheService.get_or_create(
+			"commodity",
+			{"store_id": store_id, "task_id": task_id},
+			ExportService.get_commodity_file_name(store_id, task_id, with_timestamp=False),
+			lambda file_path: ExportService.write_commodity_workbook(file_path, store_id=store_id, task_id=task_id)
 		)
+		if not result["file_url"]:
+			return error_response(message="没有数据可导出")
 
 		return success_response(
-			file_url=file_doc.file_url,
-			file_name=filename,
-			record_count=len(data)
+			file_url=result["file_url"],
+			file_name=result["file_name"],
+			record_count=result["record_count"],
+			cached=result["cached"]
 		)
 
 	except Exception as e:
 		import traceback
 		error_msg = traceback.format_exc()
 		frappe.log_error(title="导出Excel失败", message=error_msg)
-		return error_response(message=f"导出失败: {str(e)}")
+		return error_response(message=f"导出失败: {e!s}")
+
+
+@frappe.whitelist()
+def export_commodity_csv(store_id=None, task_id=None, gzip=0):
+	"""
+	以 CSV 流式导出店铺商品计划（每个商品一行，月份为列）
+
+	逐行读取并分块写入 HTTP 响应，不生成临时文件；gzip=1 时使用 gzip Content-Encoding
+	"""
+	try:
+		from product_sales_planning.utils.csv_utils import build_csv_response
+
+		headers, rows = ExportService.iter_commodity_rows(store_id, task_id)
+
+		return build_csv_response(
+			ExportService.get_commodity_file_name(store_id, task_id, ext="csv"),
+			headers,
+			rows,
+			gzip=cint(gzip)
+		)
+
+	except Exception as e:
+		frappe.log_error(title="导出CSV失败", message=str(e))
+		return error_response(message=f"导出失败: {e!s}")
+
+
+@frappe.whitelist()
+def enqueue_export(export_type, params=None):
+	"""
+	提交后台导出任务
+
+	Args:
+		export_type: 导出类型（data_view: 数据查看；commodity: 店铺商品计划；task_commodity: 整任务商品计划）
+		params: 导出参数（JSON）：
+			- data_view: filters / sort_by / sort_order
+			- commodity: store_id / task_id
+			- task_commodity: task_id（必需）/ store_ids（店铺ID列表，为空时导出任务下全部店铺）/
+				file_format（xlsx: 单个工作表；zip: 每个店铺一个工作簿）；
+				提交前校验任务及各店铺的读取权限
+
+	Returns:
+		dict: 任务状态（含 job_id）；进度通过实时事件 psp_export_progress 推送，也可轮询 get_export_status
+	"""
+	try:
+		params = parse_json_param(params, "params") or {}
+		state = ExportJobService.enqueue(export_type, params)
+		return success_response(data=state, message="导出任务已提交")
+
+	except Exception as e:
+		frappe.log_error(title="提交导出任务失败", message=str(e))
+		return error_response(message=f"提交导出任务失败: {e!s}")
+
+
+@frappe.whitelist()
+def get_export_status(job_id):
+	"""
+	获取后台导出任务状态
+
+	Returns:
+		dict: 任务状态（status: queued / running / done / failed；完成后含私有文件 file_url）
+	"""
+	try:
+		state = ExportJobService.get_status(job_id)
+		if not state:
+			return error_response(message="导出任务不存在或已过期")
+
+		return success_response(data=state)
+
+	except Exception as e:
+		frappe.log_error(title="获取导出任务状态失败", message=str(e))
+		return error_response(message=str(e))
 
 
 @frappe.whitelist()
@@ -408,3 +277,17 @@ def download_mechanism_template():
 def import_mechanism_excel(file_url):
 	"""导入机制Excel（占位函数）"""
 	return error_response(message="功能开发中")
+
+
+# ========== 辅助函数 ==========
+
+class _ImportFileReadError(Exception):
+	"""读取导入文件失败（与写入计划失败区分）"""
+
+
+def _read_import_rows(rows):
+	"""逐行读取导入文件，读取过程中的异常转换为 _ImportFileReadError"""
+	try:
+		yield from rows
+	except Exception as e:
+		raise _ImportFileReadError(e) from e
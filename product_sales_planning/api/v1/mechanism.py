@@ -11,6 +11,9 @@ from product_sales_planning.utils.validation_utils import (
 	validate_required_params,
 	validate_doctype_exists
 )
+from product_sales_planning.utils.realtime_utils import publish_plan_event
+from product_sales_planning.utils.cache_utils import bump_data_version
+from product_sales_planning.constants import CacheScope
 
 
 @frappe.whitelist()
@@ -82,6 +85,9 @@ def apply_mechanisms(store_id, mechanism_names, task_id=None):
 				errors.append(f"机制 {mech_name}: {str(mech_e)}")
 
 		frappe.db.commit()
+		if inserted_count and task_id:
+			bump_data_version(CacheScope.PLAN)
+			publish_plan_event(task_id, store_id, "insert")
 
 		msg = f"成功添加 {inserted_count} 条"
 		if skipped_count > 0:
@@ -5,27 +5,16 @@ Store API
 
 import frappe
 from product_sales_planning.utils.response_utils import success_response, error_response
+from product_sales_planning.services.filter_options_service import FilterOptionsService
 
 
 @frappe.whitelist()
 def get_filter_options():
 	"""获取筛选器选项"""
 	try:
-		tasks = frappe.get_all(
-			"Schedule tasks",
-			fields=["name"],
-			order_by="creation desc"
-		)
-
-		stores = frappe.get_all(
-			"Store List",
-			fields=["name", "shop_name"],
-			order_by="shop_name asc"
-		)
-
 		return success_response(data={
-			"stores": stores,
-			"tasks": tasks
+			"stores": FilterOptionsService.get_stores(),
+			"tasks": FilterOptionsService.get_all_tasks()
 		})
 
 	except Exception as e:
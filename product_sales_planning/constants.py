@@ -25,6 +25,17 @@ class TaskStatus:
 	CLOSED = "已关闭"
 
 
+class DeadlineBucket:
+	"""截止分组常量（由每日定时任务写入 deadline_bucket 字段）"""
+	OVERDUE = "已逾期"
+	DUE_3_DAYS = "3天内"
+	DUE_7_DAYS = "7天内"
+	LATER = "更晚"
+
+	# 视为紧急的分组（剩余天数 <= 3，含已逾期）
+	URGENT = (OVERDUE, DUE_3_DAYS)
+
+
 class ViewMode:
 	"""视图模式常量"""
 	SINGLE = "single"
@@ -53,6 +64,12 @@ class Permission:
 	AMEND = "amend"
 
 
+class CacheScope:
+	"""结果缓存作用域（每个作用域一个数据版本号）"""
+	DASHBOARD = "dashboard"
+	PLAN = "plan"
+
+
 class DocType:
 	"""DocType名称常量"""
 	COMMODITY_SCHEDULE = "Commodity Schedule"
@@ -78,9 +95,15 @@ MAX_EXPORT_ROWS = 50000
 # 批量操作限制
 MAX_BATCH_SIZE = 1000
 
+# 任务超过结束日期多少天后由定时任务自动结束
+EXPIRED_TASK_GRACE_DAYS = 7
+
 # 允许的排序方向
 ALLOWED_SORT_ORDERS = ["ASC", "DESC", "asc", "desc"]
 
 # 允许的文件类型
-ALLOWED_FILE_EXTENSIONS = [".xlsx", ".xls"]
+ALLOWED_FILE_EXTENSIONS = [".xlsx", ".xls", ".csv", ".tsv"]
+
+# 文本导入文件的分隔符
+DELIMITED_FILE_EXTENSIONS = {".csv": ",", ".tsv": "\t"}
 MAX_FILE_SIZE_MB = 10
\ No newline at end of file
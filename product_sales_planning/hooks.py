@@ -14,6 +14,7 @@ api_methods = [
     # Dashboard APIs
     "product_sales_planning.api.v1.dashboard.get_dashboard_data",
     "product_sales_planning.api.v1.dashboard.get_filter_options",
+    "product_sales_planning.api.v1.dashboard.get_dashboard_changes",
     
     # Commodity APIs
     "product_sales_planning.api.v1.commodity.get_store_commodity_data",
@@ -42,12 +43,20 @@ api_methods = [
     # Data View APIs
     "product_sales_planning.api.v1.data_view.get_data_view",
     "product_sales_planning.api.v1.data_view.get_data_view_filter_options",
+    "product_sales_planning.api.v1.data_view.search_filter_options",
     "product_sales_planning.api.v1.data_view.export_data_view",
+    "product_sales_planning.api.v1.data_view.export_data_view_csv",
+    "product_sales_planning.api.v1.data_view.get_plan_rollup",
     
     # Import/Export APIs
     "product_sales_planning.api.v1.import_export.download_import_template",
     "product_sales_planning.api.v1.import_export.import_commodity_data",
     "product_sales_planning.api.v1.import_export.export_commodity_data",
+    "product_sales_planning.api.v1.import_export.export_commodity_csv",
+    "product_sales_planning.api.v1.import_export.enqueue_export",
+    "product_sales_planning.api.v1.import_export.get_export_status",
+    "product_sales_planning.api.v1.import_export.enqueue_import",
+    "product_sales_planning.api.v1.import_export.get_import_status",
     "product_sales_planning.api.v1.import_export.download_mechanism_template",
     "product_sales_planning.api.v1.import_export.import_mechanism_excel",
     
@@ -158,6 +167,8 @@ app_include_js = "/assets/product_sales_planning/js/product_sales_planning.js"
 # before_app_uninstall = "product_sales_planning.utils.before_app_uninstall"
 # after_app_uninstall = "product_sales_planning.utils.after_app_uninstall"
 
+after_migrate = "product_sales_planning.tasks.after_migrate"
+
 # Desk Notifications
 # ------------------
 # See frappe.core.notifications.get_notification_config
@@ -196,6 +207,54 @@ app_include_js = "/assets/product_sales_planning/js/product_sales_planning.js"
 # 	}
 # }
 
+doc_events = {
+    "Store List": {
+        "on_update": [
+            "product_sales_planning.services.filter_options_service.on_store_list_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+        "after_rename": [
+            "product_sales_planning.services.filter_options_service.on_store_list_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+        "on_trash": [
+            "product_sales_planning.services.filter_options_service.on_store_list_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+    },
+    "Schedule tasks": {
+        "on_update": [
+            "product_sales_planning.services.filter_options_service.on_schedule_tasks_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+        "after_rename": [
+            "product_sales_planning.services.filter_options_service.on_schedule_tasks_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+        "on_trash": [
+            "product_sales_planning.services.filter_options_service.on_schedule_tasks_change",
+            "product_sales_planning.utils.cache_utils.on_dashboard_data_change",
+            "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        ],
+    },
+    # Tasks Store 子表不注册 doc_events：子表行的事件在父文档保存与 db.set_value 时都不会触发，
+    # 随父文档保存的变更由 Schedule tasks 的钩子处理，直接更新子表行的代码自行调用 bump_data_version
+    "Commodity Schedule": {
+        "on_update": "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        "on_trash": "product_sales_planning.utils.cache_utils.on_plan_data_change",
+    },
+    "Product List": {
+        "on_update": "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        "after_rename": "product_sales_planning.utils.cache_utils.on_plan_data_change",
+        "on_trash": "product_sales_planning.utils.cache_utils.on_plan_data_change",
+    },
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -217,6 +276,13 @@ app_include_js = "/assets/product_sales_planning/js/product_sales_planning.js"
 # 	],
 # }
 
+scheduler_events = {
+    "daily": [
+        "product_sales_planning.tasks.daily",
+        "product_sales_planning.tasks.purge_export_files"
+    ],
+}
+
 # Testing
 # -------
 
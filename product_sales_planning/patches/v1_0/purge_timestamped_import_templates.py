@@ -0,0 +1,29 @@
+"""
+清理旧版导入模板文件
+
+旧版 download_import_template 每次下载都保存一个带时间戳的模板文件
+（commodity_plan_import_template_YYYYMMDD_HHMMSS.xlsx），现改为按月份窗口缓存，
+删除这些未关联任何单据的历史模板
+"""
+
+import re
+
+import frappe
+
+TIMESTAMPED_TEMPLATE_PATTERN = re.compile(r"^commodity_plan_import_template_\d{8}_\d{6}.*\.xlsx$")
+
+
+def execute():
+	files = frappe.get_all(
+		"File",
+		filters={
+			"file_name": ["like", "commodity\\_plan\\_import\\_template\\_%"],
+			"attached_to_doctype": ["is", "not set"],
+			"is_folder": 0
+		},
+		fields=["name", "file_name"]
+	)
+
+	for file in files:
+		if TIMESTAMPED_TEMPLATE_PATTERN.match(file.file_name or ""):
+			frappe.delete_doc("File", file.name, ignore_permissions=True)
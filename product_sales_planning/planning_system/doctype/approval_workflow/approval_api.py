@@ -1,12 +1,19 @@
 """
 审批流API接口
 基于Tasks Store子表的审批流程管理
+
+审批操作只读取并更新目标 Tasks Store 行（按 parent + store_name 索引定位），
+不加载整个 Schedule tasks 文档及其全部店铺子表
 """
 
 import frappe
 from frappe import _
 from frappe.utils import now_datetime
 
+from product_sales_planning.constants import CacheScope
+from product_sales_planning.utils.cache_utils import bump_data_version
+from product_sales_planning.utils.realtime_utils import publish_approval_event
+
 
 @frappe.whitelist()
 def submit_for_approval(task_id, store_id, comment=None):
@@ -22,8 +29,8 @@ def submit_for_approval(task_id, store_id, comment=None):
 		dict: 包含状态和消息的字典
 	"""
 	try:
-		# 获取Tasks Store记录
-		tasks_store = get_tasks_store_record(task_id, store_id)
+		# 获取Tasks Store记录（加行锁，避免并发提交）
+		tasks_store = get_tasks_store_record(task_id, store_id, for_update=True)
 		if not tasks_store:
 			return {
 				"status": "error",
@@ -61,58 +68,52 @@ def submit_for_approval(task_id, store_id, comment=None):
 		is_resubmit = tasks_store.approval_status == "已驳回" and tasks_store.current_approval_step > 0
 
 		# 更新Tasks Store状态
-		parent_doc = frappe.get_doc("Schedule tasks", task_id)
-		for item in parent_doc.set_store:
-			if item.store_name == store_id:
-				if is_resubmit:
-					# 重新提交：保持当前审批步骤，只更新状态
-					item.approval_status = "待审批"
-					item.can_edit = 0
-					item.rejection_reason = None
-					# 保持 current_approval_step 不变
-					# 获取当前步骤的审批人
-					current_step_obj = workflow.approval_steps[item.current_approval_step - 1]
-					item.current_approver = get_approver_for_role(
-						current_step_obj.approver_role,
-						store_id=store_id,
-						workflow_step=current_step_obj
-					)
-				else:
-					# 首次提交：从第一级开始
-					item.status = "已提交"
-					item.approval_status = "待审批"
-					item.current_approval_step = 1
-					item.workflow_id = workflow.name
-					item.submitted_by = frappe.session.user
-					item.sub_time = now_datetime()
-					item.can_edit = 0
-					item.rejection_reason = None
-					# 获取第一级审批人
-					first_step = workflow.approval_steps[0]
-					item.current_approver = get_approver_for_role(
-						first_step.approver_role,
-						store_id=store_id,
-						workflow_step=first_step
-					)
-				break
-
-		parent_doc.save(ignore_permissions=True)
-		frappe.db.commit()
+		if is_resubmit:
+			# 重新提交：保持当前审批步骤，只更新状态，审批人为当前步骤的审批人
+			approval_step = workflow.approval_steps[tasks_store.current_approval_step - 1]
+			changes = {
+				"approval_status": "待审批",
+				"can_edit": 0,
+				"rejection_reason": None
+			}
+		else:
+			# 首次提交：从第一级开始
+			approval_step = workflow.approval_steps[0]
+			changes = {
+				"status": "已提交",
+				"approval_status": "待审批",
+				"current_approval_step": 1,
+				"workflow_id": workflow.name,
+				"submitted_by": frappe.session.user,
+				"sub_time": now_datetime(),
+				"can_edit": 0,
+				"rejection_reason": None
+			}
+		changes["current_approver"] = get_approver_for_role(
+			approval_step.approver_role,
+			store_id=store_id,
+			workflow_step=approval_step
+		)
+		update_tasks_store_record(tasks_store, changes)
 
 		# 创建审批历史记录
-		create_approval_history(
+		history = create_approval_history(
 			task_id=task_id,
 			store_id=store_id,
 			approval_step=0,
 			action="提交",
-			comments=comment or "提交审批"
+			comments=comment or "提交审批",
+			reference_name=tasks_store.name
 		)
+		frappe.db.commit()
+
+		publish_approval_event(task_id, store_id, "提交", tasks_store, history=history)
 
 		return {
 			"status": "success",
 			"message": _("审批申请已提交"),
 			"workflow_id": workflow.name,
-			"next_approver_role": first_step.approver_role
+			"next_approver_role": approval_step.approver_role
 		}
 
 	except Exception as e:
@@ -139,8 +140,8 @@ def approve_task_store(task_id, store_id, action, comments=None):
 		dict: 包含状态和消息的字典
 	"""
 	try:
-		# 获取Tasks Store记录
-		tasks_store = get_tasks_store_record(task_id, store_id)
+		# 获取Tasks Store记录（加行锁，避免并发审批）
+		tasks_store = get_tasks_store_record(task_id, store_id, for_update=True)
 		if not tasks_store:
 			return {
 				"status": "error",
@@ -165,17 +166,7 @@ def approve_task_store(task_id, store_id, action, comments=None):
 			}
 
 		current_step = tasks_store.current_approval_step
-		parent_doc = frappe.get_doc("Schedule tasks", task_id)
-
-		# 找到对应的Tasks Store记录
-		target_item = None
-		for item in parent_doc.set_store:
-			if item.store_name == store_id:
-				target_item = item
-				break
-
-		if not target_item:
-			return {"status": "error", "message": _("未找到对应记录")}
+		previous_approver = tasks_store.current_approver
 
 		# 根据操作类型处理
 		if action == "approve":
@@ -184,19 +175,23 @@ def approve_task_store(task_id, store_id, action, comments=None):
 
 			if current_step < max_step:
 				# 进入下一级审批
-				target_item.current_approval_step = current_step + 1
 				next_step = workflow.approval_steps[current_step]  # 索引从0开始
-				target_item.current_approver = get_approver_for_role(
-					next_step.approver_role,
-					store_id=store_id,
-					workflow_step=next_step
-				)
+				changes = {
+					"current_approval_step": current_step + 1,
+					"current_approver": get_approver_for_role(
+						next_step.approver_role,
+						store_id=store_id,
+						workflow_step=next_step
+					)
+				}
 				message = _("审批通过，已转至下一级审批")
 			else:
 				# 最后一级审批，完成审批
-				target_item.approval_status = "已通过"
-				target_item.approval_time = now_datetime()
-				target_item.current_approver = None
+				changes = {
+					"approval_status": "已通过",
+					"approval_time": now_datetime(),
+					"current_approver": None
+				}
 				message = _("审批流程已全部通过")
 
 			action_text = "通过"
@@ -209,26 +204,30 @@ def approve_task_store(task_id, store_id, action, comments=None):
 					"message": _("已是第一级，无法退回上一级")
 				}
 
-			target_item.current_approval_step = current_step - 1
 			prev_step = workflow.approval_steps[current_step - 2]  # 索引从0开始
-			target_item.current_approver = get_approver_for_role(
-				prev_step.approver_role,
-				store_id=store_id,
-				workflow_step=prev_step
-			)
-			target_item.approval_status = "已驳回"
-			target_item.can_edit = 1
-			target_item.rejection_reason = comments or "退回上一级"
+			changes = {
+				"current_approval_step": current_step - 1,
+				"current_approver": get_approver_for_role(
+					prev_step.approver_role,
+					store_id=store_id,
+					workflow_step=prev_step
+				),
+				"approval_status": "已驳回",
+				"can_edit": 1,
+				"rejection_reason": comments or "退回上一级"
+			}
 			action_text = "退回上级"
 			message = _("已退回上一级审批")
 
 		elif action == "reject_to_submitter":
 			# 退回提交人
-			target_item.current_approval_step = 0
-			target_item.approval_status = "已驳回"
-			target_item.can_edit = 1
-			target_item.rejection_reason = comments or "退回提交人"
-			target_item.current_approver = None
+			changes = {
+				"current_approval_step": 0,
+				"approval_status": "已驳回",
+				"can_edit": 1,
+				"rejection_reason": comments or "退回提交人",
+				"current_approver": None
+			}
 			action_text = "退回提交人"
 			message = _("已退回提交人")
 
@@ -238,16 +237,22 @@ def approve_task_store(task_id, store_id, action, comments=None):
 				"message": _("无效的操作类型")
 			}
 
-		parent_doc.save(ignore_permissions=True)
-		frappe.db.commit()
+		update_tasks_store_record(tasks_store, changes)
 
 		# 创建审批历史记录
-		create_approval_history(
+		history = create_approval_history(
 			task_id=task_id,
 			store_id=store_id,
 			approval_step=current_step,
 			action=action_text,
-			comments=comments or ""
+			comments=comments or "",
+			reference_name=tasks_store.name
+		)
+		frappe.db.commit()
+
+		publish_approval_event(
+			task_id, store_id, action_text, tasks_store,
+			previous_approver=previous_approver, history=history
 		)
 
 		return {
@@ -278,8 +283,8 @@ def withdraw_approval(task_id, store_id, comment=None):
 		dict: 包含状态和消息的字典
 	"""
 	try:
-		# 获取Tasks Store记录
-		tasks_store = get_tasks_store_record(task_id, store_id)
+		# 获取Tasks Store记录（加行锁，避免与审批并发）
+		tasks_store = get_tasks_store_record(task_id, store_id, for_update=True)
 		if not tasks_store:
 			return {
 				"status": "error",
@@ -309,30 +314,34 @@ def withdraw_approval(task_id, store_id, comment=None):
 			}
 
 		# 更新Tasks Store状态
-		parent_doc = frappe.get_doc("Schedule tasks", task_id)
-		for item in parent_doc.set_store:
-			if item.store_name == store_id:
-				item.status = "未开始"
-				item.approval_status = None
-				item.current_approval_step = 0
-				item.can_edit = 1
-				item.rejection_reason = None
-				item.current_approver = None
-				item.workflow_id = None
-				item.submitted_by = None
-				item.sub_time = None
-				break
-
-		parent_doc.save(ignore_permissions=True)
-		frappe.db.commit()
+		approval_step = tasks_store.current_approval_step
+		previous_approver = tasks_store.current_approver
+		update_tasks_store_record(tasks_store, {
+			"status": "未开始",
+			"approval_status": None,
+			"current_approval_step": 0,
+			"can_edit": 1,
+			"rejection_reason": None,
+			"current_approver": None,
+			"workflow_id": None,
+			"submitted_by": None,
+			"sub_time": None
+		})
 
 		# 创建审批历史记录
-		create_approval_history(
+		history = create_approval_history(
 			task_id=task_id,
 			store_id=store_id,
-			approval_step=tasks_store.current_approval_step,
+			approval_step=approval_step,
 			action="撤回",
-			comments=comment or "撤回审批"
+			comments=comment or "撤回审批",
+			reference_name=tasks_store.name
+		)
+		frappe.db.commit()
+
+		publish_approval_event(
+			task_id, store_id, "撤回", tasks_store,
+			previous_approver=previous_approver, history=history
 		)
 
 		return {
@@ -466,10 +475,10 @@ def check_can_edit(task_id, store_id):
 
 		# 检查用户权限
 		current_user = frappe.session.user
-		store_doc = frappe.get_doc("Store List", store_id)
+		store_owner = frappe.db.get_value("Store List", store_id, "user1")
 
 		# 只有店铺负责人可以编辑
-		if store_doc.user1 != current_user and "System Manager" not in frappe.get_roles(current_user):
+		if store_owner != current_user and "System Manager" not in frappe.get_roles(current_user):
 			return {
 				"status": "success",
 				"can_edit": False,
@@ -500,26 +509,45 @@ def check_can_edit(task_id, store_id):
 
 # ========== 辅助函数 ==========
 
-def get_tasks_store_record(task_id, store_id):
+def get_tasks_store_record(task_id, store_id, for_update=False):
 	"""
-	获取Tasks Store记录
+	获取Tasks Store记录（按 parent + store_name 索引直接读取该行）
 
 	Args:
 		task_id: 任务ID
 		store_id: 店铺ID
+		for_update: 是否加行锁（审批操作读取后会更新该行）
 
 	Returns:
-		Tasks Store记录对象或None
+		Tasks Store记录（frappe._dict）或None
 	"""
-	try:
-		parent_doc = frappe.get_doc("Schedule tasks", task_id)
-		for item in parent_doc.set_store:
-			if item.store_name == store_id:
-				return item
-		return None
-	except Exception:
+	if not task_id or not store_id:
 		return None
 
+	return frappe.db.get_value(
+		"Tasks Store",
+		{"parent": task_id, "parenttype": "Schedule tasks", "store_name": store_id},
+		"*",
+		as_dict=True,
+		for_update=for_update
+	)
+
+
+def update_tasks_store_record(tasks_store, changes):
+	"""
+	直接更新Tasks Store行（不保存父文档），并同步更新传入的记录
+
+	父文档不再保存，因此在此处使看板与计划结果缓存失效（与 Schedule tasks 保存时一致）
+
+	Args:
+		tasks_store: get_tasks_store_record 返回的记录
+		changes: 要更新的字段
+	"""
+	frappe.db.set_value("Tasks Store", tasks_store.name, changes)
+	tasks_store.update(changes)
+	bump_data_version(CacheScope.DASHBOARD)
+	bump_data_version(CacheScope.PLAN)
+
 
 def get_applicable_workflow(task_id, store_id):
 	"""
@@ -533,13 +561,9 @@ def get_applicable_workflow(task_id, store_id):
 		Approval Workflow文档或None
 	"""
 	try:
-		# 获取任务类型
-		task = frappe.get_doc("Schedule tasks", task_id)
-		task_type = task.type
-
-		# 获取店铺类型
-		store = frappe.get_doc("Store List", store_id)
-		store_type = store.shop_type if hasattr(store, 'shop_type') else None
+		# 获取任务类型与店铺类型（只读取所需字段）
+		task_type = frappe.db.get_value("Schedule tasks", task_id, "type")
+		store_type = frappe.db.get_value("Store List", store_id, "shop_type")
 
 		# 优先匹配具体类型的流程
 		if store_type:
@@ -638,10 +662,10 @@ def get_approver_for_role(role, store_id=None, workflow_step=None):
 		# 2. 基于店铺属性
 		if store_id and workflow_step and workflow_step.approver_type == "基于店铺属性":
 			store_field = workflow_step.store_field
-			if store_field:
-				store = frappe.get_doc("Store List", store_id)
-				if hasattr(store, store_field) and getattr(store, store_field):
-					return getattr(store, store_field)
+			if store_field and frappe.get_meta("Store List").has_field(store_field):
+				approver = frappe.db.get_value("Store List", store_id, store_field)
+				if approver:
+					return approver
 
 		# 3. 基于角色（默认）
 		users = frappe.get_all(
@@ -698,7 +722,7 @@ def get_approver_by_store_assignment(role, store_id):
 		return None
 
 
-def create_approval_history(task_id, store_id, approval_step, action, comments):
+def create_approval_history(task_id, store_id, approval_step, action, comments, reference_name=None):
 	"""
 	创建审批历史记录
 
@@ -708,11 +732,18 @@ def create_approval_history(task_id, store_id, approval_step, action, comments):
 		approval_step: 审批步骤
 		action: 操作类型
 		comments: 审批意见
+		reference_name: Tasks Store 行的 name（调用方已读取时传入，避免再次查询）
+
+	Returns:
+		Approval History 文档，创建失败时返回 None
 	"""
 	try:
-		# 获取Tasks Store的name
-		tasks_store = get_tasks_store_record(task_id, store_id)
-		reference_name = tasks_store.name if tasks_store else ""
+		if reference_name is None:
+			reference_name = frappe.db.get_value(
+				"Tasks Store",
+				{"parent": task_id, "parenttype": "Schedule tasks", "store_name": store_id},
+				"name"
+			) or ""
 
 		history = frappe.get_doc({
 			"doctype": "Approval History",
@@ -729,6 +760,8 @@ def create_approval_history(task_id, store_id, approval_step, action, comments):
 
 		history.insert(ignore_permissions=True)
 		frappe.db.commit()
+		return history
 
 	except Exception as e:
 		frappe.log_error(title="创建审批历史失败", message=str(e))
+		return None
@@ -82,3 +82,13 @@ class CommoditySchedule(Document):
 		# 如果没有提交日期，使用今天
 		if not self.sub_date:
 			self.sub_date = frappe.utils.today()
+
+
+def on_doctype_update():
+	"""创建复合索引"""
+	# 店铺详情、导入比对：按店铺 + 任务定位，再按月份范围筛选
+	frappe.db.add_index("Commodity Schedule", ["store_id", "task_id", "sub_date"])
+	# 数据查看：按月份 / 日期范围跨店铺筛选
+	frappe.db.add_index("Commodity Schedule", ["sub_date", "store_id"])
+	# 整任务导出：按任务一次有序扫描 (store_id, code, sub_date)
+	frappe.db.add_index("Commodity Schedule", ["task_id", "store_id", "code", "sub_date"])
@@ -4,7 +4,13 @@
 # import frappe
 from frappe.model.document import Document
 
+from product_sales_planning.utils.date_utils import get_deadline_bucket
+
 
 class Scheduletasks(Document):
-	pass
+	def validate(self):
+		# 保存时同步截止分组，之后由每日定时任务随日期推移更新
+		self.deadline_bucket = get_deadline_bucket(self.end_date)
+		for item in self.set_store:
+			item.deadline_bucket = self.deadline_bucket
 # ... existing code ...
\ No newline at end of file
@@ -1,9 +1,15 @@
 # Copyright (c) 2025, lj and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class TasksStore(Document):
 	pass
+
+
+def on_doctype_update():
+	"""创建复合索引"""
+	# 审批操作：按任务 + 店铺直接定位单个子表行
+	frappe.db.add_index("Tasks Store", ["parent", "store_name"])
@@ -8,7 +8,8 @@ import re
 from frappe import _
 from frappe.utils import getdate
 from datetime import timedelta
-from product_sales_planning.utils.date_utils import get_date_range_filter, get_month_first_day
+from product_sales_planning.utils.date_utils import get_date_range_filter, get_month_first_day, get_month_range_condition
+from product_sales_planning.utils.db_utils import iter_sql_unbuffered
 from product_sales_planning.utils.validation_utils import (
 	validate_required_params,
 	validate_positive_integer,
@@ -154,6 +155,127 @@ class CommodityScheduleService:
 				commodity_schedules, brand, category, search_term, start, page_length
 			)
 
+	@staticmethod
+	def iter_plan_rows(store_id, task_id, months=None):
+		"""
+		流式读取店铺任务的商品计划透视行（每个商品一行，月份为列），供导出使用
+
+		按 code 排序逐行读取（无缓冲游标），相邻同 code 的记录合并为一行，内存中只保留当前商品；
+		同商品同月有多条记录时取最新 creation，与多月视图一致
+
+		参数校验在调用时立即执行，返回的迭代器只负责读取
+
+		Args:
+			store_id: 店铺ID
+			task_id: 任务ID
+			months: 月份列表（默认任务规划月份）
+
+		Returns:
+			tuple: (months, 迭代器)，迭代器产出
+				{"store_id", "code", "name1", "specifications", "brand", "category", "months": {"YYYY-MM": quantity}}
+		"""
+		validate_required_params(
+			{"store_id": store_id, "task_id": task_id},
+			["store_id", "task_id"]
+		)
+		return CommodityScheduleService._iter_pivot(task_id, [store_id], months)
+
+	@staticmethod
+	def iter_task_plan_rows(task_id, store_ids=None, months=None):
+		"""
+		流式读取任务下所有（或指定）店铺的商品计划透视行，供整任务导出使用
+
+		按 (store_id, code, sub_date) 一次有序扫描，相邻同店铺同商品的记录合并为一行，
+		同一店铺的行连续产出，内存中只保留当前商品
+
+		Args:
+			task_id: 任务ID
+			store_ids: 店铺ID列表（为空时导出任务下全部店铺）
+			months: 月份列表（默认任务规划月份）
+
+		Returns:
+			tuple: (months, 迭代器)，迭代器产出 iter_plan_rows 的行并附带 "shop_name"
+		"""
+		validate_required_params({"task_id": task_id}, ["task_id"])
+		return CommodityScheduleService._iter_pivot(task_id, store_ids, months, with_shop_name=True)
+
+	@staticmethod
+	def count_plan_products(store_id, task_id, months):
+		"""统计 iter_plan_rows 将产出的商品行数（用于导出进度）"""
+		return CommodityScheduleService.count_task_plan_rows(task_id, [store_id], months)
+
+	@staticmethod
+	def count_task_plan_rows(task_id, store_ids=None, months=None):
+		"""统计 iter_task_plan_rows 将产出的（店铺, 商品）行数（用于导出进度）"""
+		where_clause, values = CommodityScheduleService._get_pivot_conditions(task_id, store_ids, months)
+
+		return frappe.db.sql(f"""
+			SELECT COUNT(DISTINCT cs.store_id, cs.code)
+			FROM `tabCommodity Schedule` cs
+			INNER JOIN `tabProduct List` pl ON pl.name = cs.code
+			WHERE {where_clause}
+		""", values)[0][0]
+
+	@staticmethod
+	def _get_pivot_conditions(task_id, store_ids=None, months=None):
+		"""透视读取的 WHERE 子句与参数"""
+		conditions = ["cs.task_id = %(task_id)s"]
+		values = {"task_id": task_id}
+
+		if store_ids:
+			conditions.append("cs.store_id IN %(store_ids)s")
+			values["store_ids"] = list(store_ids)
+
+		month_clause, month_values = get_month_range_condition("cs.sub_date", months or [])
+		if month_clause:
+			conditions.append(month_clause)
+			values.update(month_values)
+
+		return " AND ".join(conditions), values
+
+	@staticmethod
+	def _iter_pivot(task_id, store_ids=None, months=None, with_shop_name=False):
+		"""按 (store_id, code) 合并计划记录的流式透视，返回 (months, 迭代器)"""
+		months = months or CommodityScheduleService.get_task_months(task_id, fallback_months=4)
+		where_clause, values = CommodityScheduleService._get_pivot_conditions(task_id, store_ids, months)
+
+		shop_column = ", sl.shop_name" if with_shop_name else ""
+		shop_join = "LEFT JOIN `tabStore List` sl ON sl.name = cs.store_id" if with_shop_name else ""
+		query = f"""
+			SELECT cs.store_id, cs.code, cs.quantity, cs.sub_date,
+				pl.name1, pl.specifications, pl.brand, pl.category{shop_column}
+			FROM `tabCommodity Schedule` cs
+			INNER JOIN `tabProduct List` pl ON pl.name = cs.code
+			{shop_join}
+			WHERE {where_clause}
+			ORDER BY cs.store_id ASC, cs.code ASC, cs.sub_date ASC, cs.creation ASC
+		"""
+
+		def pivot():
+			current = None
+			for row in iter_sql_unbuffered(query, values):
+				if current is None or row.code != current["code"] or row.store_id != current["store_id"]:
+					if current is not None:
+						yield current
+					current = {
+						"store_id": row.store_id,
+						"code": row.code,
+						"name1": row.name1,
+						"specifications": row.specifications,
+						"brand": row.brand,
+						"category": row.category,
+						"months": {}
+					}
+					if with_shop_name:
+						current["shop_name"] = row.shop_name
+				# 按 creation 升序，后写入的覆盖先写入的
+				current["months"][row.sub_date.strftime("%Y-%m")] = row.quantity
+
+			if current is not None:
+				yield current
+
+		return months, pivot()
+
 	@staticmethod
 	def _get_multi_month_view(commodity_schedules, brand=None, category=None, search_term=None, default_months=None):
 		"""多月视图数据处理"""
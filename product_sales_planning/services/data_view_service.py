@@ -0,0 +1,300 @@
+"""
+数据查看查询服务
+按请求的列与生效的筛选条件组装数据查看查询：商品计划（cs）为主表，
+店铺、商品、任务、任务店铺四张表只在某个请求列或筛选条件需要时才关联
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, getdate
+
+from product_sales_planning.utils.date_utils import get_month_range_condition
+from product_sales_planning.utils.db_utils import iter_sql_unbuffered
+from product_sales_planning.utils.validation_utils import validate_sort_params
+
+# 可查询列（别名 -> (列表达式, 所需关联)），顺序即默认返回顺序
+DATA_VIEW_FIELDS = {
+	"name": ("cs.name", None),
+	"store_id": ("cs.store_id", None),
+	"shop_name": ("sl.shop_name", "sl"),
+	"channel": ("sl.channel", "sl"),
+	"code": ("cs.code", None),
+	"product_name": ("pl.name1", "pl"),
+	"specifications": ("pl.specifications", "pl"),
+	"brand": ("pl.brand", "pl"),
+	"category": ("pl.category", "pl"),
+	"quantity": ("cs.quantity", None),
+	"sub_date": ("cs.sub_date", None),
+	"approval_status": ("ts.approval_status", "ts"),
+	"submission_status": ("ts.status", "ts"),
+	"user": ("ts.user", "ts"),
+	"task_type": ("st.type", "st"),
+	"task_id": ("cs.task_id", None),
+	"start_date": ("st.start_date", "st"),
+	"end_date": ("st.end_date", "st")
+}
+
+# 关联表（按拼接顺序）；均以主表列关联，彼此无依赖
+DATA_VIEW_JOINS = {
+	"sl": "LEFT JOIN `tabStore List` sl ON cs.store_id = sl.name",
+	"pl": "LEFT JOIN `tabProduct List` pl ON cs.code = pl.name",
+	"st": "LEFT JOIN `tabSchedule tasks` st ON cs.task_id = st.name",
+	"ts": "LEFT JOIN `tabTasks Store` ts ON ts.parent = cs.task_id AND ts.store_name = cs.store_id"
+}
+
+# 可排序列（游标分页以 cs.name 作为并列时的次序）
+SORTABLE_FIELDS = (
+	"shop_name", "channel", "code", "product_name", "quantity", "sub_date", "approval_status", "user"
+)
+
+# 默认排序
+DEFAULT_SORT = ("sub_date", "DESC")
+
+# 统计所需列与聚合（基于筛选结果 filtered）
+STATS_FIELDS = ("store_id", "code", "quantity", "approval_status")
+STATS_COLUMNS = """
+	COUNT(DISTINCT store_id) as total_stores,
+	COUNT(DISTINCT code) as total_products,
+	SUM(quantity) as total_quantity,
+	COUNT(DISTINCT CASE WHEN approval_status = '已通过' THEN store_id END) as completed_stores,
+	COUNT(DISTINCT CASE WHEN approval_status = '待审批' THEN store_id END) as pending_stores,
+	COUNT(DISTINCT CASE WHEN approval_status = '已驳回' THEN store_id END) as rejected_stores
+"""
+
+# 统计信息默认值
+EMPTY_STATS = {
+	"total_stores": 0,
+	"total_products": 0,
+	"total_quantity": 0,
+	"completed_stores": 0,
+	"pending_stores": 0,
+	"rejected_stores": 0
+}
+
+# 导出列（表头, 字段）
+DATA_VIEW_EXPORT_COLUMNS = [
+	("店铺名称", "shop_name"),
+	("渠道", "channel"),
+	("商品编码", "code"),
+	("商品名称", "product_name"),
+	("规格", "specifications"),
+	("品牌", "brand"),
+	("类别", "category"),
+	("数量", "quantity"),
+	("提交时间", "sub_date"),
+	("审批状态", "approval_status"),
+	("提交状态", "submission_status"),
+	("负责人", "user"),
+	("任务类型", "task_type"),
+	("任务开始日期", "start_date"),
+	("任务结束日期", "end_date")
+]
+
+# 多选筛选条件（筛选键, 列表达式, 所需关联）
+LIST_FILTERS = (
+	("task_ids", "cs.task_id", None),
+	("store_ids", "cs.store_id", None),
+	("product_codes", "cs.code", None),
+	("channels", "sl.channel", "sl"),
+	("approval_statuses", "ts.approval_status", "ts"),
+	("submission_statuses", "ts.status", "ts")
+)
+
+
+class DataViewService:
+	"""数据查看查询服务类"""
+
+	@staticmethod
+	def resolve_fields(fields=None, required=()):
+		"""
+		校验并规范化请求列
+
+		Args:
+			fields: 列别名列表（或 JSON / 逗号分隔字符串），为空时返回全部列
+			required: 必须包含的列（如 name 与排序列），缺少时追加
+
+		Returns:
+			list: 按 DATA_VIEW_FIELDS 顺序排列的列别名
+		"""
+		if isinstance(fields, str):
+			fields = json.loads(fields) if fields.strip().startswith("[") else fields.split(",")
+		if not fields:
+			return list(DATA_VIEW_FIELDS)
+
+		requested = {field.strip() for field in fields if field and field.strip()}
+		invalid = sorted(requested - set(DATA_VIEW_FIELDS))
+		if invalid:
+			frappe.throw(_("不支持的字段: {0}").format(", ".join(invalid)))
+
+		requested.update(required)
+		return [field for field in DATA_VIEW_FIELDS if field in requested]
+
+	@staticmethod
+	def build_conditions(filters):
+		"""
+		根据筛选条件构建 WHERE 子句
+
+		Returns:
+			tuple: (where_clause, values, joins)，joins 为筛选条件所需的关联
+		"""
+		filters = filters or {}
+		conditions = ["1=1"]
+		values = {}
+		joins = set()
+
+		for key, column, join in LIST_FILTERS:
+			if not filters.get(key):
+				continue
+			items = filters[key]
+			if not isinstance(items, list):
+				items = [items]
+			conditions.append(f"{column} IN %({key})s")
+			values[key] = items
+			if join:
+				joins.add(join)
+
+		# 货品计划日期筛选（sub_date），均编译为列上的范围条件以便使用索引
+		if filters.get("plan_date"):
+			conditions.append("cs.sub_date >= %(plan_date)s AND cs.sub_date < %(plan_date_end)s")
+			values["plan_date"] = getdate(filters["plan_date"])
+			values["plan_date_end"] = add_days(values["plan_date"], 1)
+
+		# 月份筛选（支持多选，相邻月份合并为一个区间）
+		if filters.get("months"):
+			months = filters["months"]
+			if not isinstance(months, list):
+				months = [months]
+			month_clause, month_values = get_month_range_condition("cs.sub_date", months)
+			if not month_clause:
+				frappe.throw(_("月份格式无效，应为 YYYY-MM"))
+			conditions.append(month_clause)
+			values.update(month_values)
+
+		# 日期范围筛选（date_to 含当天）
+		if filters.get("date_from"):
+			conditions.append("cs.sub_date >= %(date_from)s")
+			values["date_from"] = getdate(filters["date_from"])
+
+		if filters.get("date_to"):
+			conditions.append("cs.sub_date < %(date_to_end)s")
+			values["date_to_end"] = add_days(getdate(filters["date_to"]), 1)
+
+		return " AND ".join(conditions), values, joins
+
+	@staticmethod
+	def build_from_clause(joins=()):
+		"""主表加所需关联（按 DATA_VIEW_JOINS 顺序拼接）"""
+		clauses = ["FROM `tabCommodity Schedule` cs"]
+		clauses.extend(sql for alias, sql in DATA_VIEW_JOINS.items() if alias in joins)
+		return "\n".join(clauses)
+
+	@staticmethod
+	def build_query(fields, where_clause, filter_joins=()):
+		"""
+		构建 SELECT 查询（不含排序与分页），只关联列与筛选条件所需的表
+
+		Args:
+			fields: resolve_fields 返回的列别名
+			where_clause / filter_joins: build_conditions 的返回值
+		"""
+		joins = set(filter_joins)
+		columns = []
+		for field in fields:
+			expression, join = DATA_VIEW_FIELDS[field]
+			columns.append(f"{expression} AS `{field}`")
+			if join:
+				joins.add(join)
+
+		return "SELECT {columns}\n{from_clause}\nWHERE {where_clause}".format(
+			columns=",\n".join(columns),
+			from_clause=DataViewService.build_from_clause(joins),
+			where_clause=where_clause
+		)
+
+	@staticmethod
+	def get_sort_column(sort_by):
+		"""排序列对应的基础表列表达式"""
+		return DATA_VIEW_FIELDS[sort_by][0]
+
+	@staticmethod
+	def validate_sort(sort_by, sort_order):
+		"""校验排序参数，未指定时使用默认排序"""
+		sort_by, sort_order = validate_sort_params(sort_by, sort_order, list(SORTABLE_FIELDS))
+		if not sort_by:
+			sort_by, sort_order = DEFAULT_SORT
+		return sort_by, sort_order
+
+	@staticmethod
+	def get_stats(where_clause, values, filter_joins=()):
+		"""查询筛选结果的总数与统计（只关联统计列与筛选条件所需的表）"""
+		query = DataViewService.build_query(STATS_FIELDS, where_clause, filter_joins)
+		result = frappe.db.sql(f"""
+			SELECT
+				COUNT(*) as total,
+				{STATS_COLUMNS}
+			FROM ({query}) filtered
+		""", values, as_dict=True)
+
+		row = result[0] if result else {}
+		return {
+			"total": row.pop("total", 0) or 0,
+			"stats": {key: row.get(key) or EMPTY_STATS[key] for key in EMPTY_STATS}
+		}
+
+	@staticmethod
+	def count(where_clause, values, filter_joins=()):
+		"""统计筛选结果行数（只关联筛选条件所需的表）"""
+		return frappe.db.sql(f"""
+			SELECT COUNT(*)
+			{DataViewService.build_from_clause(filter_joins)}
+			WHERE {where_clause}
+		""", values)[0][0]
+
+	@staticmethod
+	def iter_rows(filters, fields=None, sort_by=None, sort_order="asc"):
+		"""
+		按筛选条件与排序逐行读取数据查看结果（无缓冲游标，不在内存中累积结果集）
+
+		参数校验在调用时立即执行，返回的迭代器只负责读取
+		"""
+		sort_by, sort_order = DataViewService.validate_sort(sort_by, sort_order)
+		fields = DataViewService.resolve_fields(fields, required=("name", sort_by))
+		where_clause, values, filter_joins = DataViewService.build_conditions(filters)
+
+		query = f"""
+			{DataViewService.build_query(fields, where_clause, filter_joins)}
+			ORDER BY {DataViewService.get_sort_column(sort_by)} {sort_order}, cs.name {sort_order}
+		"""
+		return iter_sql_unbuffered(query, values)
+
+	@staticmethod
+	def iter_export_rows(filters, sort_by=None, sort_order="asc"):
+		"""
+		导出用的表头与行迭代器（只查询导出列）
+
+		Returns:
+			tuple: (headers, rows)
+		"""
+		headers = [header for header, _key in DATA_VIEW_EXPORT_COLUMNS]
+		fields = [key for _header, key in DATA_VIEW_EXPORT_COLUMNS]
+		rows = DataViewService.iter_rows(filters, fields, sort_by, sort_order)
+		return headers, (DataViewService.format_export_row(row) for row in rows)
+
+	@staticmethod
+	def format_export_row(row):
+		"""将数据行转换为导出列值"""
+		values = []
+		for _header, key in DATA_VIEW_EXPORT_COLUMNS:
+			value = row.get(key)
+			if key == "sub_date":
+				value = value.strftime("%Y-%m-%d %H:%M") if value else ""
+			elif key in ("start_date", "end_date"):
+				value = value.strftime("%Y-%m-%d") if value else ""
+			elif key == "quantity":
+				value = value or 0
+			elif value is None:
+				value = ""
+			values.append(value)
+		return values
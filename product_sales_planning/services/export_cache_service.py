@@ -0,0 +1,179 @@
+"""
+导出文件缓存服务
+导出结果以（导出类型, 参数, 计划数据版本）的哈希为内容地址：
+
+1. 文件名包含该哈希，数据未变化时重复导出直接返回已有文件，不再重新生成
+2. 计划数据变化后数据版本更换，哈希随之变化，生成新文件
+3. 导出文件保留 EXPORT_FILE_TTL，由定时任务批量删除过期文件及其 File 记录
+"""
+
+import os
+from datetime import timedelta
+
+import frappe
+from frappe.utils import now_datetime
+
+from product_sales_planning.constants import CacheScope
+from product_sales_planning.utils.cache_utils import (
+	delete_cached_result,
+	get_cached_result,
+	get_data_version,
+	get_or_compute,
+	hash_params,
+)
+
+# 导出文件保留时间（秒）
+EXPORT_FILE_TTL = 24 * 60 * 60
+
+# 导出生成的文件名前缀（定时清理只处理这些文件）
+EXPORT_FILE_PREFIXES = ("数据查看_", "commodity_plan_export_")
+
+# 每条 DELETE 语句删除的 File 记录数
+PURGE_CHUNK_SIZE = 500
+
+
+class ExportCacheService:
+	"""导出文件缓存服务类"""
+
+	@staticmethod
+	def get_or_create(export_type, params, file_name, writer, is_private=0, allow_empty=False):
+		"""
+		获取导出文件，相同导出类型、参数与数据版本已有文件时直接返回
+
+		Args:
+			export_type: 导出类型（参与哈希）
+			params: 导出参数（参与哈希）
+			file_name: 文件名（不含时间戳），实际文件名在扩展名前加内容哈希
+			writer: 写出函数 writer(file_path) -> 导出行数
+			is_private: 是否为私有文件（私有文件按用户区分，发起人才能下载）
+			allow_empty: 无数据时是否仍生成文件（仅含表头）
+
+		Returns:
+			dict: {"file_url", "file_name", "record_count", "cached"}；无数据且不允许空文件时
+				file_url 为 None
+		"""
+		digest = hash_params({
+			"export_type": export_type,
+			"params": params,
+			"version": get_data_version(CacheScope.PLAN),
+			"owner": frappe.session.user if is_private else None
+		})
+		stem, ext = os.path.splitext(file_name)
+		file_name = f"{stem}_{digest[:16]}{ext}"
+		cache_key = f"export_file:{digest}"
+
+		cached = get_cached_result(cache_key)
+		if cached:
+			if not cached["file_url"] or os.path.exists(_get_file_path(file_name, is_private)):
+				return dict(cached, cached=1)
+			# 文件已被清理，重新生成
+			delete_cached_result(cache_key)
+
+		result = get_or_compute(
+			cache_key,
+			lambda: _write_export_file(file_name, writer, is_private, allow_empty),
+			EXPORT_FILE_TTL,
+			lock_timeout=10 * 60,
+			wait_timeout=5 * 60
+		)
+		return dict(result, cached=0)
+
+	@staticmethod
+	def purge_expired(max_age=EXPORT_FILE_TTL):
+		"""
+		删除超过保留时间的导出文件及其 File 记录
+
+		1. 未附加到文档的过期导出 File 记录按前缀与创建时间一次查询、分块批量删除，
+		   并删除这些记录指向的文件
+		2. 公开与私有目录中没有任何 File 记录指向的旧导出文件（早期直接写入目录的导出）
+		   按修改时间一并删除；仍有 File 记录指向的文件（已附加到文档、用户重新上传等）保留
+
+		Returns:
+			int: 删除的文件数
+		"""
+		cutoff = now_datetime() - timedelta(seconds=max_age)
+		conditions = " OR ".join(["file_name LIKE %s"] * len(EXPORT_FILE_PREFIXES))
+		values = [prefix.replace("_", "\\_") + "%" for prefix in EXPORT_FILE_PREFIXES]
+		values.append(cutoff)
+
+		rows = frappe.db.sql(f"""
+			SELECT name, file_url, is_private
+			FROM `tabFile`
+			WHERE ({conditions})
+				AND creation < %s
+				AND is_folder = 0
+				AND IFNULL(attached_to_doctype, '') = ''
+		""", values, as_dict=True)
+		for start in range(0, len(rows), PURGE_CHUNK_SIZE):
+			frappe.db.delete("File", {"name": ["in", [row.name for row in rows[start:start + PURGE_CHUNK_SIZE]]]})
+
+		# 本次删除了 File 记录的文件：同一 file_url 已没有其他 File 记录时才删除
+		candidates = {}
+		for row in rows:
+			if row.file_url:
+				candidates[row.file_url] = _get_file_path(os.path.basename(row.file_url), row.is_private)
+
+		# 目录中没有 File 记录的旧导出文件
+		cutoff_ts = cutoff.timestamp()
+		for is_private in (0, 1):
+			folder = _get_file_path("", is_private)
+			if not os.path.isdir(folder):
+				continue
+			url_prefix = "/private/files/" if is_private else "/files/"
+			with os.scandir(folder) as entries:
+				for entry in entries:
+					if not entry.name.startswith(EXPORT_FILE_PREFIXES) or not entry.is_file():
+						continue
+					if entry.stat().st_mtime < cutoff_ts:
+						candidates.setdefault(url_prefix + entry.name, entry.path)
+
+		referenced = _get_referenced_file_urls(list(candidates))
+		removed = 0
+		for file_url, file_path in candidates.items():
+			if file_url in referenced or not os.path.exists(file_path):
+				continue
+			os.remove(file_path)
+			removed += 1
+		return removed
+
+
+def _write_export_file(file_name, writer, is_private, allow_empty):
+	"""写出导出文件并登记 File 记录（先写临时文件，完成后再原子替换）"""
+	file_path = _get_file_path(file_name, is_private)
+	temp_path = f"{file_path}.{frappe.generate_hash(length=8)}.tmp"
+	try:
+		record_count = writer(temp_path)
+		if not record_count and not allow_empty:
+			return {"file_url": None, "file_name": None, "record_count": 0}
+		os.replace(temp_path, file_path)
+	finally:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+
+	file_url = f"/private/files/{file_name}" if is_private else f"/files/{file_name}"
+	if not frappe.db.exists("File", {"file_url": file_url}):
+		frappe.get_doc({
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": file_url,
+			"is_private": is_private
+		}).insert(ignore_permissions=True)
+
+	return {"file_url": file_url, "file_name": file_name, "record_count": record_count or 0}
+
+
+def _get_file_path(file_name, is_private):
+	"""文件在站点公开或私有目录中的路径"""
+	return frappe.get_site_path("private" if is_private else "public", "files", file_name)
+
+
+def _get_referenced_file_urls(file_urls):
+	"""仍有 File 记录指向的 file_url（分块查询）"""
+	referenced = set()
+	for start in range(0, len(file_urls), PURGE_CHUNK_SIZE):
+		referenced.update(frappe.get_all(
+			"File",
+			filters={"file_url": ["in", file_urls[start:start + PURGE_CHUNK_SIZE]]},
+			pluck="file_url"
+		))
+	return referenced
@@ -0,0 +1,423 @@
+"""
+导出服务
+生成导出文件，并支持以后台任务方式执行导出
+
+后台导出流程：
+1. enqueue 生成 job_id，记录任务状态并放入 long 队列
+2. 任务执行时按行数推送进度（实时事件 EXPORT_EVENT，仅推送给发起人）
+3. 完成后生成私有文件，状态中返回 file_url；客户端订阅事件或轮询 get_status
+
+导出文件经 ExportCacheService 按（导出类型, 参数, 数据版本）缓存，数据未变化时直接复用
+"""
+
+import json
+import re
+import zipfile
+from datetime import datetime
+from itertools import groupby
+
+import frappe
+from frappe import _
+
+from product_sales_planning.services.data_view_service import DataViewService
+from product_sales_planning.services.export_cache_service import ExportCacheService
+from product_sales_planning.utils.excel_utils import write_xlsx_stream
+from product_sales_planning.utils.realtime_utils import EXPORT_EVENT
+
+# 任务状态缓存
+EXPORT_JOB_KEY_PREFIX = "product_sales_planning:export_job:"
+EXPORT_JOB_TTL = 24 * 60 * 60
+
+# 后台任务超时（秒）
+EXPORT_JOB_TIMEOUT = 60 * 60
+
+# 每处理多少行推送一次进度
+PROGRESS_INTERVAL = 2000
+
+# 商品计划导出的固定列（表头, 列宽），其后为月份列
+COMMODITY_EXPORT_COLUMNS = [
+	("产品编码", 15),
+	("产品名称", 25),
+	("规格", 12),
+	("品牌", 12),
+	("类别", 12)
+]
+
+# 月份列宽
+MONTH_COLUMN_WIDTH = 12
+
+# 整任务导出的店铺列（表头, 列宽），位于商品计划列之前
+TASK_EXPORT_STORE_COLUMNS = [
+	("店铺ID", 15),
+	("店铺名称", 25)
+]
+
+# 整任务导出格式：单个工作表（含店铺列）或每店铺一个工作簿的 ZIP
+TASK_EXPORT_FORMATS = ("xlsx", "zip")
+
+# ZIP 内文件名中不允许的字符
+UNSAFE_FILE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class ExportJobStatus:
+	"""导出任务状态"""
+	QUEUED = "queued"
+	RUNNING = "running"
+	DONE = "done"
+	FAILED = "failed"
+
+
+class ExportService:
+	"""导出服务类"""
+
+	@staticmethod
+	def write_data_view_workbook(file_obj, filters=None, sort_by=None, sort_order="asc", progress=None):
+		"""
+		写出数据查看 Excel
+
+		Args:
+			file_obj: 文件路径或二进制文件对象
+			filters: 数据查看筛选条件
+			sort_by / sort_order: 排序
+			progress: 进度回调 progress(processed, total)
+
+		Returns:
+			int: 导出行数
+		"""
+		if isinstance(filters, str):
+			filters = json.loads(filters) if filters else {}
+		filters = filters or {}
+		total = None
+		if progress:
+			# 后台任务先统计总数，用于计算进度百分比
+			total = DataViewService.count(*DataViewService.build_conditions(filters))
+
+		headers, rows = DataViewService.iter_export_rows(filters, sort_by, sort_order)
+		return write_xlsx_stream(file_obj, "数据查看", headers, _track_progress(rows, total, progress))
+
+	@staticmethod
+	def write_commodity_workbook(file_obj, store_id=None, task_id=None, progress=None):
+		"""
+		写出店铺商品计划 Excel（每个商品一行，月份为列）
+
+		基于流式透视逐行写出（write_only 模式），列宽固定、仅表头带样式
+
+		Returns:
+			int: 导出行数，无数据时返回 0
+		"""
+		from product_sales_planning.services.commodity_service import CommodityScheduleService
+
+		headers, rows = ExportService.iter_commodity_rows(store_id, task_id)
+		total = None
+		if progress:
+			# 后台任务先统计商品数，用于计算进度百分比
+			total = CommodityScheduleService.count_plan_products(store_id, task_id, headers[len(COMMODITY_EXPORT_COLUMNS):])
+
+		column_widths = [width for _header, width in COMMODITY_EXPORT_COLUMNS]
+		column_widths += [MONTH_COLUMN_WIDTH] * (len(headers) - len(column_widths))
+
+		return write_xlsx_stream(
+			file_obj,
+			"商品计划数据",
+			headers,
+			_track_progress(rows, total, progress),
+			column_widths=column_widths
+		)
+
+	@staticmethod
+	def iter_commodity_rows(store_id, task_id):
+		"""
+		店铺商品计划导出的表头与行迭代器（基于流式透视，不在内存中累积），供 Excel 与 CSV 导出共用
+
+		Returns:
+			tuple: (headers, rows)
+		"""
+		from product_sales_planning.services.commodity_service import CommodityScheduleService
+
+		months, plan_rows = CommodityScheduleService.iter_plan_rows(store_id, task_id)
+		headers = [header for header, _width in COMMODITY_EXPORT_COLUMNS] + months
+		rows = (_commodity_row(item, months) for item in plan_rows)
+		return headers, rows
+
+	@staticmethod
+	def write_task_commodity_export(file_obj, task_id=None, store_ids=None, file_format="xlsx", progress=None):
+		"""
+		写出整个任务（全部或指定店铺）的商品计划
+
+		全部店铺的计划按 (store_id, code, sub_date) 一次有序扫描读取：
+		- xlsx：单个工作表，每行前加店铺列
+		- zip：每个店铺一个工作簿，逐店铺流式写入 ZIP，内存中只保留当前店铺的写出状态
+
+		Args:
+			file_obj: 文件路径或二进制文件对象
+			task_id: 任务ID
+			store_ids: 店铺ID列表（或 JSON 字符串），为空时导出全部店铺
+			file_format: 导出格式（TASK_EXPORT_FORMATS）
+			progress: 进度回调 progress(processed, total)
+
+		Returns:
+			int: 导出行数（店铺 × 商品）
+		"""
+		from product_sales_planning.services.commodity_service import CommodityScheduleService
+
+		if file_format not in TASK_EXPORT_FORMATS:
+			frappe.throw(_("不支持的导出格式: {0}").format(file_format))
+		if isinstance(store_ids, str):
+			store_ids = json.loads(store_ids) if store_ids else None
+
+		months, plan_rows = CommodityScheduleService.iter_task_plan_rows(task_id, store_ids)
+		total = None
+		if progress:
+			total = CommodityScheduleService.count_task_plan_rows(task_id, store_ids, months)
+		plan_rows = _track_progress(plan_rows, total, progress)
+
+		commodity_headers = [header for header, _width in COMMODITY_EXPORT_COLUMNS] + months
+		commodity_widths = [width for _header, width in COMMODITY_EXPORT_COLUMNS] + [MONTH_COLUMN_WIDTH] * len(months)
+
+		if file_format == "xlsx":
+			headers = [header for header, _width in TASK_EXPORT_STORE_COLUMNS] + commodity_headers
+			column_widths = [width for _header, width in TASK_EXPORT_STORE_COLUMNS] + commodity_widths
+			rows = (
+				[item["store_id"], item["shop_name"] or "", *_commodity_row(item, months)]
+				for item in plan_rows
+			)
+			return write_xlsx_stream(file_obj, "商品计划数据", headers, rows, column_widths=column_widths)
+
+		count = 0
+		with zipfile.ZipFile(file_obj, "w", zipfile.ZIP_DEFLATED) as archive:
+			for store_id, store_rows in groupby(plan_rows, key=lambda item: item["store_id"]):
+				first = next(store_rows)
+				entry_name = _store_entry_name(store_id, first["shop_name"])
+				rows = (_commodity_row(item, months) for item in _prepend(first, store_rows))
+				with archive.open(entry_name, "w", force_zip64=True) as entry:
+					count += write_xlsx_stream(
+						entry, "商品计划数据", commodity_headers, rows, column_widths=commodity_widths
+					)
+		return count
+
+	@staticmethod
+	def get_commodity_file_name(store_id=None, task_id=None, ext="xlsx", with_timestamp=True):
+		"""生成商品计划导出文件名（经导出缓存生成的文件不带时间戳，由缓存加内容哈希）"""
+		filename_parts = ["commodity_plan_export"]
+		if store_id:
+			filename_parts.append(f"store_{store_id}")
+		if task_id:
+			filename_parts.append(f"task_{task_id}")
+		if with_timestamp:
+			filename_parts.append(datetime.now().strftime('%Y%m%d_%H%M%S'))
+		return "_".join(filename_parts) + f".{ext}"
+
+
+class ExportJobService:
+	"""后台导出任务服务类"""
+
+	@staticmethod
+	def enqueue(export_type, params=None):
+		"""
+		提交后台导出任务
+
+		Args:
+			export_type: 导出类型（EXPORT_TYPES 中的键）
+			params: 导出参数（传给对应的导出函数）
+
+		Returns:
+			dict: 任务初始状态（含 job_id）
+		"""
+		if export_type not in EXPORT_TYPES:
+			frappe.throw(_("不支持的导出类型: {0}").format(export_type))
+
+		export = EXPORT_TYPES[export_type]
+		params = {key: value for key, value in (params or {}).items() if key in export["params"]}
+		if export.get("check"):
+			export["check"](params)
+
+		job_id = frappe.generate_hash(length=16)
+		state = {
+			"job_id": job_id,
+			"export_type": export_type,
+			"status": ExportJobStatus.QUEUED,
+			"progress": 0,
+			"processed": 0,
+			"total": None,
+			"owner": frappe.session.user,
+			"file_url": None,
+			"file_name": None,
+			"record_count": None,
+			"message": None
+		}
+		_save_state(state)
+
+		frappe.enqueue(
+			"product_sales_planning.services.export_service.run_export_job",
+			queue="long",
+			timeout=EXPORT_JOB_TIMEOUT,
+			job_id=f"psp_export::{job_id}",
+			export_job_id=job_id,
+			export_type=export_type,
+			params=params
+		)
+		return state
+
+	@staticmethod
+	def get_status(job_id):
+		"""获取任务状态（仅发起人与系统管理员可见）"""
+		state = frappe.cache().get_value(EXPORT_JOB_KEY_PREFIX + job_id, expires=True)
+		if not state:
+			return None
+
+		if state["owner"] != frappe.session.user and "System Manager" not in frappe.get_roles():
+			frappe.throw(_("无权查看该导出任务"), frappe.PermissionError)
+
+		return state
+
+
+def run_export_job(export_job_id, export_type, params):
+	"""后台执行导出任务（由 frappe.enqueue 调用，以发起人身份运行）"""
+	state = frappe.cache().get_value(EXPORT_JOB_KEY_PREFIX + export_job_id, expires=True)
+	if not state:
+		return
+
+	def update(**changes):
+		state.update(changes)
+		_save_state(state)
+		frappe.publish_realtime(EXPORT_EVENT, state, user=state["owner"])
+
+	def progress(processed, total):
+		update(
+			processed=processed,
+			total=total,
+			progress=min(99, int(processed * 100 / total)) if total else None
+		)
+
+	try:
+		update(status=ExportJobStatus.RUNNING)
+
+		# 写入私有目录并登记 File 记录；相同参数与数据版本已导出过时直接复用
+		export = EXPORT_TYPES[export_type]
+		result = ExportCacheService.get_or_create(
+			export_type,
+			params,
+			export["file_name"](params),
+			lambda file_path: export["writer"](file_path, progress=progress, **params),
+			is_private=1
+		)
+		if not result["file_url"]:
+			update(status=ExportJobStatus.FAILED, message="没有数据可导出")
+			return
+		frappe.db.commit()
+
+		record_count = result["record_count"]
+		update(
+			status=ExportJobStatus.DONE,
+			progress=100,
+			processed=record_count,
+			total=record_count,
+			record_count=record_count,
+			file_url=result["file_url"],
+			file_name=result["file_name"],
+			message="导出成功"
+		)
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(title="后台导出失败", message=frappe.get_traceback())
+		update(status=ExportJobStatus.FAILED, message=f"导出失败: {e!s}")
+
+
+def _save_state(state):
+	"""保存任务状态"""
+	frappe.cache().set_value(EXPORT_JOB_KEY_PREFIX + state["job_id"], state, expires_in_sec=EXPORT_JOB_TTL)
+
+
+def _track_progress(rows, total, progress):
+	"""包装行迭代器，每 PROGRESS_INTERVAL 行回调一次进度"""
+	if not progress:
+		yield from rows
+		return
+
+	processed = 0
+	for row in rows:
+		yield row
+		processed += 1
+		if processed % PROGRESS_INTERVAL == 0:
+			progress(processed, total)
+
+
+def _commodity_row(item, months):
+	"""商品计划透视行转换为导出列值（商品列 + 月份列）"""
+	return [
+		item["code"],
+		item["name1"] or "",
+		item["specifications"] or "",
+		item["brand"] or "",
+		item["category"] or ""
+	] + [item["months"].get(month, 0) for month in months]
+
+
+def _prepend(first, rows):
+	"""将已读取的首行放回行迭代器"""
+	yield first
+	yield from rows
+
+
+def _store_entry_name(store_id, shop_name):
+	"""ZIP 内店铺工作簿文件名"""
+	name = f"{store_id}_{shop_name}" if shop_name else str(store_id)
+	return UNSAFE_FILE_NAME_CHARS.sub("_", name) + ".xlsx"
+
+
+def _data_view_file_name(params):
+	"""生成数据查看导出文件名"""
+	return "数据查看_export.xlsx"
+
+
+def _commodity_file_name(params):
+	"""生成商品计划导出文件名"""
+	return ExportService.get_commodity_file_name(params.get("store_id"), params.get("task_id"), with_timestamp=False)
+
+
+def _task_commodity_file_name(params):
+	"""生成整任务商品计划导出文件名"""
+	file_format = params.get("file_format") or "xlsx"
+	return ExportService.get_commodity_file_name(task_id=params.get("task_id"), ext=file_format, with_timestamp=False)
+
+
+def _check_task_commodity_access(params):
+	"""整任务导出：校验任务及各店铺（未指定 store_ids 时为任务下全部店铺）的读取权限"""
+	task_id = params.get("task_id")
+	if not task_id:
+		frappe.throw(_("缺少必需参数: task_id"))
+	frappe.has_permission("Schedule tasks", "read", doc=task_id, throw=True)
+
+	store_ids = params.get("store_ids")
+	if isinstance(store_ids, str):
+		store_ids = json.loads(store_ids) if store_ids else None
+	if not store_ids:
+		store_ids = frappe.get_all(
+			"Tasks Store",
+			filters={"parent": task_id, "parenttype": "Schedule tasks"},
+			pluck="store_name"
+		)
+	for store_id in sorted(set(filter(None, store_ids))):
+		frappe.has_permission("Store List", "read", doc=store_id, throw=True)
+
+
+# 导出类型：写出函数、文件名函数、允许的参数、提交前的权限校验（可选）
+EXPORT_TYPES = {
+	"data_view": {
+		"writer": ExportService.write_data_view_workbook,
+		"file_name": _data_view_file_name,
+		"params": ("filters", "sort_by", "sort_order"),
+	},
+	"commodity": {
+		"writer": ExportService.write_commodity_workbook,
+		"file_name": _commodity_file_name,
+		"params": ("store_id", "task_id"),
+	},
+	"task_commodity": {
+		"writer": ExportService.write_task_commodity_export,
+		"file_name": _task_commodity_file_name,
+		"params": ("task_id", "store_ids", "file_format"),
+		"check": _check_task_commodity_access,
+	},
+}
@@ -0,0 +1,186 @@
+"""
+筛选器选项服务
+统一缓存看板、店铺详情、数据查看页面共用的筛选器选项（渠道、负责人、店铺、任务）
+
+缓存存放在 Redis 哈希中，每个选项一个字段：
+- Store List 变更时仅清除店铺相关字段（stores / channels / users）
+- Schedule tasks 变更时仅清除任务相关字段（open_tasks / all_tasks）
+
+商品与店铺数量较大，不整体缓存下发，改为分页前缀搜索（search_products / search_stores）
+"""
+
+import frappe
+
+FILTER_OPTIONS_CACHE_KEY = "product_sales_planning:filter_options"
+
+# 各缓存字段对应的数据来源，用于按 DocType 定向失效
+STORE_OPTION_FIELDS = ("stores", "channels", "users")
+TASK_OPTION_FIELDS = ("open_tasks", "all_tasks")
+
+# 前缀搜索默认每页条数
+SEARCH_PAGE_SIZE = 20
+
+
+class FilterOptionsService:
+	"""筛选器选项服务类"""
+
+	@staticmethod
+	def _get_cached(field, generator):
+		"""读取缓存字段，未命中时调用 generator 生成并写回"""
+		return frappe.cache().hget(FILTER_OPTIONS_CACHE_KEY, field, generator=generator)
+
+	@staticmethod
+	def get_channels():
+		"""获取所有渠道"""
+		def generator():
+			rows = frappe.db.sql("""
+				SELECT DISTINCT channel
+				FROM `tabStore List`
+				WHERE channel IS NOT NULL AND channel != ''
+				ORDER BY channel
+			""", as_dict=True)
+			return [r["channel"] for r in rows]
+
+		return FilterOptionsService._get_cached("channels", generator)
+
+	@staticmethod
+	def get_users():
+		"""获取所有店铺负责人"""
+		def generator():
+			rows = frappe.db.sql("""
+				SELECT DISTINCT user1 as user
+				FROM `tabStore List`
+				WHERE user1 IS NOT NULL AND user1 != ''
+				ORDER BY user1
+			""", as_dict=True)
+			return [r["user"] for r in rows]
+
+		return FilterOptionsService._get_cached("users", generator)
+
+	@staticmethod
+	def get_stores():
+		"""获取所有店铺（name, shop_name, channel）"""
+		def generator():
+			return frappe.get_all(
+				"Store List",
+				fields=["name", "shop_name", "channel"],
+				order_by="shop_name asc"
+			)
+
+		return FilterOptionsService._get_cached("stores", generator)
+
+	@staticmethod
+	def get_open_tasks():
+		"""获取所有开启中的任务"""
+		def generator():
+			return frappe.get_all(
+				"Schedule tasks",
+				filters={"status": "开启中"},
+				fields=["name", "type", "start_date", "end_date"],
+				order_by="creation desc"
+			)
+
+		return FilterOptionsService._get_cached("open_tasks", generator)
+
+	@staticmethod
+	def get_all_tasks():
+		"""获取全部任务（仅名称）"""
+		def generator():
+			return frappe.get_all(
+				"Schedule tasks",
+				fields=["name"],
+				order_by="creation desc"
+			)
+
+		return FilterOptionsService._get_cached("all_tasks", generator)
+
+	@staticmethod
+	def search_products(txt=None, start=0, page_length=SEARCH_PAGE_SIZE):
+		"""
+		按编码或名称前缀搜索商品（分页，不缓存）
+
+		编码（主键）与名称各用一条前缀 LIKE 查询，均可走索引，UNION 去重后排序分页
+
+		Returns:
+			dict: {"data": [...], "has_more": bool}
+		"""
+		fields = "name, name1, code, brand, category"
+		if not txt:
+			rows = frappe.db.sql(f"""
+				SELECT {fields}
+				FROM `tabProduct List`
+				ORDER BY name1, name
+				LIMIT %(limit)s OFFSET %(start)s
+			""", {"limit": page_length + 1, "start": start}, as_dict=True)
+		else:
+			rows = frappe.db.sql(f"""
+				SELECT {fields} FROM `tabProduct List` WHERE name LIKE %(prefix)s
+				UNION
+				SELECT {fields} FROM `tabProduct List` WHERE name1 LIKE %(prefix)s
+				ORDER BY name1, name
+				LIMIT %(limit)s OFFSET %(start)s
+			""", {"prefix": _prefix_pattern(txt), "limit": page_length + 1, "start": start}, as_dict=True)
+
+		return _page_result(rows, page_length)
+
+	@staticmethod
+	def search_stores(txt=None, start=0, page_length=SEARCH_PAGE_SIZE):
+		"""
+		按店铺ID或店铺名称前缀搜索店铺（分页，不缓存）
+
+		Returns:
+			dict: {"data": [...], "has_more": bool}
+		"""
+		fields = "name, shop_name, channel"
+		if not txt:
+			rows = frappe.db.sql(f"""
+				SELECT {fields}
+				FROM `tabStore List`
+				ORDER BY shop_name, name
+				LIMIT %(limit)s OFFSET %(start)s
+			""", {"limit": page_length + 1, "start": start}, as_dict=True)
+		else:
+			rows = frappe.db.sql(f"""
+				SELECT {fields} FROM `tabStore List` WHERE name LIKE %(prefix)s
+				UNION
+				SELECT {fields} FROM `tabStore List` WHERE shop_name LIKE %(prefix)s
+				ORDER BY shop_name, name
+				LIMIT %(limit)s OFFSET %(start)s
+			""", {"prefix": _prefix_pattern(txt), "limit": page_length + 1, "start": start}, as_dict=True)
+
+		return _page_result(rows, page_length)
+
+	@staticmethod
+	def clear(fields=None):
+		"""清除指定缓存字段；未指定时清除全部"""
+		cache = frappe.cache()
+		if fields is None:
+			cache.delete_value(FILTER_OPTIONS_CACHE_KEY)
+			return
+
+		for field in fields:
+			cache.hdel(FILTER_OPTIONS_CACHE_KEY, field)
+
+
+def _prefix_pattern(txt):
+	"""构造前缀 LIKE 模式（转义通配符，保证只做前缀匹配）"""
+	escaped = txt.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+	return escaped + "%"
+
+
+def _page_result(rows, page_length):
+	"""多取一行判断是否还有下一页"""
+	return {"data": rows[:page_length], "has_more": len(rows) > page_length}
+
+
+# ========== doc_events 钩子 ==========
+# after_rename 钩子额外传入 (old, new, merge)，处理函数统一接收 *args, **kwargs
+
+def on_store_list_change(doc, method=None, *args, **kwargs):
+	"""Store List 变更：清除店铺相关选项"""
+	FilterOptionsService.clear(STORE_OPTION_FIELDS)
+
+
+def on_schedule_tasks_change(doc, method=None, *args, **kwargs):
+	"""Schedule tasks 变更：清除任务相关选项"""
+	FilterOptionsService.clear(TASK_OPTION_FIELDS)
@@ -0,0 +1,717 @@
+"""
+导入服务
+商品计划导入流水线：流式读取文件 → 批量校验商品编码 → 一次查询比对已有计划 → 分块批量写入
+
+按 IMPORT_CHUNK_SIZE 行分块处理：每块商品校验与已有计划比对各一次查询，写入按块批量执行，
+查询次数与单元格数无关
+
+后台导入（ImportJobService）：
+1. 以（店铺、任务、文件内容哈希）确定 job_id，同一文件重复提交时复用任务状态
+2. 每块写入后提交事务并记录断点（最后处理的行号与累计结果），推送进度（IMPORT_EVENT）
+3. worker 中断或任务失败后重新提交同一文件，从断点继续而不是从头开始
+
+多店铺导入（不指定店铺）：文件首列为店铺（店铺ID或店铺名称），其后与单店铺文件相同；
+任务店铺一次读取后在内存中校验，各块按店铺分组比对并批量写入，结果按店铺分别计数
+"""
+
+import csv
+import hashlib
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+
+from product_sales_planning.constants import DELIMITED_FILE_EXTENSIONS, CacheScope
+from product_sales_planning.services.commodity_service import CommodityScheduleService
+from product_sales_planning.utils.cache_utils import bump_data_version
+from product_sales_planning.utils.date_utils import get_month_first_day, parse_month_string
+from product_sales_planning.utils.realtime_utils import IMPORT_EVENT, publish_plan_event
+from product_sales_planning.utils.validation_utils import validate_doctype_exists, validate_file_extension
+
+# 每条批量语句处理的记录数
+IMPORT_CHUNK_SIZE = 500
+
+# 产品编码、产品名称之后为月份列
+MONTH_COLUMN_OFFSET = 2
+
+# 多店铺导入：店铺列位于产品编码之前
+STORE_COLUMN_COUNT = 1
+
+# 返回给前端的最大错误条数
+MAX_IMPORT_ERRORS = 20
+
+# 预检（dry_run）返回的变更样例条数
+DRY_RUN_SAMPLE_SIZE = 50
+
+# 任务状态（含断点）缓存
+IMPORT_JOB_KEY_PREFIX = "product_sales_planning:import_job:"
+IMPORT_JOB_TTL = 7 * 24 * 60 * 60
+
+# 后台任务超时（秒）
+IMPORT_JOB_TIMEOUT = 60 * 60
+
+# 导入结果累计初始值
+EMPTY_IMPORT_TOTALS = {
+	"inserted": 0,
+	"updated": 0,
+	"unchanged": 0,
+	"skipped": 0
+}
+
+# 多店铺导入的单店铺计数初始值
+EMPTY_STORE_TOTALS = {
+	"inserted": 0,
+	"updated": 0,
+	"unchanged": 0
+}
+
+
+class ImportService:
+	"""商品计划导入服务类"""
+
+	@staticmethod
+	def iter_file_rows(file_path):
+		"""
+		按扩展名流式读取导入文件的行值：CSV / TSV 使用 csv 模块，其余按 xlsx 读取
+
+		Yields:
+			tuple: 行值（CSV / TSV 为字符串）
+		"""
+		validate_file_extension(file_path)
+		ext = os.path.splitext(file_path)[1].lower()
+		if ext in DELIMITED_FILE_EXTENSIONS:
+			return ImportService.iter_delimited_rows(file_path, DELIMITED_FILE_EXTENSIONS[ext])
+		return ImportService.iter_xlsx_rows(file_path)
+
+	@staticmethod
+	def iter_delimited_rows(file_path, delimiter=","):
+		"""
+		流式读取 CSV / TSV（UTF-8，可带 BOM；非 UTF-8 文件按 GB18030 读取，兼容 Excel 另存的 CSV）
+
+		Yields:
+			tuple: 行值
+		"""
+		encoding = _detect_text_encoding(file_path)
+		with open(file_path, newline="", encoding=encoding) as f:
+			for row in csv.reader(f, delimiter=delimiter):
+				yield tuple(row)
+
+	@staticmethod
+	def count_file_rows(file_path):
+		"""读取导入文件的行数（用于进度计算，无法确定时返回 None）"""
+		ext = os.path.splitext(file_path)[1].lower()
+		if ext not in DELIMITED_FILE_EXTENSIONS:
+			return ImportService.count_xlsx_rows(file_path)
+
+		with open(file_path, newline="", encoding=_detect_text_encoding(file_path)) as f:
+			return sum(1 for _row in csv.reader(f, delimiter=DELIMITED_FILE_EXTENSIONS[ext]))
+
+	@staticmethod
+	def iter_xlsx_rows(file_path):
+		"""
+		以 read_only 模式流式读取第一个工作表的行值（不在内存中构建整个工作簿）
+
+		Yields:
+			tuple: 行值
+		"""
+		import openpyxl
+
+		wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+		try:
+			yield from wb.active.iter_rows(values_only=True)
+		finally:
+			wb.close()
+
+	@staticmethod
+	def count_xlsx_rows(file_path):
+		"""读取工作表的行数（read_only 模式下来自工作表尺寸记录，无法确定时返回 None）"""
+		import openpyxl
+
+		wb = openpyxl.load_workbook(file_path, read_only=True)
+		try:
+			return wb.active.max_row
+		finally:
+			wb.close()
+
+	@staticmethod
+	def import_plan_rows(store_id, task_id, rows, start_row=2, totals=None, on_chunk=None, dry_run=False):
+		"""
+		导入商品计划（每 IMPORT_CHUNK_SIZE 行为一块：批量校验、比对、写入）
+
+		不提交事务：同步导入由调用方最后提交；后台任务在 on_chunk 中逐块提交并记录断点。
+		dry_run 时整个文件作为一块，只做校验与比对（已有计划一次读取），不写入，
+		结果额外包含变更样例 changes
+
+		store_id 为空时为多店铺导入：每行首列为店铺，店铺须属于该任务且当前用户有权限导入，
+		结果另含各店铺计数 stores
+
+		Args:
+			store_id: 店铺ID（为空时按多店铺文件导入）
+			task_id: 任务ID
+			rows: 行值迭代器，第一行为表头（[店铺]、产品编码、产品名称、月份...）
+			start_row: 从该行号开始处理（断点续传时跳过已处理的行，行号从 1 计，表头为第 1 行）
+			totals: 已处理部分的累计结果（断点续传时传入）
+			on_chunk: 每块写入后的回调 on_chunk(last_row, totals)
+			dry_run: 只计算变更，不写入
+
+		Returns:
+			dict: {"inserted", "updated", "unchanged", "skipped", "errors"}，dry_run 时另含 changes，
+				多店铺导入另含 stores: {store_id: {"inserted", "updated", "unchanged"}}
+		"""
+		validate_doctype_exists("Schedule tasks", task_id, "计划任务")
+		if not dry_run:
+			ImportService.check_plan_permissions()
+
+		store_lookup = None
+		if store_id:
+			validate_doctype_exists("Store List", store_id, "店铺")
+		else:
+			store_lookup = ImportService.get_task_store_lookup(task_id)
+			if not store_lookup:
+				frappe.throw(_("计划任务下没有店铺"))
+			# 只能导入有权限的店铺，其他店铺的行按无权限跳过
+			store_lookup = ImportService.filter_accessible_stores(store_lookup)
+			if not store_lookup:
+				frappe.throw(_("无权限导入该计划任务下的店铺"), frappe.PermissionError)
+
+		totals = dict(totals) if totals else dict(EMPTY_IMPORT_TOTALS, errors=[])
+		if store_lookup is not None:
+			totals.setdefault("stores", {})
+		if dry_run:
+			totals["changes"] = []
+		chunk_size = None if dry_run else IMPORT_CHUNK_SIZE
+
+		rows = iter(rows)
+		header = next(rows, None)
+		if store_lookup is not None:
+			if not header or len(header) < STORE_COLUMN_COUNT + MONTH_COLUMN_OFFSET + 1:
+				frappe.throw(_("Excel格式错误：多店铺导入至少需要4列（店铺、产品编码、产品名称、月份数据）"))
+			header = header[STORE_COLUMN_COUNT:]
+		elif not header or len(header) < MONTH_COLUMN_OFFSET + 1:
+			frappe.throw(_("Excel格式错误：至少需要3列（产品编码、产品名称、月份数据）"))
+
+		header_errors = []
+		allowed_months = set(CommodityScheduleService.get_task_months(task_id, fallback_months=4))
+		month_columns = ImportService._parse_month_columns(header, allowed_months, header_errors)
+		if not month_columns:
+			frappe.throw(_("Excel格式错误：未找到有效的月份列"))
+		if start_row <= 2:
+			totals["errors"] = header_errors + totals["errors"]
+
+		chunk = []
+		last_row = 1
+		for row_idx, row in enumerate(rows, start=2):
+			last_row = row_idx
+			if row_idx < start_row:
+				continue
+
+			chunk.append((row_idx, row))
+			if chunk_size and len(chunk) >= chunk_size:
+				ImportService._apply_chunk(store_id, task_id, chunk, month_columns, totals, store_lookup=store_lookup)
+				chunk = []
+				if on_chunk:
+					on_chunk(last_row, totals)
+
+		if chunk:
+			ImportService._apply_chunk(
+				store_id, task_id, chunk, month_columns, totals, dry_run=dry_run, store_lookup=store_lookup
+			)
+			if on_chunk:
+				on_chunk(last_row, totals)
+
+		return totals
+
+	@staticmethod
+	def _apply_chunk(store_id, task_id, chunk, month_columns, totals, dry_run=False, store_lookup=None):
+		"""
+		解析并写入一块数据行，结果累加到 totals；dry_run 时只记录变更样例
+
+		store_lookup 不为空时为多店铺导入：每行首列按 store_lookup 解析为店铺ID，
+		本块所有店铺的已有计划一次读取，新增按店铺批量插入
+		"""
+		errors = totals["errors"]
+		parsed_rows = []
+		for row_idx, row in chunk:
+			row_store = store_id
+			if store_lookup is not None:
+				store_value = str(row[0]).strip() if row and row[0] is not None else ""
+				row = row[STORE_COLUMN_COUNT:]
+				row_store = store_lookup.get(store_value)
+
+			parsed = ImportService._parse_row(row_idx, row, month_columns, errors)
+			if parsed is None:
+				totals["skipped"] += 1
+				continue
+
+			if row_store is None:
+				errors.append(
+					f"第{row_idx}行: 店铺 {store_value} 不属于该计划任务或无权限导入"
+					if store_value else f"第{row_idx}行: 缺少店铺"
+				)
+				totals["skipped"] += 1
+				continue
+			parsed_rows.append((row_idx, row_store, *parsed))
+
+		valid_codes = ImportService._get_existing_products({code for _row_idx, _store, code, _cells in parsed_rows})
+
+		# 有效单元格：(store_id, code, sub_date) -> (quantity, 行号)，同一店铺商品重复出现时以后出现的行为准
+		cells = {}
+		for row_idx, row_store, code, row_cells in parsed_rows:
+			if code not in valid_codes:
+				errors.append(f"第{row_idx}行: 产品编码 {code} 不存在")
+				continue
+			for sub_date, quantity in row_cells:
+				cells[(row_store, code, sub_date)] = (quantity, row_idx)
+
+		existing = ImportService._get_existing_plans(
+			{key[0] for key in cells},
+			task_id,
+			{key[1] for key in cells},
+			{key[2] for key in cells}
+		)
+
+		inserts = []
+		updates = []
+		changes = totals.get("changes")
+		store_totals = totals.get("stores")
+		for (row_store, code, sub_date), (quantity, row_idx) in cells.items():
+			current = existing.get((row_store, code, sub_date))
+			if current is None:
+				action = "inserted"
+				inserts.append((row_store, code, sub_date, quantity))
+			elif current["quantity"] != quantity:
+				action = "updated"
+				updates.append((current["name"], quantity))
+			else:
+				action = "unchanged"
+
+			totals[action] += 1
+			if store_totals is not None:
+				store_totals.setdefault(row_store, dict(EMPTY_STORE_TOTALS))[action] += 1
+
+			if action == "unchanged" or changes is None or len(changes) >= DRY_RUN_SAMPLE_SIZE:
+				continue
+			changes.append({
+				"row": row_idx,
+				"store_id": row_store,
+				"code": code,
+				"month": sub_date[:7],
+				"action": "insert" if current is None else "update",
+				"old_quantity": None if current is None else current["quantity"],
+				"new_quantity": quantity
+			})
+
+		if not dry_run:
+			ImportService.bulk_insert_plans(task_id, inserts)
+			ImportService.bulk_update_quantities(updates)
+
+		# 错误只保留前若干条，避免断点与任务状态无限增长
+		del errors[MAX_IMPORT_ERRORS:]
+
+	@staticmethod
+	def check_plan_permissions():
+		"""
+		校验当前用户可以新增和修改商品计划
+
+		批量插入与批量 UPDATE 不经过文档的 insert / save，不会触发权限检查，须在写入前校验
+		"""
+		frappe.has_permission("Commodity Schedule", "create", throw=True)
+		frappe.has_permission("Commodity Schedule", "write", throw=True)
+
+	@staticmethod
+	def bulk_insert_plans(task_id, plans):
+		"""
+		分块批量插入商品计划
+
+		name 按 Commodity Schedule 的命名规则 {task_id}-{sub_date}-{store_id}-{code} 生成；
+		调用方负责校验权限（check_plan_permissions），以及商品、店铺、任务存在且记录不重复
+
+		Args:
+			plans: [(store_id, code, sub_date, quantity)]，sub_date 为 YYYY-MM-DD
+		"""
+		if not plans:
+			return
+
+		now = now_datetime()
+		user = frappe.session.user
+		fields = ["name", "store_id", "task_id", "code", "sub_date", "quantity",
+			"owner", "modified_by", "creation", "modified", "docstatus"]
+		values = [
+			(f"{task_id}-{sub_date}-{store_id}-{code}", store_id, task_id, code, sub_date, quantity,
+				user, user, now, now, 0)
+			for store_id, code, sub_date, quantity in plans
+		]
+		frappe.db.bulk_insert("Commodity Schedule", fields, values, chunk_size=IMPORT_CHUNK_SIZE)
+
+	@staticmethod
+	def bulk_update_quantities(updates):
+		"""
+		分块批量更新数量（每块一条 UPDATE ... CASE 语句）
+
+		Args:
+			updates: [(name, quantity)]
+		"""
+		now = now_datetime()
+		user = frappe.session.user
+		for start in range(0, len(updates), IMPORT_CHUNK_SIZE):
+			chunk = updates[start:start + IMPORT_CHUNK_SIZE]
+			cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+			values = [value for pair in chunk for value in pair]
+			values.extend([now, user])
+			values.extend(name for name, _quantity in chunk)
+			frappe.db.sql(f"""
+				UPDATE `tabCommodity Schedule`
+				SET quantity = CASE name {cases} END,
+					modified = %s,
+					modified_by = %s
+				WHERE name IN ({", ".join(["%s"] * len(chunk))})
+			""", values)
+
+	@staticmethod
+	def _parse_month_columns(header, allowed_months, errors):
+		"""
+		解析表头中的月份列（每列只解析一次）
+
+		Returns:
+			list: [(列下标, 月份列名, sub_date)]
+		"""
+		month_columns = []
+		for col_idx in range(MONTH_COLUMN_OFFSET, len(header)):
+			title = str(header[col_idx]).strip() if header[col_idx] is not None else ""
+			if not title:
+				continue
+
+			month = parse_month_string(title)
+			if not month:
+				errors.append(f"表头: 月份格式错误 ({title})，该列已忽略")
+				continue
+			if allowed_months and month not in allowed_months:
+				errors.append(f"表头-{title}: 月份不在任务周期内，该列已忽略")
+				continue
+
+			# 按日期落库：月份列统一写入该月第一天
+			month_columns.append((col_idx, title, get_month_first_day(month)))
+		return month_columns
+
+	@staticmethod
+	def _parse_row(row_idx, row, month_columns, errors):
+		"""
+		解析一个数据行，空值与0跳过
+
+		Returns:
+			tuple: (产品编码, [(sub_date, quantity)])；空行返回 None
+		"""
+		code = str(row[0]).strip() if row and row[0] is not None else ""
+		if not code:
+			return None
+
+		row_cells = []
+		for col_idx, title, sub_date in month_columns:
+			if len(row) <= col_idx:
+				continue
+
+			value = row[col_idx]
+			if isinstance(value, str):
+				value = value.strip()
+			if value is None or value == '' or value == 0:
+				continue
+
+			try:
+				quantity = int(float(value))
+			except (TypeError, ValueError):
+				errors.append(f"第{row_idx}行-{title}: 数量格式错误 ({value})")
+				continue
+
+			# CSV 中的 "0" 与 Excel 中的 0 一样跳过
+			if quantity == 0:
+				continue
+
+			if quantity < 0:
+				errors.append(f"第{row_idx}行-{title}: 数量不能为负数 ({value})")
+				continue
+
+			row_cells.append((sub_date, quantity))
+
+		return code, row_cells
+
+	@staticmethod
+	def _get_existing_products(codes):
+		"""一次 IN 查询（分块）返回存在的产品编码集合"""
+		codes = list(codes)
+		existing = set()
+		for start in range(0, len(codes), IMPORT_CHUNK_SIZE):
+			existing.update(frappe.db.sql_list("""
+				SELECT name FROM `tabProduct List` WHERE name IN %(codes)s
+			""", {"codes": codes[start:start + IMPORT_CHUNK_SIZE]}))
+		return existing
+
+	@staticmethod
+	def _get_existing_plans(store_ids, task_id, codes, sub_dates):
+		"""
+		一次查询读取任务下本块店铺、商品在导入月份内的已有计划（走 store_id, task_id, sub_date 复合索引）
+
+		Returns:
+			dict: (store_id, code, sub_date) -> {"name", "quantity"}
+		"""
+		if not store_ids or not codes or not sub_dates:
+			return {}
+
+		rows = frappe.db.sql("""
+			SELECT name, store_id, code, sub_date, quantity
+			FROM `tabCommodity Schedule`
+			WHERE store_id IN %(store_ids)s
+				AND task_id = %(task_id)s
+				AND sub_date IN %(sub_dates)s
+				AND code IN %(codes)s
+		""", {
+			"store_ids": sorted(store_ids),
+			"task_id": task_id,
+			"sub_dates": sorted(sub_dates),
+			"codes": list(codes)
+		}, as_dict=True)
+
+		return {
+			(row.store_id, row.code, row.sub_date.strftime("%Y-%m-%d")): {"name": row.name, "quantity": row.quantity or 0}
+			for row in rows
+		}
+
+	@staticmethod
+	def get_task_store_lookup(task_id):
+		"""
+		多店铺导入的店铺解析表：任务下的店铺ID与店铺名称 -> 店铺ID（一次查询）
+
+		店铺名称在任务内不唯一时不参与解析，这些店铺须以店铺ID填写
+		"""
+		rows = frappe.db.sql("""
+			SELECT ts.store_name AS store_id, sl.shop_name
+			FROM `tabTasks Store` ts
+			LEFT JOIN `tabStore List` sl ON sl.name = ts.store_name
+			WHERE ts.parent = %(task_id)s
+				AND ts.parenttype = 'Schedule tasks'
+				AND ts.store_name IS NOT NULL
+		""", {"task_id": task_id}, as_dict=True)
+
+		lookup = {}
+		ambiguous = set()
+		for row in rows:
+			shop_name = (row.shop_name or "").strip()
+			if not shop_name or shop_name == row.store_id:
+				continue
+			if lookup.get(shop_name, row.store_id) != row.store_id:
+				ambiguous.add(shop_name)
+			lookup[shop_name] = row.store_id
+		for shop_name in ambiguous:
+			del lookup[shop_name]
+
+		# 店铺ID优先于同名的店铺名称
+		lookup.update({row.store_id: row.store_id for row in rows})
+		return lookup
+
+	@staticmethod
+	def filter_accessible_stores(store_lookup):
+		"""
+		按当前用户的店铺访问权限过滤店铺解析表（与 commodity 接口的店铺访问控制一致）：
+		System Manager 可导入全部店铺，其他用户只能导入自己负责的店铺（Store List.user1）
+		"""
+		current_user = frappe.session.user
+		if "System Manager" in frappe.get_roles(current_user):
+			return store_lookup
+
+		owned = set(frappe.get_all(
+			"Store List",
+			filters={"name": ["in", list(set(store_lookup.values()))], "user1": current_user},
+			pluck="name"
+		))
+		return {value: row_store for value, row_store in store_lookup.items() if row_store in owned}
+
+	@staticmethod
+	def get_changed_stores(store_id, totals):
+		"""导入后有新增或更新的店铺（用于推送计划变化）"""
+		if store_id:
+			return [store_id] if totals["inserted"] or totals["updated"] else []
+		return [
+			row_store for row_store, counts in (totals.get("stores") or {}).items()
+			if counts["inserted"] or counts["updated"]
+		]
+
+
+class ImportJobStatus:
+	"""导入任务状态"""
+	QUEUED = "queued"
+	RUNNING = "running"
+	DONE = "done"
+	FAILED = "failed"
+
+
+class ImportJobService:
+	"""后台导入任务服务类"""
+
+	@staticmethod
+	def enqueue(store_id, task_id, file_url):
+		"""
+		提交后台导入任务（store_id 为空时为多店铺导入）
+
+		同一店铺、任务、文件内容对应同一个 job_id：
+		- 任务仍在队列或执行中：直接返回当前状态
+		- 上次未完成（失败或 worker 中断）：保留断点，重新入队后从断点继续
+		- 上次已完成：重新从头导入
+
+		Returns:
+			dict: 任务状态（含 job_id）
+		"""
+		from frappe.utils.background_jobs import is_job_enqueued
+		from frappe.utils.file_manager import get_file_path
+
+		if store_id:
+			validate_doctype_exists("Store List", store_id, "店铺")
+		validate_doctype_exists("Schedule tasks", task_id, "计划任务")
+		ImportService.check_plan_permissions()
+
+		file_path = get_file_path(file_url)
+		file_hash = _hash_file(file_path)
+		job_id = hashlib.sha1(f"{store_id or ''}\n{task_id}\n{file_hash}".encode()).hexdigest()[:16]
+		rq_job_id = f"psp_import::{job_id}"
+
+		state = ImportJobService._get_state(job_id)
+		if state and is_job_enqueued(rq_job_id):
+			return state
+
+		if not state or state["status"] == ImportJobStatus.DONE:
+			state = {
+				"job_id": job_id,
+				"store_id": store_id or None,
+				"task_id": task_id,
+				"file_url": file_url,
+				"file_hash": file_hash,
+				"owner": frappe.session.user,
+				"last_row": 1,
+				"totals": None,
+				"total": None,
+				"processed": 0,
+				"progress": 0,
+				"message": None
+			}
+		state.update(status=ImportJobStatus.QUEUED, file_url=file_url)
+		_save_state(state)
+
+		frappe.enqueue(
+			"product_sales_planning.services.import_service.run_import_job",
+			queue="long",
+			timeout=IMPORT_JOB_TIMEOUT,
+			job_id=rq_job_id,
+			deduplicate=True,
+			import_job_id=job_id
+		)
+		return state
+
+	@staticmethod
+	def get_status(job_id):
+		"""获取任务状态（仅发起人与系统管理员可见）"""
+		state = ImportJobService._get_state(job_id)
+		if not state:
+			return None
+
+		if state["owner"] != frappe.session.user and "System Manager" not in frappe.get_roles():
+			frappe.throw(_("无权查看该导入任务"), frappe.PermissionError)
+
+		return state
+
+	@staticmethod
+	def _get_state(job_id):
+		return frappe.cache().get_value(IMPORT_JOB_KEY_PREFIX + job_id, expires=True)
+
+
+def run_import_job(import_job_id):
+	"""后台执行导入任务（由 frappe.enqueue 调用），每块提交一次并记录断点"""
+	from frappe.utils.file_manager import get_file_path
+
+	state = ImportJobService._get_state(import_job_id)
+	if not state:
+		return
+
+	store_id = state["store_id"]
+	task_id = state["task_id"]
+
+	def update(**changes):
+		state.update(changes)
+		_save_state(state)
+		frappe.publish_realtime(IMPORT_EVENT, state, user=state["owner"])
+
+	def on_chunk(last_row, totals):
+		# 先提交本块，再记录断点：断点之前的行一定已经落库
+		frappe.db.commit()
+		bump_data_version(CacheScope.PLAN)
+		total = state["total"]
+		update(
+			last_row=last_row,
+			totals=totals,
+			processed=max(last_row - 1, 0),
+			progress=min(99, int((last_row - 1) * 100 / (total - 1))) if total and total > 1 else None
+		)
+
+	try:
+		file_path = get_file_path(state["file_url"])
+		if _hash_file(file_path) != state["file_hash"]:
+			frappe.throw(_("导入文件已变化，请重新提交"))
+
+		update(
+			status=ImportJobStatus.RUNNING,
+			total=ImportService.count_file_rows(file_path),
+			message="从第 {} 行继续导入".format(state["last_row"] + 1) if state["last_row"] > 1 else None
+		)
+
+		totals = ImportService.import_plan_rows(
+			store_id,
+			task_id,
+			ImportService.iter_file_rows(file_path),
+			start_row=state["last_row"] + 1,
+			totals=state["totals"],
+			on_chunk=on_chunk
+		)
+		frappe.db.commit()
+
+		for changed_store in ImportService.get_changed_stores(store_id, totals):
+			publish_plan_event(task_id, changed_store, "import")
+
+		message = f"成功导入 {totals['inserted']} 条，更新 {totals['updated']} 条"
+		if not store_id:
+			message = f"{len(totals.get('stores') or {})} 个店铺，" + message
+		update(
+			status=ImportJobStatus.DONE,
+			totals=totals,
+			progress=100,
+			message=message
+		)
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(title="后台导入失败", message=frappe.get_traceback())
+		update(status=ImportJobStatus.FAILED, message=f"导入失败: {e!s}，重新提交同一文件将从断点继续")
+
+
+def _save_state(state):
+	"""保存任务状态（含断点）"""
+	frappe.cache().set_value(IMPORT_JOB_KEY_PREFIX + state["job_id"], state, expires_in_sec=IMPORT_JOB_TTL)
+
+
+def _hash_file(file_path, block_size=1024 * 1024):
+	"""分块计算文件内容哈希"""
+	digest = hashlib.sha1()
+	with open(file_path, "rb") as f:
+		for block in iter(lambda: f.read(block_size), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def _detect_text_encoding(file_path, sample_size=64 * 1024):
+	"""根据文件开头判断文本编码：可按 UTF-8 解码时使用 utf-8-sig，否则使用 GB18030"""
+	with open(file_path, "rb") as f:
+		sample = f.read(sample_size)
+	try:
+		sample.decode("utf-8")
+	except UnicodeDecodeError as e:
+		# 采样截断在多字节字符中间时仍视为 UTF-8
+		if e.start < len(sample) - 3:
+			return "gb18030"
+	return "utf-8-sig"
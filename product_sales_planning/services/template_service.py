@@ -0,0 +1,179 @@
+"""
+导入模板服务
+按月份窗口生成商品计划导入模板，并以内容地址缓存：
+
+1. 模板内容只由模板版本、是否多店铺与月份列决定，三者的哈希即模板的内容地址
+2. 文件名包含该哈希，相同内容始终对应同一个公开 File，不重复生成
+3. 月份窗口 -> 文件地址缓存在 Redis 中，命中且文件仍在时直接返回
+"""
+
+import hashlib
+import io
+import os
+
+import frappe
+
+from product_sales_planning.services.import_service import MONTH_COLUMN_OFFSET, STORE_COLUMN_COUNT
+
+# 模板版本：修改模板布局或说明时递增，使旧模板失效
+IMPORT_TEMPLATE_VERSION = 1
+
+# 月份窗口 -> 模板文件缓存
+IMPORT_TEMPLATE_KEY_PREFIX = "product_sales_planning:import_template:"
+
+# 模板文件名前缀
+IMPORT_TEMPLATE_FILE_PREFIX = "commodity_plan_import_template_"
+
+# 填写说明
+TEMPLATE_INSTRUCTIONS = [
+	["商品计划导入模板使用说明", ""],
+	["", ""],
+	["1. 基本要求", ""],
+	["", "• 产品编码必须在系统中存在"],
+	["", "• 产品名称仅用于参考，不影响导入"],
+	["", "• 月份格式支持：2025-01、202501、2025/01"],
+	["", "• 数量必须为整数，空值或0将被跳过"],
+	["", "• 也可另存为 CSV / TSV 后导入，表头保持不变"],
+	["", ""],
+	["2. 导入规则", ""],
+	["", "• 如果记录已存在（相同店铺+任务+产品+月份），将更新数量"],
+	["", "• 如果记录不存在，将创建新记录"],
+	["", "• 导入前请确保已选择店铺和计划任务"],
+	["", ""],
+	["3. 注意事项", ""],
+	["", "• 请勿修改表头行"],
+	["", "• 建议单次导入不超过1000行数据"],
+	["", "• 导入完成后请检查导入结果"],
+]
+
+# 多店铺模板的补充说明
+MULTI_STORE_INSTRUCTIONS = [
+	"• 第一列填写店铺ID或店铺名称，店铺必须属于所选计划任务",
+	"• 店铺名称在任务内重名时请填写店铺ID",
+	"• 不同店铺的行可以任意顺序排列，导入结果按店铺分别统计",
+]
+
+
+class ImportTemplateService:
+	"""导入模板服务类"""
+
+	@staticmethod
+	def get_template(months, multi_store=False):
+		"""
+		获取月份窗口对应的导入模板（不存在时生成并保存）
+
+		Args:
+			months: 月份列表（YYYY-MM）
+			multi_store: 是否为多店铺导入模板（首列为店铺）
+
+		Returns:
+			dict: {"file_url", "file_name"}
+		"""
+		digest = get_template_digest(months, multi_store)
+		cache_key = IMPORT_TEMPLATE_KEY_PREFIX + digest
+
+		cached = frappe.cache().get_value(cache_key)
+		if cached and _template_file_exists(cached["file_name"]):
+			return cached
+
+		file_name = f"{IMPORT_TEMPLATE_FILE_PREFIX}{digest[:16]}.xlsx"
+		file_url = f"/files/{file_name}"
+
+		# 同一内容地址已有 File 且文件仍在时直接复用，否则生成并保存
+		if not (frappe.db.exists("File", {"file_url": file_url}) and _template_file_exists(file_name)):
+			from frappe.utils.file_manager import save_file
+
+			file_doc = save_file(
+				fname=file_name,
+				content=ImportTemplateService.build_template(months, multi_store),
+				dt=None,
+				dn=None,
+				is_private=0
+			)
+			file_url = file_doc.file_url
+			file_name = file_doc.file_name
+
+		template = {"file_url": file_url, "file_name": file_name}
+		frappe.cache().set_value(cache_key, template)
+		return template
+
+	@staticmethod
+	def build_template(months, multi_store=False):
+		"""
+		生成导入模板 xlsx 内容（模板工作表 + 填写说明）
+
+		多店铺模板在产品编码前加店铺列，其余与单店铺模板相同
+
+		Returns:
+			bytes: xlsx 文件内容
+		"""
+		import openpyxl
+		from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+		from openpyxl.utils import get_column_letter
+
+		wb = openpyxl.Workbook()
+		ws = wb.active
+		ws.title = "商品计划导入模板"
+
+		header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+		header_font = Font(bold=True, color="FFFFFF", size=11)
+		border = Border(
+			left=Side(style='thin'),
+			right=Side(style='thin'),
+			top=Side(style='thin'),
+			bottom=Side(style='thin')
+		)
+
+		# 表头与示例数据
+		store_columns = [['店铺'], ['STORE001'], ['STORE002']] if multi_store else [[], [], []]
+		month_offset = MONTH_COLUMN_OFFSET + (STORE_COLUMN_COUNT if multi_store else 0)
+		ws.append(store_columns[0] + ['产品编码', '产品名称'] + list(months))
+		ws.append(store_columns[1] + ['PROD001', '示例商品A'] + [100 + i * 10 for i in range(len(months))])
+		ws.append(store_columns[2] + ['PROD002', '示例商品B'] + [50 + i * 5 for i in range(len(months))])
+
+		for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
+			for cell in row:
+				cell.border = border
+				if cell.row == 1:
+					cell.fill = header_fill
+					cell.font = header_font
+					cell.alignment = Alignment(horizontal='center', vertical='center')
+				elif cell.column > month_offset:
+					cell.alignment = Alignment(horizontal='right', vertical='center')
+
+		# 列宽
+		widths = ([15] if multi_store else []) + [15, 25] + [12] * len(months)
+		for idx, width in enumerate(widths, 1):
+			ws.column_dimensions[get_column_letter(idx)].width = width
+
+		# 填写说明工作表
+		ws_info = wb.create_sheet("填写说明")
+		for row_data in TEMPLATE_INSTRUCTIONS:
+			ws_info.append(row_data)
+		if multi_store:
+			ws_info.append(["4. 多店铺导入", ""])
+			for line in MULTI_STORE_INSTRUCTIONS:
+				ws_info.append(["", line])
+		ws_info.column_dimensions['A'].width = 20
+		ws_info.column_dimensions['B'].width = 50
+		ws_info['A1'].font = Font(bold=True, size=14, color="4472C4")
+
+		file_content = io.BytesIO()
+		wb.save(file_content)
+		return file_content.getvalue()
+
+
+def get_template_digest(months, multi_store=False):
+	"""
+	模板内容地址：模板版本、是否多店铺与月份列的哈希
+
+	openpyxl 保存时会写入当前时间，同一模板每次生成的字节并不相同，
+	因此以决定模板内容的输入计算哈希
+	"""
+	key = "{}\n{}\n{}".format(IMPORT_TEMPLATE_VERSION, int(bool(multi_store)), ",".join(months))
+	return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _template_file_exists(file_name):
+	"""模板文件是否仍在公开目录中"""
+	return os.path.exists(frappe.get_site_path("public", "files", file_name))
@@ -0,0 +1,112 @@
+"""
+定时任务
+由 hooks.py 中的 scheduler_events 调度
+"""
+
+import frappe
+from frappe.utils import add_days, now_datetime, today
+
+from product_sales_planning.constants import EXPIRED_TASK_GRACE_DAYS, CacheScope, DeadlineBucket
+from product_sales_planning.services.export_cache_service import ExportCacheService
+from product_sales_planning.services.filter_options_service import TASK_OPTION_FIELDS, FilterOptionsService
+from product_sales_planning.utils.cache_utils import bump_data_version
+
+
+def daily():
+	"""每日任务：结束过期任务并更新截止分组"""
+	try:
+		closed = close_expired_tasks()
+		update_deadline_buckets()
+		frappe.db.commit()
+
+		if closed:
+			FilterOptionsService.clear(TASK_OPTION_FIELDS)
+		bump_data_version(CacheScope.DASHBOARD)
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(title="每日定时任务失败", message=str(e))
+
+
+def purge_export_files():
+	"""每日任务：删除过期的导出文件及其 File 记录"""
+	try:
+		ExportCacheService.purge_expired()
+		frappe.db.commit()
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(title="清理导出文件失败", message=str(e))
+
+
+def close_expired_tasks():
+	"""
+	批量结束超过结束日期 EXPIRED_TASK_GRACE_DAYS 天的开启中任务
+
+	同时更新 modified，使看板增量刷新能感知任务结束
+
+	Returns:
+		int: 结束的任务数
+	"""
+	cutoff = add_days(today(), -EXPIRED_TASK_GRACE_DAYS)
+
+	frappe.db.sql("""
+		UPDATE `tabSchedule tasks`
+		SET status = '已结束', modified = %(now)s
+		WHERE status = '开启中' AND end_date < %(cutoff)s
+	""", {"now": now_datetime(), "cutoff": cutoff})
+
+	closed = frappe.db.sql("SELECT ROW_COUNT()")[0][0]
+	if closed:
+		frappe.logger().info(f"定时任务已结束 {closed} 个过期任务")
+	return closed
+
+
+def update_deadline_buckets():
+	"""
+	按结束日期批量更新开启中任务及其店铺行（Tasks Store）的截止分组
+
+	仅改写分组发生变化的行，不更新 modified（分组是派生字段，不视为数据变更）
+	"""
+	current_date = today()
+	values = {
+		"today": current_date,
+		"due_3": add_days(current_date, 3),
+		"due_7": add_days(current_date, 7),
+		"overdue": DeadlineBucket.OVERDUE,
+		"due_3_bucket": DeadlineBucket.DUE_3_DAYS,
+		"due_7_bucket": DeadlineBucket.DUE_7_DAYS,
+		"later": DeadlineBucket.LATER,
+	}
+
+	bucket_expr = """
+		CASE
+			WHEN end_date IS NULL THEN NULL
+			WHEN end_date < %(today)s THEN %(overdue)s
+			WHEN end_date <= %(due_3)s THEN %(due_3_bucket)s
+			WHEN end_date <= %(due_7)s THEN %(due_7_bucket)s
+			ELSE %(later)s
+		END
+	"""
+
+	frappe.db.sql(f"""
+		UPDATE `tabSchedule tasks`
+		SET deadline_bucket = {bucket_expr}
+		WHERE status = '开启中'
+			AND NOT (deadline_bucket <=> {bucket_expr})
+	""", values)
+
+	frappe.db.sql("""
+		UPDATE `tabTasks Store` ts
+		JOIN `tabSchedule tasks` st ON st.name = ts.parent
+		SET ts.deadline_bucket = st.deadline_bucket
+		WHERE ts.parenttype = 'Schedule tasks'
+			AND st.status = '开启中'
+			AND NOT (ts.deadline_bucket <=> st.deadline_bucket)
+	""")
+
+
+def after_migrate():
+	"""迁移后补齐截止分组（新增字段后首次部署时需要）"""
+	update_deadline_buckets()
+	frappe.db.commit()
@@ -113,6 +113,16 @@ class APITestSuite:
 			module, "get_filter_options",
 			description="获取过滤器选项"
 		)
+
+		# 测试增量刷新
+		self.test_api(
+			module, "get_dashboard_changes",
+			params={
+				"since": str(frappe.utils.add_to_date(frappe.utils.now_datetime(), hours=-1)),
+				"filters": json.dumps({"tab": "pending"})
+			},
+			description="获取看板增量数据"
+		)
 	
 	def run_store_tests(self):
 		"""测试Store API"""
@@ -334,6 +344,12 @@ class APITestSuite:
 			params={"task_id": self.test_data["task_id"]},
 			description="下载导入模板"
 		)
+
+		self.test_api(
+			module, "download_import_template",
+			params={"task_id": self.test_data["task_id"], "multi_store": 1},
+			description="下载多店铺导入模板"
+		)
 		
 		# 测试导出数据
 		if self.test_data["store_id"]:
@@ -345,6 +361,50 @@ class APITestSuite:
 				},
 				description="导出商品数据"
 			)
+
+			self.test_api(
+				module, "export_commodity_csv",
+				params={
+					"store_id": self.test_data["store_id"],
+					"task_id": self.test_data["task_id"],
+					"gzip": 1
+				},
+				description="流式导出商品数据CSV"
+			)
+
+			# 测试后台导出
+			result = self.test_api(
+				module, "enqueue_export",
+				params={
+					"export_type": "commodity",
+					"params": json.dumps({
+						"store_id": self.test_data["store_id"],
+						"task_id": self.test_data["task_id"]
+					})
+				},
+				description="提交后台导出任务"
+			)
+
+			# 测试整任务导出
+			self.test_api(
+				module, "enqueue_export",
+				params={
+					"export_type": "task_commodity",
+					"params": json.dumps({
+						"task_id": self.test_data["task_id"],
+						"file_format": "zip"
+					})
+				},
+				description="提交整任务导出任务"
+			)
+
+			response = result.get("response") or {}
+			if response.get("data"):
+				self.test_api(
+					module, "get_export_status",
+					params={"job_id": response["data"]["job_id"]},
+					description="获取后台导出任务状态"
+				)
 	
 	def run_mechanism_tests(self):
 		"""测试Mechanism API"""
@@ -365,6 +425,30 @@ class APITestSuite:
 				description="应用产品机制"
 			)
 	
+	def run_data_view_tests(self):
+		"""测试Data View API"""
+		print("\n📊 测试Data View API...")
+
+		module = "product_sales_planning.api.v1.data_view"
+
+		# 测试按维度汇总（含小计）
+		self.test_api(
+			module, "get_plan_rollup",
+			params={
+				"dimensions": json.dumps(["channel", "month"]),
+				"filters": json.dumps({"task_ids": [self.test_data["task_id"]]} if self.test_data["task_id"] else {}),
+				"with_subtotals": 1
+			},
+			description="获取计划汇总"
+		)
+
+		# 测试筛选选项前缀搜索
+		self.test_api(
+			module, "search_filter_options",
+			params={"option_type": "products", "txt": "", "page": 1, "page_size": 10},
+			description="搜索商品筛选选项"
+		)
+
 	def run_all_tests(self):
 		"""运行所有测试"""
 		print("=" * 60)
@@ -381,6 +465,7 @@ class APITestSuite:
 		self.run_approval_tests()
 		self.run_import_export_tests()
 		self.run_mechanism_tests()
+		self.run_data_view_tests()
 		
 		# 生成测试报告
 		return self.generate_report()
@@ -0,0 +1,102 @@
+# Copyright (c) 2025, lj and Contributors
+# See license.txt
+
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from product_sales_planning.api.v1.dashboard import get_dashboard_data
+from product_sales_planning.utils.cache_utils import get_permission_scope
+
+
+class TestDashboardPermissionScope(FrappeTestCase):
+	"""看板结果按权限范围缓存：User Permission 不同的用户得到不同的缓存结果"""
+
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.stores = [_make_store(f"PSPT{idx}") for idx in range(2)]
+		self.task = frappe.get_doc({
+			"doctype": "Schedule tasks",
+			"type": "MON",
+			"status": "开启中",
+			"start_date": today(),
+			"end_date": add_days(today(), 10),
+			"set_store": [{"store_name": store} for store in self.stores]
+		}).insert(ignore_permissions=True)
+		self.users = [
+			_make_user(f"psp_dashboard_{idx}@example.com", store) for idx, store in enumerate(self.stores)
+		]
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.db.rollback()
+
+	def test_users_with_different_store_permissions_get_different_payloads(self):
+		"""两个用户分别只能看到自己被授权的店铺，各自的缓存结果互不影响"""
+		filters = json.dumps({"task_id": self.task.name})
+
+		payloads = []
+		for user in self.users:
+			frappe.set_user(user)
+			payloads.append(get_dashboard_data(filters=filters))
+
+		self.assertEqual(_store_ids(payloads[0]), {self.stores[0]})
+		self.assertEqual(_store_ids(payloads[1]), {self.stores[1]})
+
+		# 权限范围不同，缓存键不同
+		scopes = []
+		for user in self.users:
+			frappe.set_user(user)
+			scopes.append(get_permission_scope())
+		self.assertNotEqual(scopes[0], scopes[1])
+
+		# 第二个用户计算后，第一个用户再次读取（命中缓存）仍是自己的结果
+		frappe.set_user(self.users[0])
+		self.assertEqual(_store_ids(get_dashboard_data(filters=filters)), {self.stores[0]})
+
+	def test_user_without_task_permission_gets_no_rows(self):
+		"""没有任务读取权限的用户看不到任务行"""
+		frappe.set_user(_make_user("psp_dashboard_norole@example.com", roles=[]))
+		payload = get_dashboard_data(filters=json.dumps({"task_id": self.task.name}))
+
+		self.assertEqual(payload["tasks"], [])
+
+
+def _make_store(store_id):
+	"""创建测试店铺"""
+	return frappe.get_doc({
+		"doctype": "Store List",
+		"id": store_id,
+		"shop_name": f"{store_id} 测试店铺",
+		"channel": "测试渠道"
+	}).insert(ignore_permissions=True).name
+
+
+def _make_user(email, store=None, roles=("System Manager",)):
+	"""创建测试用户；指定 store 时只授权该店铺（User Permission）"""
+	if not frappe.db.exists("User", email):
+		frappe.get_doc({
+			"doctype": "User",
+			"email": email,
+			"first_name": email.split("@")[0],
+			"send_welcome_email": 0,
+			"roles": [{"role": role} for role in roles]
+		}).insert(ignore_permissions=True)
+
+	if not store:
+		return email
+
+	frappe.get_doc({
+		"doctype": "User Permission",
+		"user": email,
+		"allow": "Store List",
+		"for_value": store
+	}).insert(ignore_permissions=True)
+	return email
+
+
+def _store_ids(payload):
+	"""看板结果中的店铺ID"""
+	return {row["store_id"] for row in payload["tasks"]}
@@ -0,0 +1,160 @@
+# Copyright (c) 2025, lj and Contributors
+# See license.txt
+
+import base64
+import json
+import re
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from product_sales_planning.api.v1.data_view import _build_seek_clause, _decode_cursor, _encode_cursor
+
+# 测试数据：(name, quantity)，含重复值与 NULL
+SEEK_ROWS = [
+	("a", 3), ("b", None), ("c", 1), ("d", 3), ("e", None), ("f", 2), ("g", 1), ("h", 3), ("i", 2),
+]
+
+
+class TestDataViewCursor(FrappeTestCase):
+	"""分页游标的编码与解析"""
+
+	def test_round_trip(self):
+		for value in ("华东", 12, None, "2025-01-01"):
+			with self.subTest(value=value):
+				cursor = _encode_cursor({"channel": value, "name": "CS-0001"}, "channel", "ASC", "next")
+				self.assertEqual(
+					_decode_cursor(cursor, "channel", "ASC"),
+					{"direction": "next", "value": value, "name": "CS-0001"}
+				)
+
+	def test_date_and_decimal_values_are_encoded_as_strings(self):
+		cursor = _encode_cursor({"sub_date": date(2025, 1, 1), "name": "CS-1"}, "sub_date", "DESC", "prev")
+		self.assertEqual(_decode_cursor(cursor, "sub_date", "DESC")["value"], "2025-01-01")
+
+		cursor = _encode_cursor({"quantity": Decimal("1.50"), "name": "CS-1"}, "quantity", "ASC", "next")
+		self.assertEqual(_decode_cursor(cursor, "quantity", "ASC")["value"], "1.50")
+
+	def test_cursor_is_url_safe_without_padding(self):
+		cursor = _encode_cursor({"shop_name": "店铺?/+", "name": "CS-1"}, "shop_name", "ASC", "next")
+		self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+
+	def test_cursor_for_another_sort_is_rejected(self):
+		cursor = _encode_cursor({"channel": "华东", "name": "CS-1"}, "channel", "ASC", "next")
+		for sort_by, sort_order in (("channel", "DESC"), ("shop_name", "ASC")):
+			with self.subTest(sort_by=sort_by, sort_order=sort_order), self.assertRaises(frappe.ValidationError):
+				_decode_cursor(cursor, sort_by, sort_order)
+
+	def test_malformed_cursor_is_rejected(self):
+		malformed = [
+			"not a cursor",
+			"",
+			base64.urlsafe_b64encode(b"[1, 2]").decode(),
+			_raw_cursor({"s": "channel", "o": "ASC", "d": "sideways", "v": "x", "n": "CS-1"}),
+			_raw_cursor({"s": "channel", "o": "ASC", "d": "next", "v": "x"}),
+		]
+		for cursor in malformed:
+			with self.subTest(cursor=cursor), self.assertRaises(frappe.ValidationError):
+				_decode_cursor(cursor, "channel", "ASC")
+
+
+class TestDataViewSeek(FrappeTestCase):
+	"""
+	游标定位条件：在内存 SQLite 上执行（NULL 排序规则与 MariaDB 相同：升序在前、降序在后），
+	按游标逐页向后、向前翻页应不重不漏地得到完整排序结果
+	"""
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.conn = sqlite3.connect(":memory:")
+		cls.conn.row_factory = sqlite3.Row
+		cls.conn.execute("CREATE TABLE cs (name TEXT PRIMARY KEY, quantity INTEGER)")
+		cls.conn.executemany("INSERT INTO cs VALUES (?, ?)", SEEK_ROWS)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.conn.close()
+		super().tearDownClass()
+
+	def test_clause_shapes(self):
+		self.assertEqual(
+			_build_seek_clause("cs.quantity", "ASC", False),
+			"cs.quantity > %(seek_value)s OR (cs.quantity = %(seek_value)s AND cs.name > %(seek_name)s)"
+		)
+		self.assertIn("IS NOT NULL", _build_seek_clause("cs.quantity", "ASC", True))
+		self.assertTrue(_build_seek_clause("cs.quantity", "DESC", False).endswith("OR cs.quantity IS NULL"))
+		self.assertEqual(
+			_build_seek_clause("cs.quantity", "DESC", True),
+			"cs.quantity IS NULL AND cs.name < %(seek_name)s"
+		)
+
+	def test_forward_and_backward_walks_cover_every_row_once(self):
+		for sort_order in ("ASC", "DESC"):
+			expected = [row["name"] for row in self._query(sort_order)]
+			for page_size in (1, 2, 4):
+				with self.subTest(sort_order=sort_order, page_size=page_size):
+					pages = self._walk_forward(sort_order, page_size)
+					self.assertEqual([name for page in pages for name in page], expected)
+
+					# 从最后一页逐页向前，应得到与向后翻页相同的各页
+					self.assertEqual(self._walk_backward(sort_order, page_size, pages[-1]), pages)
+
+	def _query(self, order, seek_clause=None, cursor=None, limit=None):
+		"""执行与 _get_data_view_page_by_cursor 相同形式的查询"""
+		sql = "SELECT name, quantity FROM cs"
+		params = {}
+		if seek_clause:
+			# %(name)s 占位符转换为 SQLite 的 :name
+			sql += " WHERE ({})".format(re.sub(r"%\((\w+)\)s", r":\1", seek_clause))
+			params = {"seek_value": cursor["value"], "seek_name": cursor["name"]}
+		sql += f" ORDER BY cs.quantity {order}, cs.name {order}"
+		if limit:
+			sql += f" LIMIT {int(limit)}"
+		return [dict(row) for row in self.conn.execute(sql, params)]
+
+	def _page(self, sort_order, page_size, encoded):
+		"""按游标取一页（向前翻页时反向查询再翻转）"""
+		cursor = _decode_cursor(encoded, "quantity", sort_order)
+		forward = cursor["direction"] == "next"
+		query_order = sort_order if forward else ("ASC" if sort_order == "DESC" else "DESC")
+		seek_clause = _build_seek_clause("cs.quantity", query_order, cursor["value"] is None)
+
+		rows = self._query(query_order, seek_clause, cursor, page_size + 1)
+		data = rows[:page_size]
+		if not forward:
+			data.reverse()
+		return data, len(rows) > page_size
+
+	def _walk_forward(self, sort_order, page_size):
+		data = self._query(sort_order, limit=page_size)
+		pages = [[row["name"] for row in data]]
+		has_more = len(self._query(sort_order)) > page_size
+		while has_more:
+			data, has_more = self._page(
+				sort_order, page_size, _encode_cursor(data[-1], "quantity", sort_order, "next")
+			)
+			pages.append([row["name"] for row in data])
+		return pages
+
+	def _walk_backward(self, sort_order, page_size, last_page):
+		rows = {row["name"]: row for row in self._query(sort_order)}
+		data = [rows[name] for name in last_page]
+		pages = [last_page]
+		has_more = True
+		while has_more:
+			data, has_more = self._page(
+				sort_order, page_size, _encode_cursor(data[0], "quantity", sort_order, "prev")
+			)
+			if not data:
+				break
+			pages.insert(0, [row["name"] for row in data])
+		return pages
+
+
+def _raw_cursor(payload):
+	"""按游标格式编码任意内容（用于构造无效游标）"""
+	return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
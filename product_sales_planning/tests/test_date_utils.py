@@ -0,0 +1,85 @@
+# Copyright (c) 2025, lj and Contributors
+# See license.txt
+
+from datetime import date
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from product_sales_planning.utils.date_utils import get_month_range_condition, get_month_ranges
+
+
+class TestMonthRanges(FrappeTestCase):
+	"""月份列表 -> 半开日期区间"""
+
+	def test_single_month(self):
+		self.assertEqual(get_month_ranges(["2025-03"]), [(date(2025, 3, 1), date(2025, 4, 1))])
+
+	def test_adjacent_months_are_merged(self):
+		self.assertEqual(
+			get_month_ranges(["2025-03", "2025-01", "2025-02"]),
+			[(date(2025, 1, 1), date(2025, 4, 1))]
+		)
+
+	def test_gaps_split_ranges(self):
+		self.assertEqual(
+			get_month_ranges(["2025-01", "2025-03", "2025-04"]),
+			[(date(2025, 1, 1), date(2025, 2, 1)), (date(2025, 3, 1), date(2025, 5, 1))]
+		)
+
+	def test_year_boundary(self):
+		"""12 月的区间结束于次年 1 月，跨年的相邻月份合并"""
+		self.assertEqual(get_month_ranges(["2024-12"]), [(date(2024, 12, 1), date(2025, 1, 1))])
+		self.assertEqual(
+			get_month_ranges(["2024-12", "2025-01"]),
+			[(date(2024, 12, 1), date(2025, 2, 1))]
+		)
+
+	def test_accepted_formats_and_duplicates(self):
+		"""202501、2025/01 与 2025-01 视为同一月份"""
+		self.assertEqual(
+			get_month_ranges(["202501", "2025/01", "2025-01"]),
+			[(date(2025, 1, 1), date(2025, 2, 1))]
+		)
+
+	def test_unparseable_and_empty_values_are_ignored(self):
+		self.assertEqual(get_month_ranges(["", None, "abc", "2025-1"]), [])
+		self.assertEqual(get_month_ranges(None), [])
+		self.assertEqual(get_month_ranges([]), [])
+
+	def test_out_of_range_month_is_rejected(self):
+		for month in ("2025-13", "2025-00", "202513"):
+			with self.subTest(month=month), self.assertRaises(frappe.ValidationError):
+				get_month_ranges(["2025-01", month])
+
+
+class TestMonthRangeCondition(FrappeTestCase):
+	"""月份列表 -> 列上的范围条件"""
+
+	def test_single_range(self):
+		condition, values = get_month_range_condition("cs.sub_date", ["2025-01", "2025-02"])
+
+		self.assertEqual(condition, "((cs.sub_date >= %(month_start_0)s AND cs.sub_date < %(month_end_0)s))")
+		self.assertEqual(values, {"month_start_0": date(2025, 1, 1), "month_end_0": date(2025, 3, 1)})
+
+	def test_multiple_ranges_with_prefix(self):
+		condition, values = get_month_range_condition("sub_date", ["2025-01", "2025-03"], param_prefix="m")
+
+		self.assertEqual(
+			condition,
+			"((sub_date >= %(m_start_0)s AND sub_date < %(m_end_0)s)"
+			" OR (sub_date >= %(m_start_1)s AND sub_date < %(m_end_1)s))"
+		)
+		self.assertEqual(values, {
+			"m_start_0": date(2025, 1, 1),
+			"m_end_0": date(2025, 2, 1),
+			"m_start_1": date(2025, 3, 1),
+			"m_end_1": date(2025, 4, 1),
+		})
+
+	def test_no_valid_months(self):
+		self.assertEqual(get_month_range_condition("sub_date", ["abc"]), (None, {}))
+
+	def test_out_of_range_month_is_rejected(self):
+		with self.assertRaises(frappe.ValidationError):
+			get_month_range_condition("sub_date", ["2025-13"])
@@ -0,0 +1,235 @@
+# Copyright (c) 2025, lj and Contributors
+# See license.txt
+
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from product_sales_planning.services import import_service
+from product_sales_planning.services.commodity_service import CommodityScheduleService
+from product_sales_planning.services.import_service import ImportService, _detect_text_encoding
+from product_sales_planning.utils.csv_utils import iter_csv_chunks
+
+TASK_ID = "TASK-TEST"
+TASK_MONTHS = ["2025-01", "2025-02", "2025-03"]
+HEADER = ["产品编码", "产品名称", "2025-01", "202502", "2025/03"]
+
+# 数据行（行号从 2 开始）：
+# 2: P1 一月与已有计划相同 -> unchanged；0 与空值跳过
+# 3: P2 一月与已有计划不同 -> updated；二月新增（被第 7 行覆盖）
+# 4: 空产品编码 -> skipped
+# 5: 产品编码不存在 -> 错误
+# 6: 负数与无法解析的数量 -> 错误
+# 7: P2 二月重复出现，以后出现的行为准 -> inserted
+DATA_ROWS = [
+	["P1", "商品一", 10, 0, ""],
+	["P2", "商品二", "5", 7, None],
+	["", "空行", 1, 1, 1],
+	["P9", "不存在", 1, None, None],
+	["P1", "商品一", None, -1, "abc"],
+	["P2", "商品二", None, "8", None],
+]
+VALID_CODES = {"P1", "P2"}
+EXISTING_PLANS = {
+	("S1", "P1", "2025-01-01"): {"name": "CS-P1-01", "quantity": 10},
+	("S1", "P2", "2025-01-01"): {"name": "CS-P2-01", "quantity": 3},
+}
+
+
+class TestImportParsing(FrappeTestCase):
+	"""表头与数据行解析"""
+
+	def test_month_columns(self):
+		errors = []
+		columns = ImportService._parse_month_columns(
+			[*HEADER, "2025-04", "规格", ""], set(TASK_MONTHS), errors
+		)
+
+		self.assertEqual(columns, [
+			(2, "2025-01", "2025-01-01"),
+			(3, "202502", "2025-02-01"),
+			(4, "2025/03", "2025-03-01"),
+		])
+		self.assertEqual(len(errors), 2)
+		self.assertIn("2025-04", errors[0])
+		self.assertIn("规格", errors[1])
+
+	def test_row_values(self):
+		columns = ImportService._parse_month_columns(HEADER, set(TASK_MONTHS), [])
+		errors = []
+
+		self.assertEqual(
+			ImportService._parse_row(2, ["P1", "", "12", 3.0, " 4 "], columns, errors),
+			("P1", [("2025-01-01", 12), ("2025-02-01", 3), ("2025-03-01", 4)])
+		)
+		# 0、"0"、空值跳过；缺少的列忽略
+		self.assertEqual(ImportService._parse_row(3, ["P1", "", 0, "0"], columns, errors), ("P1", []))
+		self.assertIsNone(ImportService._parse_row(4, [None, "", 1], columns, errors))
+		self.assertEqual(errors, [])
+
+		self.assertEqual(ImportService._parse_row(5, ["P1", "", -2, "x", None], columns, errors), ("P1", []))
+		self.assertEqual(len(errors), 2)
+
+
+class TestImportDiff(FrappeTestCase):
+	"""新增 / 更新 / 无变化的分类与 dry_run 计数"""
+
+	def setUp(self):
+		patches = [
+			patch.object(import_service, "validate_doctype_exists"),
+			patch.object(CommodityScheduleService, "get_task_months", return_value=TASK_MONTHS),
+			patch.object(ImportService, "_get_existing_products", side_effect=lambda codes: set(codes) & VALID_CODES),
+			patch.object(ImportService, "_get_existing_plans", side_effect=_existing_plans),
+			patch.object(ImportService, "check_plan_permissions"),
+			patch.object(ImportService, "bulk_insert_plans"),
+			patch.object(ImportService, "bulk_update_quantities"),
+		]
+		for item in patches:
+			item.start()
+			self.addCleanup(item.stop)
+
+	def test_dry_run_counts_and_changes(self):
+		result = ImportService.import_plan_rows("S1", TASK_ID, [HEADER, *DATA_ROWS], dry_run=True)
+
+		self.assertEqual(
+			(result["inserted"], result["updated"], result["unchanged"], result["skipped"]),
+			(1, 1, 1, 1)
+		)
+		self.assertEqual(len(result["errors"]), 3)
+		self.assertEqual(
+			sorted(result["changes"], key=lambda change: change["month"]),
+			[
+				{"row": 3, "store_id": "S1", "code": "P2", "month": "2025-01", "action": "update",
+					"old_quantity": 3, "new_quantity": 5},
+				{"row": 7, "store_id": "S1", "code": "P2", "month": "2025-02", "action": "insert",
+					"old_quantity": None, "new_quantity": 8},
+			]
+		)
+		ImportService.check_plan_permissions.assert_not_called()
+		ImportService.bulk_insert_plans.assert_not_called()
+		ImportService.bulk_update_quantities.assert_not_called()
+
+	def test_import_writes_the_same_classification(self):
+		result = ImportService.import_plan_rows("S1", TASK_ID, [HEADER, *DATA_ROWS])
+
+		self.assertEqual((result["inserted"], result["updated"], result["unchanged"]), (1, 1, 1))
+		self.assertNotIn("changes", result)
+		ImportService.check_plan_permissions.assert_called_once()
+		ImportService.bulk_insert_plans.assert_called_once_with(TASK_ID, [("S1", "P2", "2025-02-01", 8)])
+		ImportService.bulk_update_quantities.assert_called_once_with([("CS-P2-01", 5)])
+
+	def test_multi_store_counts(self):
+		lookup = {"S1": "S1", "店铺一": "S1", "S2": "S2"}
+		rows = [
+			["店铺", *HEADER],
+			["店铺一", "P1", "", 10],
+			["S2", "P1", "", 10],
+			["S3", "P1", "", 10],
+			[None, "P1", "", 10],
+		]
+		with patch.object(ImportService, "get_task_store_lookup", return_value=lookup), \
+				patch.object(ImportService, "filter_accessible_stores", side_effect=lambda stores: stores):
+			result = ImportService.import_plan_rows(None, TASK_ID, rows, dry_run=True)
+
+		self.assertEqual(result["stores"], {
+			"S1": {"inserted": 0, "updated": 0, "unchanged": 1},
+			"S2": {"inserted": 1, "updated": 0, "unchanged": 0},
+		})
+		self.assertEqual(result["skipped"], 2)
+		self.assertEqual(len(result["errors"]), 2)
+
+	def test_missing_month_columns_are_rejected(self):
+		with self.assertRaises(frappe.ValidationError):
+			ImportService.import_plan_rows("S1", TASK_ID, [["产品编码", "产品名称", "备注"]], dry_run=True)
+
+
+class TestImportFiles(FrappeTestCase):
+	"""xlsx / csv / tsv 文件读取与编码识别"""
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+
+	def test_xlsx_csv_and_tsv_give_the_same_result(self):
+		import openpyxl
+
+		xlsx_path = self._path("plan.xlsx")
+		wb = openpyxl.Workbook()
+		for row in [HEADER, *DATA_ROWS]:
+			wb.active.append(row)
+		wb.save(xlsx_path)
+
+		csv_path = self._write("plan.csv", _delimited([HEADER, *DATA_ROWS], ","), "utf-8-sig")
+		tsv_path = self._write("plan.tsv", _delimited([HEADER, *DATA_ROWS], "\t"), "gb18030")
+
+		with patch.object(import_service, "validate_doctype_exists"), \
+				patch.object(CommodityScheduleService, "get_task_months", return_value=TASK_MONTHS), \
+				patch.object(ImportService, "_get_existing_products", side_effect=lambda codes: set(codes) & VALID_CODES), \
+				patch.object(ImportService, "_get_existing_plans", side_effect=_existing_plans):
+			results = [
+				ImportService.import_plan_rows("S1", TASK_ID, ImportService.iter_file_rows(path), dry_run=True)
+				for path in (xlsx_path, csv_path, tsv_path)
+			]
+
+		for result in results:
+			self.assertEqual(
+				(result["inserted"], result["updated"], result["unchanged"], result["skipped"]),
+				(1, 1, 1, 1)
+			)
+
+	def test_csv_written_by_iter_csv_chunks_is_read_back(self):
+		"""CSV 导出（带 BOM）的月份表头可直接被导入解析"""
+		headers = ["产品编码", "产品名称", "规格", "品牌", "类别", *TASK_MONTHS]
+		content = b"".join(iter_csv_chunks(headers, [["P1", "商品一", "500ml", "品牌", "饮料", 1, 2, 3]], chunk_size=8))
+		path = self._path("export.csv")
+		with open(path, "wb") as f:
+			f.write(content)
+
+		header, row = list(ImportService.iter_file_rows(path))
+		self.assertEqual(list(header), headers)
+		self.assertEqual(list(row), ["P1", "商品一", "500ml", "品牌", "饮料", "1", "2", "3"])
+
+		errors = []
+		columns = ImportService._parse_month_columns(header, set(TASK_MONTHS), errors)
+		self.assertEqual([sub_date for _col, _title, sub_date in columns], ["2025-01-01", "2025-02-01", "2025-03-01"])
+		# 规格、品牌、类别列不是月份，忽略并提示
+		self.assertEqual(len(errors), 3)
+
+	def test_encoding_detection(self):
+		text = "产品编码,产品名称\nP1,商品一\n"
+		self.assertEqual(_detect_text_encoding(self._write("a.csv", text, "utf-8")), "utf-8-sig")
+		self.assertEqual(_detect_text_encoding(self._write("b.csv", text, "utf-8-sig")), "utf-8-sig")
+		self.assertEqual(_detect_text_encoding(self._write("c.csv", text, "gb18030")), "gb18030")
+
+		# 采样截断在多字节字符中间时仍视为 UTF-8
+		path = self._write("d.csv", "产品", "utf-8")
+		self.assertEqual(_detect_text_encoding(path, sample_size=4), "utf-8-sig")
+
+	def test_unsupported_extension_is_rejected(self):
+		with self.assertRaises(frappe.ValidationError):
+			ImportService.iter_file_rows(self._write("plan.txt", "产品编码", "utf-8"))
+
+	def _path(self, name):
+		return os.path.join(self.tmp.name, name)
+
+	def _write(self, name, text, encoding):
+		path = self._path(name)
+		with open(path, "w", encoding=encoding, newline="") as f:
+			f.write(text)
+		return path
+
+
+def _existing_plans(store_ids, task_id, codes, sub_dates):
+	"""按查询条件返回 EXISTING_PLANS 中的已有计划"""
+	return {
+		key: value for key, value in EXISTING_PLANS.items()
+		if key[0] in store_ids and key[1] in codes and key[2] in sub_dates
+	}
+
+
+def _delimited(rows, delimiter):
+	"""按分隔符拼接行（空值写为空字符串）"""
+	return "".join(delimiter.join("" if value is None else str(value) for value in row) + "\n" for row in rows)
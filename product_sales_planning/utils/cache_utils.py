@@ -0,0 +1,147 @@
+"""
+结果缓存工具类
+提供按数据版本失效的短时结果缓存，以及单飞（single-flight）计算保护
+
+- 数据版本：每个作用域（见 constants.CacheScope）在 Redis 中保存一个随机版本号，
+  数据变更时更换版本号，旧版本下的缓存键自然失效，无需逐个删除
+- 单飞：同一缓存键未命中时只有一个 worker 负责计算，其余 worker 等待结果
+"""
+
+import hashlib
+import json
+import time
+
+import frappe
+
+from product_sales_planning.constants import CacheScope
+
+# 版本号、结果与锁在 Redis 中的键前缀
+VERSION_KEY_PREFIX = "product_sales_planning:data_version:"
+RESULT_KEY_PREFIX = "product_sales_planning:result:"
+LOCK_KEY_PREFIX = "product_sales_planning:lock:"
+
+# 等待其他 worker 计算结果时的轮询间隔（秒）
+WAIT_POLL_INTERVAL = 0.05
+
+
+def hash_params(params):
+	"""将参数规范化后计算哈希（键排序，无法序列化的值转为字符串）"""
+	payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+	return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_data_version(scope):
+	"""获取作用域当前的数据版本号，不存在时初始化"""
+	cache = frappe.cache()
+	key = VERSION_KEY_PREFIX + scope
+	version = cache.get_value(key, expires=True)
+	if not version:
+		version = frappe.generate_hash(length=10)
+		cache.set_value(key, version)
+	return version
+
+
+def bump_data_version(scope):
+	"""
+	更换作用域的数据版本号，使该作用域下的全部结果缓存失效
+
+	变更发生在事务内时，提交后再更换一次，避免事务提交前被其他 worker
+	以新版本号缓存了旧数据
+	"""
+	def bump():
+		frappe.cache().set_value(VERSION_KEY_PREFIX + scope, frappe.generate_hash(length=10))
+
+	bump()
+	frappe.db.after_commit.add(bump)
+
+
+def get_permission_scope(user=None):
+	"""
+	获取用户的权限范围标识（角色 + 用户权限），
+	权限范围相同的用户共享同一份缓存结果
+	"""
+	user = user or frappe.session.user
+	from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+
+	return hash_params({
+		"roles": sorted(frappe.get_roles(user)),
+		"user_permissions": get_user_permissions(user)
+	})
+
+
+def get_cached_result(key):
+	"""读取结果缓存，未命中时返回 None"""
+	return frappe.cache().get_value(RESULT_KEY_PREFIX + key, expires=True)
+
+
+def set_cached_result(key, result, expires_in_sec):
+	"""写入结果缓存（用于结果由其他查询顺带算出、无需经过 get_or_compute 的场景）"""
+	frappe.cache().set_value(RESULT_KEY_PREFIX + key, result, expires_in_sec=expires_in_sec)
+
+
+def delete_cached_result(key):
+	"""删除结果缓存（缓存的结果引用的外部资源已失效时使用）"""
+	frappe.cache().delete_value(RESULT_KEY_PREFIX + key)
+
+
+def get_or_compute(key, generator, expires_in_sec, lock_timeout=30, wait_timeout=10):
+	"""
+	读取结果缓存，未命中时以单飞方式计算并写入
+
+	Args:
+		key: 缓存键（调用方应包含数据版本号）
+		generator: 计算结果的函数（抛出异常时不写入缓存）
+		expires_in_sec: 结果缓存有效期（秒）
+		lock_timeout: 计算锁的最长持有时间（秒），防止 worker 异常退出后锁不释放
+		wait_timeout: 等待其他 worker 计算结果的最长时间（秒），超时后自行计算
+
+	Returns:
+		缓存或新计算的结果
+	"""
+	cache = frappe.cache()
+	result_key = RESULT_KEY_PREFIX + key
+
+	result = cache.get_value(result_key, expires=True)
+	if result is not None:
+		return result
+
+	lock_key = cache.make_key(LOCK_KEY_PREFIX + key)
+	if not cache.set(lock_key, 1, nx=True, ex=lock_timeout):
+		# 其他 worker 正在计算，等待其结果
+		deadline = time.monotonic() + wait_timeout
+		while time.monotonic() < deadline:
+			time.sleep(WAIT_POLL_INTERVAL)
+			result = cache.get_value(result_key, expires=True)
+			if result is not None:
+				return result
+			if not cache.exists(lock_key):
+				break
+
+		return generator()
+
+	try:
+		result = generator()
+		cache.set_value(result_key, result, expires_in_sec=expires_in_sec)
+		return result
+	finally:
+		cache.delete(lock_key)
+
+
+# ========== doc_events 钩子 ==========
+
+def on_dashboard_data_change(doc, method=None, *args, **kwargs):
+	"""
+	Schedule tasks（含随父文档保存的 Tasks Store 子表）或 Store List 变更：使看板结果缓存失效
+
+	同时注册在 after_rename 上，该事件额外传入 (old, new, merge)
+	"""
+	bump_data_version(CacheScope.DASHBOARD)
+
+
+def on_plan_data_change(doc, method=None, *args, **kwargs):
+	"""
+	Commodity Schedule、Product List、Store List 或 Schedule tasks 变更：使计划结果缓存失效
+
+	同时注册在 after_rename 上，该事件额外传入 (old, new, merge)
+	"""
+	bump_data_version(CacheScope.PLAN)
@@ -6,7 +6,9 @@
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import frappe
-from frappe.utils import getdate
+from frappe import _
+from frappe.utils import getdate, date_diff, today
+from product_sales_planning.constants import DeadlineBucket
 
 
 def get_next_n_months(n=4, include_current=False):
@@ -103,6 +105,66 @@ def get_months_between(start_date, end_date):
 	return months
 
 
+def get_month_ranges(months):
+	"""
+	将月份列表转换为合并后的半开日期区间，用于生成可走索引的范围条件
+
+	Args:
+		months: 月份字符串列表（格式同 parse_month_string）
+
+	Returns:
+		list: [(起始日期, 结束日期)]，区间为 [起始, 结束)，相邻月份合并为一个区间
+
+	Raises:
+		frappe.ValidationError: 月份超出 1-12 等无法转换为日期的月份
+	"""
+	try:
+		starts = sorted({
+			datetime.strptime(m, "%Y-%m").date()
+			for m in (parse_month_string(month) for month in months or [])
+			if m
+		})
+	except ValueError:
+		frappe.throw(_("月份格式无效"))
+
+	ranges = []
+	for start in starts:
+		end = start + relativedelta(months=1)
+		if ranges and ranges[-1][1] == start:
+			ranges[-1] = (ranges[-1][0], end)
+		else:
+			ranges.append((start, end))
+	return ranges
+
+
+def get_month_range_condition(column, months, param_prefix="month"):
+	"""
+	将月份列表编译为列上的范围条件（可使用索引，避免对列调用函数）
+
+	Args:
+		column: 日期列（如 cs.sub_date）
+		months: 月份字符串列表
+		param_prefix: 参数名前缀，避免与同一查询中的其他参数冲突
+
+	Returns:
+		tuple: (条件子句, 参数字典)；月份无效时返回 (None, {})
+	"""
+	month_ranges = get_month_ranges(months)
+	if not month_ranges:
+		return None, {}
+
+	conditions = []
+	values = {}
+	for idx, (range_start, range_end) in enumerate(month_ranges):
+		conditions.append(
+			f"({column} >= %({param_prefix}_start_{idx})s AND {column} < %({param_prefix}_end_{idx})s)"
+		)
+		values[f"{param_prefix}_start_{idx}"] = range_start
+		values[f"{param_prefix}_end_{idx}"] = range_end
+
+	return "(" + " OR ".join(conditions) + ")", values
+
+
 def parse_month_string(month_str):
 	"""
 	解析月份字符串为标准格式
@@ -153,3 +215,27 @@ def get_months_from(month_str, n=4):
 		month_date = start + relativedelta(months=i)
 		months.append(month_date.strftime("%Y-%m"))
 	return months
+
+
+def get_deadline_bucket(end_date, current_date=None):
+	"""
+	根据结束日期计算截止分组
+
+	Args:
+		end_date: 结束日期
+		current_date: 参照日期（默认今天）
+
+	Returns:
+		str: DeadlineBucket 中的分组，无结束日期时返回 None
+	"""
+	if not end_date:
+		return None
+
+	days_remaining = date_diff(end_date, current_date or today())
+	if days_remaining < 0:
+		return DeadlineBucket.OVERDUE
+	if days_remaining <= 3:
+		return DeadlineBucket.DUE_3_DAYS
+	if days_remaining <= 7:
+		return DeadlineBucket.DUE_7_DAYS
+	return DeadlineBucket.LATER
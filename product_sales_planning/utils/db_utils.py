@@ -0,0 +1,16 @@
+"""
+数据库工具类
+"""
+
+import frappe
+
+
+def iter_sql_unbuffered(query, values=None):
+	"""
+	以无缓冲游标逐行读取查询结果（as_dict），结果集不会整体加载到内存
+
+	迭代期间同一数据库连接不能执行其他查询；调用方应先完成校验等查询，
+	再开始迭代
+	"""
+	with frappe.db.unbuffered_cursor():
+		yield from frappe.db.sql(query, values or {}, as_dict=True, as_iterator=True)
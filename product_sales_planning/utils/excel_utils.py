@@ -0,0 +1,101 @@
+"""
+Excel 工具类
+基于 openpyxl write_only 模式流式写出 xlsx，内存占用与导出行数无关
+"""
+
+from itertools import islice
+
+# 表头样式（注册为命名样式，表头单元格只引用样式名）
+HEADER_STYLE_NAME = "psp_header"
+HEADER_FILL_COLOR = "CCCCCC"
+
+# 列宽采样行数（write_only 模式必须在写入第一行前设置列宽）
+WIDTH_SAMPLE_ROWS = 200
+
+# 列宽上限
+MAX_COLUMN_WIDTH = 50
+
+
+def _display_width(value):
+	"""估算单元格显示宽度（中文等宽字符按 2 计）"""
+	if value is None:
+		return 0
+	text = str(value)
+	return sum(2 if ord(ch) > 0x2E7F else 1 for ch in text)
+
+
+def _build_header_style():
+	"""表头命名样式"""
+	from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+	style = NamedStyle(name=HEADER_STYLE_NAME)
+	style.font = Font(bold=True)
+	style.fill = PatternFill(start_color=HEADER_FILL_COLOR, end_color=HEADER_FILL_COLOR, fill_type="solid")
+	style.alignment = Alignment(horizontal="center", vertical="center")
+	return style
+
+
+def write_xlsx_stream(file_obj, sheet_title, headers, rows, sample_size=WIDTH_SAMPLE_ROWS, column_widths=None):
+	"""
+	以 write_only 模式流式写出 xlsx
+
+	只有表头单元格带样式（命名样式），数据行按原值写出，不逐单元格设置样式。
+	列宽根据表头与前 sample_size 行计算：先缓存采样行、设置列宽，再写出采样行与剩余行，
+	内存中最多保留 sample_size 行；传入 column_widths 时直接使用，不缓存采样行
+
+	Args:
+		file_obj: 文件路径或可写的二进制文件对象
+		sheet_title: 工作表名称
+		headers: 表头列表
+		rows: 行值的可迭代对象（每行为与 headers 对应的列表），可以是生成器
+		sample_size: 用于计算列宽的采样行数
+		column_widths: 固定列宽列表（与 headers 对应）
+
+	Returns:
+		int: 写出的数据行数（不含表头）
+	"""
+	import openpyxl
+	from openpyxl.cell import WriteOnlyCell
+	from openpyxl.utils import get_column_letter
+
+	wb = openpyxl.Workbook(write_only=True)
+	wb.add_named_style(_build_header_style())
+	ws = wb.create_sheet(title=sheet_title)
+
+	rows = iter(rows)
+	sample = []
+
+	if column_widths:
+		widths = list(column_widths)
+	else:
+		# 根据表头与采样行计算列宽
+		sample = list(islice(rows, sample_size))
+		widths = [_display_width(header) + 2 for header in headers]
+		for row in sample:
+			for idx, value in enumerate(row[:len(widths)]):
+				widths[idx] = max(widths[idx], _display_width(value) + 2)
+
+	# 列宽在写入第一行前一次性设置
+	for idx, width in enumerate(widths, 1):
+		ws.column_dimensions[get_column_letter(idx)].width = min(width, MAX_COLUMN_WIDTH)
+
+	# 表头
+	header_cells = []
+	for header in headers:
+		cell = WriteOnlyCell(ws, value=header)
+		cell.style = HEADER_STYLE_NAME
+		header_cells.append(cell)
+	ws.append(header_cells)
+
+	count = 0
+	for row in sample:
+		ws.append(row)
+		count += 1
+	del sample
+
+	for row in rows:
+		ws.append(row)
+		count += 1
+
+	wb.save(file_obj)
+	return count
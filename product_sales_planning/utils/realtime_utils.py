@@ -0,0 +1,134 @@
+"""
+实时推送工具类
+通过 frappe.publish_realtime 推送计划与审批状态变化，减少前端轮询与整页刷新
+
+推送房间：
+- 任务房间：doc:Schedule tasks/<task_id>（前端通过 doc_subscribe 订阅）
+- 店铺房间：doc:Store List/<store_id>
+- 用户房间：店铺负责人、提交人、当前审批人（及上一审批人）
+同一事件可能从多个房间到达，前端按 event_id 去重
+"""
+
+import frappe
+
+# 事件名称
+APPROVAL_EVENT = "psp_approval_update"
+PLAN_EVENT = "psp_plan_update"
+EXPORT_EVENT = "psp_export_progress"
+IMPORT_EVENT = "psp_import_progress"
+
+# 审批事件携带的审批历史字段
+HISTORY_FIELDS = ("name", "action", "approver", "approval_step", "comments", "action_time", "creation")
+
+# 单个计划事件携带的最大变更条数，超过则仅通知前端重新加载
+MAX_PLAN_CHANGES_PER_EVENT = 200
+
+
+def _get_related_users(task_id, store_id):
+	"""获取与任务店铺相关的用户（店铺负责人、提交人、当前审批人）"""
+	rows = frappe.db.sql("""
+		SELECT sl.user1, ts.submitted_by, ts.current_approver
+		FROM `tabStore List` sl
+		LEFT JOIN `tabTasks Store` ts
+			ON ts.store_name = sl.name
+			AND ts.parent = %(task_id)s
+			AND ts.parenttype = 'Schedule tasks'
+		WHERE sl.name = %(store_id)s
+	""", {"task_id": task_id, "store_id": store_id}, as_dict=True)
+
+	users = set()
+	for row in rows:
+		users.update(filter(None, (row.user1, row.submitted_by, row.current_approver)))
+	return users
+
+
+def _publish(event, task_id, store_id, payload, extra_users=None):
+	"""向任务、店铺及相关用户房间推送事件（事务提交后发送）"""
+	message = {
+		"event_id": frappe.generate_hash(length=12),
+		"task_id": task_id,
+		"store_id": store_id,
+		"by": frappe.session.user,
+		**payload,
+	}
+
+	frappe.publish_realtime(event, message, doctype="Schedule tasks", docname=task_id, after_commit=True)
+	frappe.publish_realtime(event, message, doctype="Store List", docname=store_id, after_commit=True)
+
+	users = _get_related_users(task_id, store_id)
+	users.update(filter(None, extra_users or []))
+	for user in users:
+		frappe.publish_realtime(event, message, user=user, after_commit=True)
+
+
+def publish_approval_event(task_id, store_id, action, state, previous_approver=None, history=None):
+	"""
+	推送审批状态变化
+
+	Args:
+		task_id: 任务ID
+		store_id: 店铺ID
+		action: 操作（提交 / 通过 / 退回上级 / 退回提交人 / 撤回）
+		state: 变化后的 Tasks Store 状态（status, approval_status, current_approval_step,
+			current_approver, can_edit, rejection_reason）
+		previous_approver: 操作前的审批人（审批流转后也需通知到）
+		history: 本次操作生成的 Approval History 记录，前端直接追加到审批历史
+	"""
+	try:
+		_publish(
+			APPROVAL_EVENT,
+			task_id,
+			store_id,
+			{
+				"action": action,
+				"state": {
+					"status": state.get("status"),
+					"approval_status": state.get("approval_status"),
+					"current_step": state.get("current_approval_step") or 0,
+					"current_approver": state.get("current_approver"),
+					"can_edit": state.get("can_edit"),
+					"rejection_reason": state.get("rejection_reason"),
+				},
+				"history": _history_payload(history),
+			},
+			extra_users=[previous_approver],
+		)
+	except Exception as e:
+		# 推送失败不影响审批主流程
+		frappe.log_error(title="推送审批状态失败", message=str(e))
+
+
+def _history_payload(history):
+	"""审批历史记录中前端审批历史面板使用的字段"""
+	if not history:
+		return None
+	return {field: history.get(field) for field in HISTORY_FIELDS}
+
+
+def publish_plan_event(task_id, store_id, action, changes=None):
+	"""
+	推送商品计划变化
+
+	Args:
+		task_id: 任务ID
+		store_id: 店铺ID
+		action: 操作（update / insert / delete / import）
+		changes: 变更列表 [{"code", "month", "quantity"}]；为 None 或超过上限时前端重新加载
+	"""
+	if not task_id or not store_id:
+		return
+
+	try:
+		reload = changes is None or len(changes) > MAX_PLAN_CHANGES_PER_EVENT
+		_publish(
+			PLAN_EVENT,
+			task_id,
+			store_id,
+			{
+				"action": action,
+				"changes": [] if reload else changes,
+				"reload": reload,
+			},
+		)
+	except Exception as e:
+		frappe.log_error(title="推送计划变更失败", message=str(e))
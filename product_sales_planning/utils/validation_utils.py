@@ -281,7 +281,7 @@ def validate_file_extension(filename, allowed_extensions=None):
 	allowed_extensions = allowed_extensions or ALLOWED_FILE_EXTENSIONS
 	
 	import os
-	_, ext = os.path.splitext(filename)
+	_root, ext = os.path.splitext(filename)
 	
 	if ext.lower() not in allowed_extensions:
 		frappe.throw(_(f"不支持的文件类型: {ext}，仅支持: {', '.join(allowed_extensions)}"))
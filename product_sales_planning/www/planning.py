@@ -18,6 +18,7 @@ def get_context(context):
 		"user_image": frappe.session.data.user_image if hasattr(frappe.session.data, 'user_image') else None,
 		"user_fullname": frappe.utils.get_fullname(frappe.session.user),
 		"csrf_token": csrf_token,
+		"site_name": frappe.local.site,
 	}
 	context.boot = boot_info
 